@@ -0,0 +1,118 @@
+import cv2
+import numpy as np
+
+from instrumentation import stage
+
+MAX_IMAGE_SIZE = 4000  # Pixels a side analysed; larger JPEGs are reduced while decoding, and photos never resized beyond it
+
+# Reductions libjpeg applies while decoding (DCT scaling), so the full-size
+# image is never allocated, and the flag that asks OpenCV for each
+REDUCED_DECODE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+class AnalysisContext:
+    """
+    Per-image state shared by every stage of the scoring pipeline.
+
+    The image is decoded once, and expensive intermediate results (arrow
+    detections, tile grid, tile classifications) are memoised so that
+    arrow validation, scoring and annotation never repeat each other's work.
+    """
+
+    def __init__(self, image, source=None, original=None, scale=1.0):
+        self.image = image  # BGR array as returned by cv2.imread
+        self.source = source  # Original file path, if any
+        self.original = original  # Context of the photo this image was resized from, if any
+        self.scale = scale  # Pixels of this image per pixel of the original
+        self._gray = None
+        self._cache = {}
+
+    @classmethod
+    def from_path(cls, image_path, reduction=1):
+        """
+        Decode an image file, returning None if it cannot be read.
+
+        reduction (a key of REDUCED_DECODE_FLAGS) shrinks a JPEG while it is
+        decoded; other formats are decoded in full and then resized.
+        """
+        with stage("decode"):
+            image = cv2.imread(image_path, REDUCED_DECODE_FLAGS[reduction])
+        if image is None:
+            return None
+        return cls(image, source=image_path)
+
+    @classmethod
+    def from_bytes(cls, data, reduction=1):
+        """Decode an encoded image (e.g. an upload's bytes), returning None if it isn't one; see from_path for reduction"""
+        buffer = np.frombuffer(data, dtype=np.uint8)
+        if buffer.size == 0:
+            return None
+        with stage("decode"):
+            image = cv2.imdecode(buffer, REDUCED_DECODE_FLAGS[reduction])
+        if image is None:
+            return None
+        return cls(image)
+
+    @property
+    def gray(self):
+        if self._gray is None:
+            self._gray = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
+        return self._gray
+
+    @property
+    def original_image(self):
+        """The photo as uploaded, for drawing annotations on"""
+        return self.image if self.original is None else self.original.original_image
+
+    def to_original(self, *values):
+        """Map pixel coordinates (or lengths) in this image to the photo as uploaded, as a tuple of ints"""
+        context = self
+        while context.original is not None:
+            values = [value / context.scale for value in values]
+            context = context.original
+        return tuple(int(round(value)) for value in values)
+
+    def pyramid_level(self, level):
+        """Grayscale image downscaled by 2**level with cv2.pyrDown"""
+        if level == 0:
+            return self.gray
+        return self.cached(("pyramid", level), lambda: cv2.pyrDown(self.pyramid_level(level - 1)))
+
+    def cached(self, key, compute):
+        """Return the memoised result for key, computing it on first use"""
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+def decode_reduction(width, height, max_size):
+    """
+    Smallest reduction in REDUCED_DECODE_FLAGS that decodes a width x height
+    image at no more than max_size pixels a side, or None if none does.
+    """
+    for reduction in sorted(REDUCED_DECODE_FLAGS):
+        if -(-max(width, height) // reduction) <= max_size:  # libjpeg rounds reduced sizes up
+            return reduction
+    return None
+
+def get_analysis_context(image_input):
+    """
+    Resolve an image source to an AnalysisContext.
+
+    Args:
+        image_input: file path, encoded image bytes, decoded BGR array,
+                     or an existing AnalysisContext
+
+    Returns:
+        AnalysisContext, or None if the image could not be loaded
+    """
+    if isinstance(image_input, AnalysisContext):
+        return image_input
+    if isinstance(image_input, np.ndarray):
+        return AnalysisContext(image_input)
+    if isinstance(image_input, (bytes, bytearray, memoryview)):
+        return AnalysisContext.from_bytes(image_input)
+    return AnalysisContext.from_path(image_input)
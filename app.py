@@ -1,26 +1,135 @@
-from flask import Flask, render_template, request, redirect, url_for, send_from_directory
+from flask import Flask, render_template, request, redirect, url_for, send_from_directory, jsonify
+import copy
+import io
+import logging
 import os
+import threading
+import uuid
 from werkzeug.utils import secure_filename
 from PIL import Image
-from board_analyzer import analyze_complete_board
+from board_analyzer import analyze_complete_board, detector_config
+from instrumentation import stage
+from jobs import JobQueue, QueueFullError
+from logging_config import configure_logging, get_request_id, set_request_id
+from metrics import MetricsRegistry
+from result_cache import ResultCache, make_cache_key
 import cv2
 import tempfile
 
+configure_logging()
+logger = logging.getLogger(__name__)
+
 app = Flask(__name__)
 app.config["UPLOAD_FOLDER"] = tempfile.mkdtemp(prefix="beacon_patrol_")
 app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024 # 16 MB max file size
+app.config["JOB_WORKERS"] = 2 # Background scoring threads for /jobs
+app.config["JOB_QUEUE_DEPTH"] = 8 # Queued + running jobs before /jobs returns 429
+app.config["RESULT_CACHE_ENABLED"] = True # Reuse results when the same photo is uploaded again
+app.config["RESULT_CACHE_ENTRIES"] = 128 # In-memory LRU size
+app.config["RESULT_CACHE_DIR"] = None # Set to a directory to also cache results on disk
+app.config["RESULT_CACHE_MAX_BYTES"] = 256 * 1024 * 1024 # Disk tier size limit
+app.config["METRICS_DIR"] = os.environ.get("BEACON_METRICS_DIR") # Shared directory for multi-worker /metrics
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+_result_cache = None
+_result_cache_lock = threading.Lock()
+_metrics = None
+_metrics_lock = threading.Lock()
+
+def get_job_queue():
+    """The process-wide job queue, created from app config on first use"""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue(max_workers=app.config["JOB_WORKERS"],
+                                  max_pending=app.config["JOB_QUEUE_DEPTH"])
+        return _job_queue
+
+def get_result_cache():
+    """The process-wide result cache, or None if caching is disabled"""
+    global _result_cache
+    if not app.config["RESULT_CACHE_ENABLED"]:
+        return None
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = ResultCache(max_entries=app.config["RESULT_CACHE_ENTRIES"],
+                                        disk_dir=app.config["RESULT_CACHE_DIR"],
+                                        max_disk_bytes=app.config["RESULT_CACHE_MAX_BYTES"])
+        return _result_cache
+
+def get_metrics():
+    """The process-wide metrics registry, created from app config on first use"""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = MetricsRegistry(app.config["METRICS_DIR"])
+            _define_metrics(_metrics)
+        return _metrics
+
+def _define_metrics(metrics):
+    metrics.counter("beacon_uploads_total", "Uploads by outcome (valid, invalid, rejected, error)")
+    metrics.counter("beacon_upload_failures_total", "Invalid boards by the check they failed")
+    metrics.counter("beacon_result_cache_lookups_total", "Result cache lookups by result (hit, miss)")
+    metrics.counter("beacon_jobs_rejected_total", "Job submissions refused because the queue was full")
+    metrics.histogram("beacon_image_width_pixels", "Width of uploaded photos",
+                      (250, 500, 1000, 1500, 2000, 3000, 4000, 6000, 10000))
+    metrics.histogram("beacon_image_height_pixels", "Height of uploaded photos",
+                      (250, 500, 1000, 1500, 2000, 3000, 4000, 6000, 10000))
+    metrics.histogram("beacon_board_tiles", "Tiles detected on scored boards", (1, 5, 10, 15, 20, 30, 50, 100, 200))
+    metrics.histogram("beacon_board_scorable_tiles", "Surrounded (scorable) tiles on scored boards",
+                      (1, 5, 10, 15, 20, 30, 50, 100, 200))
+    metrics.gauge("beacon_job_queue_depth", "Scoring jobs queued or running")
+    metrics.add_collector(lambda: metrics.set("beacon_job_queue_depth", _job_queue.depth() if _job_queue else 0))
 
-def validate_file_content(file_path):
+def _record_upload(summary):
+    """Count a scored upload (summary is None if scoring raised)"""
+    metrics = get_metrics()
+    if summary is None:
+        metrics.inc("beacon_uploads_total", {'outcome': 'error'})
+    else:
+        metrics.inc("beacon_uploads_total", {'outcome': 'valid' if summary['is_valid'] else 'invalid'})
+        if summary.get('failed_at'):
+            metrics.inc("beacon_upload_failures_total", {'failed_at': summary['failed_at']})
+
+        details = summary['details']
+        if 'image_width' in details:
+            metrics.observe("beacon_image_width_pixels", details['image_width'])
+            metrics.observe("beacon_image_height_pixels", details['image_height'])
+        if 'total_tiles' in details:
+            metrics.observe("beacon_board_tiles", details['total_tiles'])
+            metrics.observe("beacon_board_scorable_tiles", details['scorable_tiles'])
+    metrics.flush()
+
+def _record_rejected_upload():
+    metrics = get_metrics()
+    metrics.inc("beacon_uploads_total", {'outcome': 'rejected'})
+    metrics.flush()
+
+def _record_rejected_job():
+    metrics = get_metrics()
+    metrics.inc("beacon_jobs_rejected_total")
+    metrics.flush()
+
+def validate_file_content(file_content):
     """
     Validate that the file is actually a valid image by trying to open it.
     This prevents malicious files disguised as images.
+
+    Args:
+        file_content: File path, or the uploaded bytes
     """
+    def open_image():
+        if isinstance(file_content, (bytes, bytearray)):
+            return Image.open(io.BytesIO(file_content))
+        return Image.open(file_content)
+
     try:
-        with Image.open(file_path) as img:
+        with open_image() as img:
             img.verify()  # This will raise an exception if not a valid image
             
         # Reopen for further validation (verify() can only be called once)
-        with Image.open(file_path) as img:
+        with open_image() as img:
             width, height = img.size
             
             # Additional safety checks
@@ -32,9 +141,19 @@ def validate_file_content(file_path):
         return True
         
     except Exception as e:
-        print(f"File validation failed: {e}")  # Log for debugging
+        logger.info("File validation failed: %s", e)
         return False
 
+@app.before_request
+def assign_request_id():
+    """Correlate every log record for a request (and any job it queues)"""
+    set_request_id(request.headers.get("X-Request-ID"))
+
+@app.after_request
+def add_request_id_header(response):
+    response.headers["X-Request-ID"] = get_request_id()
+    return response
+
 @app.route("/")
 def index():
     return render_template("index.html")
@@ -51,54 +170,32 @@ def upload_file():
     if file:
         # Check MIME type first (before saving)
         if not file.content_type.startswith('image/'):
+            _record_rejected_upload()
             return render_template("index.html", error="Invalid file type"), 400
             
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-        file.save(filepath)
+        filename = secure_filename(file.filename) or "upload.jpg"
+        image_bytes = file.read()  # Kept in memory; bounded by MAX_CONTENT_LENGTH
 
-        # ADD FILE CONTENT VALIDATION HERE
-        if not validate_file_content(filepath):
-            os.remove(filepath)  # Clean up the invalid file
+        if not validate_file_content(image_bytes):
+            _record_rejected_upload()
             return render_template("index.html", error="File is corrupted or not a valid image"), 400
 
         try:
-            with Image.open(filepath) as img:
-                # Your existing analysis code...
-                result = analyze_complete_board(img, filepath)
-
-                if not result['is_valid']:
-                    # Handle arrow validation errors (still has annotated_image)
-                    if result.get('annotated_image') is not None:
-                        annotated_filename = f"annotated_{filename}"
-                        annotated_path = os.path.join(app.config["UPLOAD_FOLDER"], annotated_filename)
-                        cv2.imwrite(annotated_path, result['annotated_image'])
-                        return render_template("index.html", 
-                                            error=result['errors'][0], 
-                                            annotated_filename=annotated_filename), 400
-                    
-                    return render_template("index.html", error=result['errors'][0]), 400
-                
-                # Success! Use the annotated filename that was already saved
-                annotated_filename = result.get('annotated_filename')
-
-                if annotated_filename is None:
-                    # Image generation failed, but scoring worked
-                    return render_template("results.html", 
-                                        filename=filename,  # Show original image
-                                        score=result['score'], 
-                                        rank=result['rank'],
-                                        breakdown=result['breakdown'],
-                                        details=result.get('details', {}))
-                else:
-                    # Show annotated image
-                    annotated_filename = os.path.basename(annotated_filename)
-                    return render_template("results.html", 
-                                        filename=annotated_filename,
-                                        score=result['score'], 
-                                        rank=result['rank'],
-                                        breakdown=result['breakdown'],
-                                        details=result.get('details', {}))
+            result = score_upload(image_bytes, filename, app.config["UPLOAD_FOLDER"], get_result_cache())
+
+            if not result['is_valid']:
+                # Arrow validation errors still come with an annotated image
+                return render_template("index.html", 
+                                    error=result['errors'][0], 
+                                    annotated_filename=result['image_filename']), 400
+
+            # Show the annotated image, or the original if annotation failed
+            return render_template("results.html", 
+                                filename=result['image_filename'],
+                                score=result['score'], 
+                                rank=result['rank'],
+                                breakdown=result['breakdown'],
+                                details=result['details'])
                     
         except Exception as e:
             return render_template("index.html", error="Error: Not a valid image file"), 400
@@ -106,6 +203,171 @@ def upload_file():
 
     
         
+def score_upload(image_bytes, filename, upload_folder, cache=None):
+    """
+    Run the scoring pipeline on an upload held in memory.
+
+    The bytes are decoded once; the only file written is the image shown
+    to the player (annotated where possible). If a cache is given, a photo
+    that was scored before (same bytes, same detector settings) is answered
+    from it without running the pipeline.
+
+    Returns:
+        dict: JSON-serialisable result. 'image_filename' names the image to
+              show in upload_folder, or is None for invalid boards without
+              an annotated image.
+    """
+    try:
+        summary = _score_upload(image_bytes, filename, upload_folder, cache)
+    except Exception:
+        _record_upload(None)
+        raise
+    _record_upload(summary)
+    return summary
+
+def _score_upload(image_bytes, filename, upload_folder, cache):
+    cache_key = None
+    if cache is not None:
+        cache_key = make_cache_key(image_bytes, detector_config())
+        cached = cache.get(cache_key)
+        get_metrics().inc("beacon_result_cache_lookups_total", {'result': 'hit' if cached is not None else 'miss'})
+        if cached is not None:
+            return _restore_cached_result(cached, cache_key, filename, upload_folder, image_bytes)
+
+    base_name, ext = os.path.splitext(filename)
+    ext = ext or '.jpg'
+    result = analyze_complete_board(image_bytes, annotated_path=os.path.join(upload_folder, f"{base_name}_scored{ext}"))
+
+    image_path = None
+    if result.get('annotated_image') is not None:
+        # Arrow validation failed - save the image with wrong arrows marked
+        image_path = os.path.join(upload_folder, f"annotated_{base_name}{ext}")
+        with stage("encode"):
+            cv2.imwrite(image_path, result['annotated_image'])
+    elif result.get('annotated_filename'):
+        image_path = result['annotated_filename']
+    elif result['is_valid']:
+        # Annotation failed but scoring worked - show the original photo
+        image_path = _write_original(image_bytes, filename, upload_folder)
+
+    summary = {
+        'is_valid': result['is_valid'],
+        'score': result.get('score'),
+        'rank': result.get('rank'),
+        'breakdown': result.get('breakdown'),
+        'errors': result['errors'],
+        'failed_at': result.get('failed_at'),
+        'details': result.get('details', {})
+    }
+
+    if cache is not None:
+        cached_bytes = None
+        if image_path:
+            with open(image_path, "rb") as f:
+                cached_bytes = f.read()
+        cache.put(cache_key, _cacheable(summary), cached_bytes, os.path.splitext(image_path or filename)[1] or ".jpg")
+
+    summary['image_filename'] = os.path.basename(image_path) if image_path else None
+    return summary
+
+def _write_original(image_bytes, filename, upload_folder):
+    """Save the uploaded bytes unchanged, for display"""
+    image_path = os.path.join(upload_folder, filename)
+    with open(image_path, "wb") as f:
+        f.write(image_bytes)
+    return image_path
+
+def _cacheable(summary):
+    """
+    Copy of a score_upload summary for the result cache, sharing nothing with
+    the live result and without the stage timings, which only describe the
+    run that produced it
+    """
+    cacheable = copy.deepcopy(summary)
+    cacheable['details'].pop('timings', None)
+    return cacheable
+
+def _restore_cached_result(cached, cache_key, filename, upload_folder, image_bytes):
+    """Rebuild a score_upload result from a cache entry"""
+    summary = copy.deepcopy(cached['result'])
+
+    if cached['image_bytes'] is not None:
+        # One file per cached photo, however many times it's uploaded
+        image_filename = f"cached_{cache_key[:16]}{cached['image_ext']}"
+        image_path = os.path.join(upload_folder, image_filename)
+        if not os.path.exists(image_path):
+            with open(image_path, "wb") as f:
+                f.write(cached['image_bytes'])
+        summary['image_filename'] = image_filename
+    elif summary['is_valid']:
+        summary['image_filename'] = os.path.basename(_write_original(image_bytes, filename, upload_folder))
+    else:
+        summary['image_filename'] = None
+    return summary
+
+@app.route("/jobs", methods=["POST"])
+def create_job():
+    """Queue an upload for background scoring and return its job id straight away"""
+    file = request.files.get("file")
+    if file is None or file.filename == "":
+        return jsonify(error="No file selected"), 400
+
+    if not file.content_type.startswith('image/'):
+        _record_rejected_upload()
+        return jsonify(error="Invalid file type"), 400
+
+    queue = get_job_queue()
+    if queue.depth() >= queue.max_pending:
+        # Refuse before reading the upload
+        _record_rejected_job()
+        return jsonify(error="Too many boards are being scored, please try again shortly"), 429, {"Retry-After": "5"}
+
+    filename = f"{uuid.uuid4().hex}_{secure_filename(file.filename)}"
+    image_bytes = file.read()  # Held in memory until the job runs; bounded by queue depth
+
+    if not validate_file_content(image_bytes):
+        _record_rejected_upload()
+        return jsonify(error="File is corrupted or not a valid image"), 400
+
+    try:
+        job_id = queue.submit(score_upload, image_bytes, filename, app.config["UPLOAD_FOLDER"], get_result_cache())
+    except QueueFullError:
+        _record_rejected_job()
+        return jsonify(error="Too many boards are being scored, please try again shortly"), 429, {"Retry-After": "5"}
+
+    status_url = url_for("get_job", job_id=job_id)
+    return jsonify(job_id=job_id, status="queued", status_url=status_url), 202, {"Location": status_url}
+
+@app.route("/jobs/<job_id>")
+def get_job(job_id):
+    """Poll a scoring job; the result is included once status is 'done'"""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify(error="Unknown job"), 404
+
+    response = {'job_id': job_id, 'status': job['status']}
+    if job['status'] == 'done':
+        result = dict(job['result'])
+        image_filename = result.pop('image_filename')
+        result['image_url'] = url_for("uploaded_file", filename=image_filename) if image_filename else None
+        response['result'] = result
+    elif job['status'] == 'failed':
+        response['error'] = "Error: Not a valid image file"
+    return jsonify(response)
+
+@app.route("/cache/stats")
+def cache_stats():
+    """Result cache hit/miss counters"""
+    cache = get_result_cache()
+    if cache is None:
+        return jsonify(enabled=False)
+    return jsonify(enabled=True, **cache.stats())
+
+@app.route("/metrics")
+def export_metrics():
+    """Service metrics in Prometheus text format"""
+    return get_metrics().render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
 @app.route("/uploads/<filename>")
 def uploaded_file(filename):
     return send_from_directory(app.config["UPLOAD_FOLDER"], filename)
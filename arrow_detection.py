@@ -1,194 +1,351 @@
+import logging
 from PIL import Image
 import cv2
 import numpy as np
 
-def get_arrow_positions(image_path, correct_threshold=0.79, incorrect_threshold=0.79):
+from analysis_context import get_analysis_context
+from board_region import board_region
+from correlation import CorrelationEngine
+from instrumentation import stage
+from peak_detection import find_peaks, non_max_suppression
+from template_registry import get_normalised_template, get_template, template_path
+
+CORRECT_TEMPLATE_PATH = template_path("arrow_tight_crop.png")
+INCORRECT_TEMPLATE_PATHS = [
+    template_path("arrow_tight_90.png"),
+    template_path("arrow_tight_180.png"),
+    template_path("arrow_tight_270.png"),
+]
+# Orientation label (degrees, as in the template registry) -> arrow template
+ORIENTATION_TEMPLATE_PATHS = dict(zip((0, 90, 180, 270), [CORRECT_TEMPLATE_PATH] + INCORRECT_TEMPLATE_PATHS))
+
+ARROW_THRESHOLD = 0.79  # Minimum TM_CCOEFF_NORMED score for an arrow match
+DUPLICATE_DISTANCE = 40  # Matches closer than this are the same arrow, whatever their orientation
+
+# Arrows are found in one sweep with a rotation-invariant template (the
+# average of the four rotations), then each candidate's orientation is
+# classified from the small patch around it with the rotated templates.
+# The invariant template is a weak detector, so its threshold is low.
+CANDIDATE_THRESHOLD = 0.45  # Minimum rotation-invariant score for an arrow candidate
+CANDIDATE_NEIGHBOURHOOD = 1  # Rotated templates are scored this many pixels around each candidate
+CLASSIFY_BATCH = 2048  # Candidates classified at a time, bounding the gathered patches' memory
+
+# Coarse-to-fine matching: find candidates on a downscaled image, then
+# re-match at full resolution only in small windows around them
+PYRAMID_LEVELS = 1  # 0 disables the pyramid and matches the full image
+PYRAMID_TOLERANCE = 0.15  # Coarse candidates may score this far below the full-res threshold
+MIN_PYRAMID_TEMPLATE_SIZE = 6  # Don't shrink templates below this many pixels
+MIN_SWEEP_TEMPLATE_SCALE = 0.7  # detect_arrows_at_scale shrinks templates no further than this
+
+logger = logging.getLogger(__name__)
+
+def _pyramid_levels_for(template, levels):
+    """Largest usable level <= levels that keeps the template at a matchable size"""
+    while levels > 0 and min(template.shape) / 2**levels < MIN_PYRAMID_TEMPLATE_SIZE:
+        levels -= 1
+    return levels
+
+def _refine_candidates(gray, template, coarse_peaks, levels, threshold):
+    """Full-resolution matching restricted to windows around coarse candidates"""
+    factor = 2**levels
+    margin = 2 * factor  # Covers rounding in both pyrDown and the template resize
+    template_h, template_w = template.shape
+    image_h, image_w = gray.shape
+
+    peaks = []
+    for coarse_x, coarse_y, _score in coarse_peaks:
+        left = max(0, coarse_x * factor - margin)
+        top = max(0, coarse_y * factor - margin)
+        right = min(image_w, coarse_x * factor + margin + template_w)
+        bottom = min(image_h, coarse_y * factor + margin + template_h)
+        if right - left < template_w or bottom - top < template_h:
+            continue
+
+        result = cv2.matchTemplate(gray[top:bottom, left:right], template, cv2.TM_CCOEFF_NORMED)
+        peaks.extend((x + left, y + top, score) for x, y, score in find_peaks(result, threshold))
+    return peaks
+
+def _rotation_invariant_template(template):
+    """
+    Average of a template's four 90-degree rotations (padded to a square by
+    repeating its edges), which matches the pattern in any of them.
+    """
+    height, width = template.shape
+    size = max(height, width)
+    square = cv2.copyMakeBorder(template, 0, size - height, 0, size - width, cv2.BORDER_REPLICATE).astype(np.float32)
+    average = sum(np.rot90(square, turns) for turns in range(4)) / 4
+    return np.round(average).astype(np.uint8)
+
+def _patch_scores(image, xs, ys, templates):
+    """
+    TM_CCOEFF_NORMED of same-sized templates at the given top-left positions only.
+
+    Args:
+        templates: NormalisedTemplates (see template_registry), all one size
+
+    Returns:
+        float32 array of shape (len(xs), len(templates))
+    """
+    template_h, template_w = templates[0].image.shape
+    zero_mean = np.stack([template.zero_mean.ravel() for template in templates], axis=1)
+    template_norms = np.array([template.norm for template in templates], dtype=np.float32)
+
+    image_w = image.shape[1]
+    window = (np.arange(template_h)[:, None] * image_w + np.arange(template_w)).ravel()
+    patches = np.take(image, (ys * image_w + xs)[:, None] + window).astype(np.float32)
+    sums = patches.sum(axis=1)
+    deviation = np.sqrt(np.maximum(np.einsum("ij,ij->i", patches, patches) - sums * sums / window.size, 0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = (patches @ zero_mean) / (deviation[:, None] * template_norms)
+    scores[~np.isfinite(scores)] = 0  # Flat windows or templates
+    return scores
+
+def _classify_candidates(image, candidate_xs, candidate_ys, templates):
+    """
+    Best-matching orientation for each candidate, searched over the
+    CANDIDATE_NEIGHBOURHOOD around it.
+
+    Args:
+        image: the image the candidates were found in
+        candidate_xs, candidate_ys: candidate top-left positions
+        templates: dict of orientation -> NormalisedTemplate at the image's scale
+
+    Returns:
+        tuple of arrays: (orientation, x, y, score) of each candidate's best match
+    """
+    offsets = np.arange(-CANDIDATE_NEIGHBOURHOOD, CANDIDATE_NEIGHBOURHOOD + 1)
+    offset_ys, offset_xs = [offset.ravel() for offset in np.meshgrid(offsets, offsets, indexing="ij")]
+    image_h, image_w = image.shape
+    rows = np.arange(len(candidate_xs))
+
+    # Templates of the same size share the gathered patches
+    by_shape = {}
+    for orientation, template in templates.items():
+        by_shape.setdefault(template.image.shape, []).append(orientation)
+
+    best = None
+    for (template_h, template_w), orientations in by_shape.items():
+        xs = np.clip(candidate_xs[:, None] + offset_xs, 0, image_w - template_w)
+        ys = np.clip(candidate_ys[:, None] + offset_ys, 0, image_h - template_h)
+        scores = _patch_scores(image, xs.ravel(), ys.ravel(), [templates[o] for o in orientations])
+        # (candidate, offset, orientation) -> best offset and orientation per candidate
+        scores = scores.reshape(len(rows), -1)
+        column = scores.argmax(axis=1)
+        offset, orientation = np.divmod(column, len(orientations))
+        found = (np.array(orientations)[orientation], xs[rows, offset], ys[rows, offset], scores[rows, column])
+        if best is None:
+            best = found
+        else:
+            better = found[3] > best[3]
+            best = tuple(np.where(better, new, old) for new, old in zip(found, best))
+    return best
+
+def _find_arrow_candidates(context, thresholds, levels, tolerance, template_scale=1.0):
+    """
+    One rotation-invariant sweep of pyramid level `levels`, then orientation
+    classification of each candidate.
+
+    Args:
+        thresholds: dict of orientation -> minimum full-resolution score
+        tolerance: how far below its threshold a coarse match may score
+        template_scale: size of the arrows in the photo relative to the templates
+
+    Returns:
+        list of (x, y, score, orientation) at the given pyramid level, one per
+        candidate whose best orientation scores at least its threshold minus tolerance
+    """
+    scale = template_scale / 2**levels
+    templates = {}
+    for orientation, path in ORIENTATION_TEMPLATE_PATHS.items():
+        template = get_normalised_template(path, scale)
+        if template is not None:
+            templates[orientation] = template
+    correct_template = get_template(CORRECT_TEMPLATE_PATH)
+    if not templates or correct_template is None:
+        return []
+
+    invariant = _rotation_invariant_template(correct_template)
+    if scale != 1:
+        size = max(1, int(round(invariant.shape[0] * scale)))
+        invariant = cv2.resize(invariant, (size, size), interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR)
+    result = _correlation_engine(context, levels).match(invariant)
+    candidates = find_peaks(result, CANDIDATE_THRESHOLD)
+    if not candidates:
+        return []
+
+    image = context.pyramid_level(levels)
+    _area, left, top = _search_area(context, levels)
+    positions = np.array([(x + left, y + top) for x, y, _score in candidates])
+    coarse = {}
+    for start in range(0, len(positions), CLASSIFY_BATCH):
+        batch = positions[start:start + CLASSIFY_BATCH]
+        for orientation, x, y, score in zip(*_classify_candidates(image, batch[:, 0], batch[:, 1], templates)):
+            key = (int(x), int(y), int(orientation))
+            if score >= thresholds[orientation] - tolerance and score > coarse.get(key, -1):
+                coarse[key] = float(score)
+    return sorted((x, y, score, orientation) for (x, y, orientation), score in coarse.items())
+
+def _search_area(context, level):
+    """
+    The part of a pyramid level searched for arrows (the board region, see
+    board_region.py) and its top-left corner in the level's coordinates.
+    """
+    image = context.pyramid_level(level)
+    region = board_region(context)
+    if region is None:
+        return image, 0, 0
+
+    factor = 2**level
+    left, top, right, bottom = region
+    left, top = left // factor, top // factor
+    right, bottom = -(-right // factor), -(-bottom // factor)
+    return image[top:bottom, left:right], left, top
+
+def _correlation_engine(context, level):
+    """CorrelationEngine over the searched part of a pyramid level, shared by every template matched against it"""
+    return context.cached(("correlation_engine", level), lambda: CorrelationEngine(_search_area(context, level)[0]))
+
+def _find_arrows(context, thresholds, pyramid_levels=None, pyramid_tolerance=None):
+    """Orientation-labelled peaks, as (x, y, score, orientation), at or above their orientation's threshold"""
+    if pyramid_levels is None:
+        pyramid_levels = PYRAMID_LEVELS
+    if pyramid_tolerance is None:
+        pyramid_tolerance = PYRAMID_TOLERANCE
+
+    correct_template = get_template(CORRECT_TEMPLATE_PATH)
+    if correct_template is None:
+        return []
+    levels = _pyramid_levels_for(correct_template, pyramid_levels)
+    candidates = _find_arrow_candidates(context, thresholds, levels, pyramid_tolerance)
+
+    peaks = []
+    for orientation, path in ORIENTATION_TEMPLATE_PATHS.items():
+        coarse_peaks = [(x, y, None) for x, y, _score, label in candidates if label == orientation]
+        if coarse_peaks:
+            refined = _refine_candidates(context.gray, get_template(path), coarse_peaks, levels, thresholds[orientation])
+            peaks.extend((x, y, score, orientation) for x, y, score in refined)
+    return peaks
+
+def _match_arrows(context, correct_threshold, incorrect_threshold):
+    """
+    Find arrows and their orientations, suppressing duplicates.
+
+    Results are memoised on the analysis context, so validation and tile
+    detection share a single detection pass.
+
+    Returns:
+        list of (x, y, score, orientation) ranked by confidence, one per arrow;
+        orientation is 0 for a correctly placed arrow, else 90, 180 or 270
+    """
+    def compute():
+        thresholds = {orientation: correct_threshold if orientation == 0 else incorrect_threshold
+                      for orientation in ORIENTATION_TEMPLATE_PATHS}
+        with stage("arrow_match"):
+            peaks = _find_arrows(context, thresholds)
+        with stage("nms"):
+            # Across orientations too: one arrow gets the label of its best match
+            return non_max_suppression(peaks, DUPLICATE_DISTANCE)
+
+    cache_key = ("arrow_matches", correct_threshold, incorrect_threshold, PYRAMID_LEVELS, PYRAMID_TOLERANCE)
+    return context.cached(cache_key, compute)
+
+def detect_arrows(image_path, correct_threshold=ARROW_THRESHOLD, incorrect_threshold=ARROW_THRESHOLD):
+    """
+    Detect every arrow on a Beacon Patrol board with its orientation.
+
+    Args:
+        image_path: Path to the board image, or an AnalysisContext
+
+    Returns:
+        list of (x, y, orientation) tuples, best match first; orientation is
+        0 for a correctly placed arrow, else 90, 180 or 270
+    """
+    context = get_analysis_context(image_path)
+    if context is None:
+        return []
+
+    return [(x, y, orientation) for x, y, _score, orientation in _match_arrows(context, correct_threshold, incorrect_threshold)]
+
+def detect_arrows_at_scale(image_path, template_scale, threshold=ARROW_THRESHOLD):
+    """
+    Detect arrows in a photo whose arrows are template_scale times the
+    templates' size, by resizing the (cached) templates rather than the photo.
+
+    The sweep runs on the coarsest pyramid level that keeps the templates at
+    MIN_SWEEP_TEMPLATE_SCALE or more, so large scales are the cheapest to
+    search. Candidates must classify at threshold outright, as there is no
+    full-resolution refinement; positions are only as accurate as the level,
+    which is enough to measure a tile pitch.
+
+    Args:
+        image_path: Path to the board image, or an AnalysisContext
+        template_scale: one of template_registry.TEMPLATE_SCALES, ideally
+
+    Returns:
+        list of (x, y, orientation) tuples in the photo's pixels, best match first
+    """
+    context = get_analysis_context(image_path)
+    if context is None:
+        return []
+
+    levels = max(0, int(np.floor(np.log2(template_scale / MIN_SWEEP_TEMPLATE_SCALE))))
+    thresholds = {orientation: threshold for orientation in ORIENTATION_TEMPLATE_PATHS}
+    with stage("arrow_match"):
+        candidates = _find_arrow_candidates(context, thresholds, levels, 0, template_scale)
+    with stage("nms"):
+        arrows = non_max_suppression(candidates, DUPLICATE_DISTANCE * template_scale / 2**levels)
+    return [(x * 2**levels, y * 2**levels, orientation) for x, y, _score, orientation in arrows]
+
+def get_arrow_positions(image_path, correct_threshold=ARROW_THRESHOLD, incorrect_threshold=ARROW_THRESHOLD):
     """
     Detect correct and incorrect arrow orientations on a Beacon Patrol board.
 
+    Args:
+        image_path: Path to the board image, or an AnalysisContext
+
     Returns:
         array of tuples
     """
-
-    image = cv2.imread(image_path)
-    if image is None:
+    context = get_analysis_context(image_path)
+    if context is None:
         return [], [], None
-        
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    
-    # Template paths
-    correct_template_path = "images/templates/arrow_tight_crop.png"
 
-    incorrect_template_paths = [
-        "images/templates/arrow_tight_90.png",
-        "images/templates/arrow_tight_180.png",
-        "images/templates/arrow_tight_270.png",
-    ]
+    arrows = detect_arrows(context, correct_threshold, incorrect_threshold)
+    unique_correct_positions = [(x, y) for x, y, orientation in arrows if orientation == 0]
+    unique_incorrect_positions = [(x, y) for x, y, orientation in arrows if orientation != 0]
+
+    return unique_correct_positions, unique_incorrect_positions, context.image
+
+def detect_arrow_orientations(image_path, correct_threshold=ARROW_THRESHOLD, incorrect_threshold=ARROW_THRESHOLD):
+    """
+    Count correct and incorrect arrows and mark the incorrect ones.
 
-    correct_detections = []
-    incorrect_detections = []
-    
-    # Find correct arrows
-    template = cv2.imread(correct_template_path, cv2.IMREAD_GRAYSCALE)
-    if template is not None:
-        result = cv2.matchTemplate(gray, template, cv2.TM_CCOEFF_NORMED)
-        locations = np.where(result >= correct_threshold)
-        points = list(zip(*locations[::-1]))
-        correct_detections.extend(points)
-    
-    # Remove duplicates from correct detections
-    unique_correct_positions = []
-    for point in correct_detections:
-        is_duplicate = False
-        for existing in unique_correct_positions:
-            distance = ((point[0] - existing[0])**2 + (point[1] - existing[1])**2)**0.5
-            if distance < 40:
-                is_duplicate = True
-                break
-        if not is_duplicate:
-            unique_correct_positions.append(point)
-
-    # Find incorrect arrows
-    for template_path in incorrect_template_paths:
-        template = cv2.imread(template_path, cv2.IMREAD_GRAYSCALE)
-        if template is None:
-            continue
-            
-        result = cv2.matchTemplate(gray, template, cv2.TM_CCOEFF_NORMED)
-        locations = np.where(result >= incorrect_threshold)
-        points = list(zip(*locations[::-1]))
-        incorrect_detections.extend(points)
-    
-    # Remove duplicates from incorrect detections
-    unique_incorrect_positions = []
-    for point in incorrect_detections:
-        is_duplicate = False
-        for existing in unique_incorrect_positions:
-            distance = ((point[0] - existing[0])**2 + (point[1] - existing[1])**2)**0.5
-            if distance < 40:
-                is_duplicate = True
-                break
-        if not is_duplicate:
-            unique_incorrect_positions.append(point)
-
-    return unique_correct_positions, unique_incorrect_positions, image
-
-def detect_arrow_orientations(image_path, correct_threshold=0.79, incorrect_threshold=0.79):
-    """
-    Two-pass arrow detection:
-    1. Find correct arrows with lower threshold
-    2. Find incorrect arrows, but exclude areas near correct arrows
-    
     Args:
-        image_path (str): Path to the board image
+        image_path: Path to the board image, or an AnalysisContext
     
     Returns:
         tuple: (correct_count, incorrect_count, annotated_image)
     """
-    image = cv2.imread(image_path)
-    if image is None:
+    context = get_analysis_context(image_path)
+    if context is None:
         return 0, 0, None
-        
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    
-    # Template paths
-    correct_template_path = "images/templates/arrow_tight_crop.png"
-    incorrect_template_paths = [
-        "images/templates/arrow_tight_90.png",
-        "images/templates/arrow_tight_180.png",
-        "images/templates/arrow_tight_270.png",
-    ]
-    
-    result_image = image.copy()
-    
-    # PASS 1: Find correct arrows (more lenient threshold)
-    print(f"PASS 1: Looking for correct arrows (threshold: {correct_threshold})")
-    correct_detections = []
-    
-    template = cv2.imread(correct_template_path, cv2.IMREAD_GRAYSCALE)
-    if template is not None:
-        result = cv2.matchTemplate(gray, template, cv2.TM_CCOEFF_NORMED)
-        locations = np.where(result >= correct_threshold)
-        points = list(zip(*locations[::-1]))
-        correct_detections.extend(points)
-        print(f"Found {len(points)} potential correct arrows")
-    
-    # Remove duplicates from correct detections
-    unique_correct = []
-    for point in correct_detections:
-        is_duplicate = False
-        for existing in unique_correct:
-            distance = ((point[0] - existing[0])**2 + (point[1] - existing[1])**2)**0.5
-            if distance < 40:
-                is_duplicate = True
-                break
-        if not is_duplicate:
-            unique_correct.append(point)
-    
-    print(f"After deduplication: {len(unique_correct)} correct arrows")
-    
-    # PASS 2: Find incorrect arrows, but exclude areas near correct arrows
-    print(f"PASS 2: Looking for incorrect arrows (threshold: {incorrect_threshold})")
-    incorrect_detections = []
-    
-    for template_path in incorrect_template_paths:
-        template = cv2.imread(template_path, cv2.IMREAD_GRAYSCALE)
-        if template is None:
-            continue
-            
-        result = cv2.matchTemplate(gray, template, cv2.TM_CCOEFF_NORMED)
-        locations = np.where(result >= incorrect_threshold)
-        points = list(zip(*locations[::-1]))
-        
-        print(f"Template {template_path}: found {len(points)} potential matches")
-        incorrect_detections.extend(points)
-    
-    # Remove duplicates from incorrect detections
-    unique_incorrect = []
-    for point in incorrect_detections:
-        is_duplicate = False
-        for existing in unique_incorrect:
-            distance = ((point[0] - existing[0])**2 + (point[1] - existing[1])**2)**0.5
-            if distance < 40:
-                is_duplicate = True
-                break
-        if not is_duplicate:
-            unique_incorrect.append(point)
-    
-    print(f"Before exclusion: {len(unique_incorrect)} incorrect arrows")
-    
-    # EXCLUSION: Remove incorrect arrows that are too close to correct arrows
-    filtered_incorrect = []
-    exclusion_distance = 35  # pixels
-    
-    for incorrect_point in unique_incorrect:
-        too_close_to_correct = False
-        
-        for correct_point in unique_correct:
-            distance = ((incorrect_point[0] - correct_point[0])**2 + (incorrect_point[1] - correct_point[1])**2)**0.5
-            if distance < exclusion_distance:
-                too_close_to_correct = True
-                print(f"Excluding incorrect arrow at {incorrect_point} - too close to correct arrow at {correct_point} (distance: {distance:.1f})")
-                break
-        
-        if not too_close_to_correct:
-            filtered_incorrect.append(incorrect_point)
-    
-    print(f"After exclusion: {len(filtered_incorrect)} incorrect arrows")
+
+    result_image = context.original_image.copy()
+
+    unique_correct, unique_incorrect, _image = get_arrow_positions(context, correct_threshold, incorrect_threshold)
+    logger.debug("%d correct arrows (threshold: %s)", len(unique_correct), correct_threshold)
+    logger.debug("%d incorrect arrows (threshold: %s)", len(unique_incorrect), incorrect_threshold)
     
-    # Highlight incorrect arrows in red (only the filtered ones)
-    for pt in filtered_incorrect:
-        adjusted_x = pt[0] - 15
-        adjusted_y = pt[1] - 15
-        box_width = 45
-        box_height = 45
+    # Highlight incorrect arrows in red, on the photo as uploaded
+    for pt in unique_incorrect:
+        adjusted_x, adjusted_y, box_width, box_height = context.to_original(pt[0] - 15, pt[1] - 15, 45, 45)
         bgr_colour = (0, 0, 139)  # Red in BGR
         font_size = 1.5
 
         cv2.rectangle(result_image, (adjusted_x, adjusted_y), (adjusted_x + box_width, adjusted_y + box_height), bgr_colour, 3)
         cv2.putText(result_image, "X", (adjusted_x + 50, adjusted_y + 20), cv2.FONT_HERSHEY_SIMPLEX, font_size, bgr_colour, 4)
     
-    return len(unique_correct), len(filtered_incorrect), result_image
+    return len(unique_correct), len(unique_incorrect), result_image
 
 
 def validate_board_arrows(image_path):
@@ -196,7 +353,7 @@ def validate_board_arrows(image_path):
     Validate that all arrows on a board are pointing in the correct direction.
     
     Args:
-        image_path (str): Path to the board image
+        image_path: Path to the board image, or an AnalysisContext
     
     Returns:
         tuple: (is_valid, message, correct_count, incorrect_count, annotated_image)
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for the blue-water board check.
+
+Compares the vectorised board_analyzer._blue_percentage against the
+original per-pixel implementation on real boards and large synthetic photos.
+
+Usage: python benchmarks/bench_color_check.py [--repeat N]
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from board_analyzer import _blue_percentage
+
+def legacy_blue_percentage(img):
+    """The original implementation: one Python tuple per pixel"""
+    warnings.simplefilter("ignore", DeprecationWarning)  # getdata() is kept here on purpose
+    pixels = list(img.convert("RGB").getdata())
+    sampled_pixels = pixels[::50]
+
+    blue_count = 0
+    for r, g, b in sampled_pixels:
+        if b > r and b > g and b > 100:
+            blue_count += 1
+    return blue_count / len(sampled_pixels)
+
+def best_time(func, img, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(img)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case; the best time is reported")
+    args = parser.parse_args()
+
+    cases = [(os.path.basename(path), Image.open(path)) for path in sorted(glob.glob("test_images/*/*.jpg"))]
+    rng = np.random.default_rng(0)
+    for size in (2000, 4000):
+        noise = rng.integers(0, 256, (size, size, 3), dtype=np.uint8)
+        cases.append((f"random_{size}x{size}", Image.fromarray(noise)))
+
+    print(f"{'image':32} {'legacy ms':>10} {'numpy ms':>10} {'speedup':>8}  match")
+    for name, img in cases:
+        legacy_time, legacy_result = best_time(legacy_blue_percentage, img, args.repeat)
+        new_time, new_result = best_time(_blue_percentage, img, args.repeat)
+        print(f"{name:32} {legacy_time * 1000:10.1f} {new_time * 1000:10.1f} {legacy_time / new_time:7.0f}x  {legacy_result == new_result}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Benchmark the CorrelationEngine against one cv2.matchTemplate call per
+template, on every board in test_images/.
+
+The four arrow templates (correct plus 90/180/270 rotations) are matched
+at pyramid level 1 (the coarse pass arrow detection runs) and at full
+resolution. For each the script reports the best time of both approaches
+and the largest difference between their TM_CCOEFF_NORMED scores.
+
+Usage: python benchmarks/bench_correlation.py [--repeat N]
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+
+import arrow_detection
+from analysis_context import AnalysisContext
+from correlation import CorrelationEngine
+from template_registry import get_scaled_template
+
+def best_time(run, repeat):
+    """Best wall time (s) of run() over repeat runs, plus its last result"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case; the best time is reported")
+    args = parser.parse_args()
+
+    template_paths = [arrow_detection.CORRECT_TEMPLATE_PATH] + arrow_detection.INCORRECT_TEMPLATE_PATHS
+
+    print(f"{'image':32} {'level':>5} {'matchTemplate ms':>17} {'engine ms':>10} {'speedup':>8} {'max diff':>9}")
+    totals = {}
+    for path in sorted(glob.glob("test_images/*/*.jpg")):
+        context = AnalysisContext.from_path(path)
+        for level in (1, 0):
+            image = context.pyramid_level(level)
+            templates = [get_scaled_template(template_path, 1 / 2**level) for template_path in template_paths]
+
+            opencv_time, expected = best_time(
+                lambda: [cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED) for template in templates], args.repeat)
+            # A fresh engine per run, so nothing carries over between runs
+            engine_time, results = best_time(
+                lambda: [engine.match(template) for engine in [CorrelationEngine(image)] for template in templates],
+                args.repeat)
+
+            difference = max(float(np.abs(result - reference).max()) for result, reference in zip(results, expected))
+            total_opencv, total_engine = totals.get(level, (0, 0))
+            totals[level] = (total_opencv + opencv_time, total_engine + engine_time)
+            print(f"{os.path.basename(path):32} {level:5} {opencv_time * 1000:17.1f} {engine_time * 1000:10.1f} "
+                  f"{opencv_time / engine_time:7.1f}x {difference:9.1e}")
+
+    for level, (total_opencv, total_engine) in sorted(totals.items(), reverse=True):
+        print(f"{'TOTAL':32} {level:5} {total_opencv * 1000:17.1f} {total_engine * 1000:10.1f} "
+              f"{total_opencv / total_engine:7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Benchmark coarse-to-fine (pyramid) arrow matching against full-resolution
+matching on every board in test_images/.
+
+For each board both modes run on a fresh AnalysisContext; the script
+reports the best time of each and whether the detected arrows agree.
+
+Usage: python benchmarks/bench_pyramid.py [--levels N] [--tolerance T] [--repeat N]
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import arrow_detection
+from analysis_context import AnalysisContext
+
+def run_arrow_matching(image, levels, tolerance, repeat):
+    """Best-of-repeat time for arrow matching, plus the detected positions"""
+    arrow_detection.PYRAMID_LEVELS = levels
+    arrow_detection.PYRAMID_TOLERANCE = tolerance
+
+    timings = []
+    for _ in range(repeat):
+        context = AnalysisContext(image)
+        start = time.perf_counter()
+        arrows = arrow_detection._match_arrows(context, 0.79, 0.79)
+        timings.append(time.perf_counter() - start)
+
+    return min(timings), sorted((x, y, orientation) for x, y, _score, orientation in arrows)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", type=int, default=1, help="Pyramid levels to benchmark")
+    parser.add_argument("--tolerance", type=float, default=arrow_detection.PYRAMID_TOLERANCE, help="Coarse threshold slack")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case; the best time is reported")
+    args = parser.parse_args()
+
+    print(f"{'image':32} {'full ms':>9} {'pyramid ms':>11} {'speedup':>8}  same arrows")
+    total_full = total_pyramid = 0
+    for path in sorted(glob.glob("test_images/*/*.jpg")):
+        image = AnalysisContext.from_path(path).image
+        full_time, full_positions = run_arrow_matching(image, 0, args.tolerance, args.repeat)
+        pyramid_time, pyramid_positions = run_arrow_matching(image, args.levels, args.tolerance, args.repeat)
+        total_full += full_time
+        total_pyramid += pyramid_time
+        print(f"{os.path.basename(path):32} {full_time * 1000:9.1f} {pyramid_time * 1000:11.1f} "
+              f"{full_time / pyramid_time:7.1f}x  {full_positions == pyramid_positions}")
+
+    print(f"{'TOTAL':32} {total_full * 1000:9.1f} {total_pyramid * 1000:11.1f} {total_full / total_pyramid:7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Performance regression suite over test_images/ and synthetic boards.
+
+Every board in test_images/valid_boards and test_images/invalid_boards (plus
+synthetic boards of --synthetic sizes) runs in a fresh process through each
+pipeline stage and through analyze_complete_board end to end. For each board
+the suite records the best wall time per stage, the process's peak RSS, the
+number of cv2.matchTemplate and CorrelationEngine.match calls and the result
+(score / failed_at). Arrow matching is timed as the pipeline runs it, through
+resolution normalisation.
+
+The run is compared against a baseline JSON. Exit status is 1 if any board:
+  - is slower than baseline by more than --tolerance (per stage, ignoring
+    differences under MIN_SLOWDOWN_MS),
+  - uses more memory than baseline by more than --rss-tolerance,
+  - makes more matchTemplate or CorrelationEngine.match calls than baseline, or
+  - produces a different result.
+
+Timings are machine-specific: record a baseline on the machine you compare on.
+
+Usage:
+    python benchmarks/bench_regression.py --update-baseline
+    python benchmarks/bench_regression.py [--tolerance 0.5] [--synthetic 50,100,200]
+"""
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+MIN_SLOWDOWN_MS = 5  # Ignore slowdowns smaller than this; very short stages are mostly timer noise
+
+def _board_bytes(case):
+    """Encoded image bytes for a case name: a path under test_images/ or 'synthetic_<tiles>'"""
+    if case.startswith("synthetic_"):
+        import cv2
+        from synthetic_boards import generate_board
+        image, _truth = generate_board(int(case.split("_")[1]), seed=0)
+        return cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 95])[1].tobytes()
+    with open(os.path.join(ROOT, case), "rb") as f:
+        return f.read()
+
+def _best_time(run, prepare, repeat):
+    """Best wall time (ms) of run(prepare()) over repeat runs; prepare isn't timed"""
+    best = None
+    for _ in range(repeat):
+        state = prepare()
+        start = time.perf_counter()
+        run(state)
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best, 2)
+
+def measure_board(case, repeat):
+    """Benchmark one board (runs in its own process so peak RSS is per board)"""
+    import cv2
+    import arrow_detection
+    from analysis_context import AnalysisContext
+    from board_analyzer import _check_board_colors, analyze_complete_board
+    from correlation import CorrelationEngine
+    from logging_config import configure_logging
+    from resolution import normalise_resolution
+    from scored_objects_detector import calculate_board_score
+    from tile_analyzer import detect_scorable_tiles
+
+    configure_logging("WARNING")
+    data = _board_bytes(case)
+    image = AnalysisContext.from_bytes(data).image
+
+    def fresh_context():
+        return AnalysisContext(image)
+
+    def match_arrows(context):
+        # As the pipeline does it: at the normalised resolution, which may take a scale search
+        context = normalise_resolution(context)
+        arrow_detection.detect_arrows(context)
+        return context
+
+    def with_arrows():
+        return match_arrows(fresh_context())
+
+    def with_tiles():
+        context = with_arrows()
+        detect_scorable_tiles(context)
+        return context
+
+    timings = {
+        'decode': _best_time(lambda d: AnalysisContext.from_bytes(d), lambda: data, repeat),
+        'color_check': _best_time(_check_board_colors, fresh_context, repeat),
+        'arrow_match': _best_time(match_arrows, fresh_context, repeat),
+        'tile_detection': _best_time(detect_scorable_tiles, with_arrows, repeat),
+        'classification': _best_time(calculate_board_score, with_tiles, repeat),
+        'end_to_end': _best_time(lambda d: analyze_complete_board(d, annotate=False), lambda: data, repeat),
+    }
+
+    # Count matchTemplate and correlation engine calls over one end-to-end run
+    calls = {'match_template': 0, 'correlation': 0}
+    match_template = cv2.matchTemplate
+    engine_match = CorrelationEngine.match
+    def counting_match_template(*args, **kwargs):
+        calls['match_template'] += 1
+        return match_template(*args, **kwargs)
+    def counting_engine_match(*args, **kwargs):
+        calls['correlation'] += 1
+        return engine_match(*args, **kwargs)
+    cv2.matchTemplate = counting_match_template
+    CorrelationEngine.match = counting_engine_match
+    try:
+        result = analyze_complete_board(data, annotate=False)
+    finally:
+        cv2.matchTemplate = match_template
+        CorrelationEngine.match = engine_match
+
+    return {
+        'timings_ms': timings,
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),  # ru_maxrss is KiB on Linux
+        'match_template_calls': calls['match_template'],
+        'correlation_calls': calls['correlation'],
+        'result': {'is_valid': result['is_valid'], 'score': result.get('score'), 'failed_at': result.get('failed_at')},
+    }
+
+def collect_cases(synthetic_sizes):
+    cases = sorted(os.path.relpath(path, ROOT) for folder in ("valid_boards", "invalid_boards")
+                   for path in glob.glob(os.path.join(ROOT, "test_images", folder, "*.jpg")))
+    return cases + [f"synthetic_{tiles}" for tiles in synthetic_sizes]
+
+def run_suite(cases, repeat):
+    """Measure every case, each in a fresh worker process"""
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for case in cases:
+        with context.Pool(processes=1, maxtasksperchild=1) as pool:
+            results[case] = pool.apply(measure_board, (case, repeat))
+        end_to_end = results[case]['timings_ms']['end_to_end']
+        print(f"{case:56} {end_to_end:9.1f} ms  {results[case]['peak_rss_mb']:7.1f} MB  "
+              f"{results[case]['match_template_calls']:5} matchTemplate  "
+              f"{results[case]['correlation_calls']:4} correlation", file=sys.stderr)
+    return results
+
+def compare(results, baseline, tolerance, rss_tolerance):
+    """List of human-readable regressions against the baseline"""
+    regressions = []
+    for case, current in results.items():
+        base = baseline.get(case)
+        if base is None:
+            continue  # New board, nothing to compare with
+        for stage, ms in current['timings_ms'].items():
+            base_ms = base['timings_ms'].get(stage)
+            if base_ms and ms > base_ms * (1 + tolerance) and ms - base_ms > MIN_SLOWDOWN_MS:
+                regressions.append(f"{case}: {stage} {ms:.1f} ms vs {base_ms:.1f} ms baseline")
+        if current['peak_rss_mb'] > base['peak_rss_mb'] * (1 + rss_tolerance):
+            regressions.append(f"{case}: peak RSS {current['peak_rss_mb']} MB vs {base['peak_rss_mb']} MB baseline")
+        for calls, name in (('match_template_calls', "matchTemplate"), ('correlation_calls', "CorrelationEngine.match")):
+            if calls in base and current[calls] > base[calls]:
+                regressions.append(f"{case}: {current[calls]} {name} calls vs {base[calls]} baseline")
+        if current['result'] != base['result']:
+            regressions.append(f"{case}: result {current['result']} vs {base['result']} baseline")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON to compare with or update")
+    parser.add_argument("--update-baseline", action="store_true", help="Record this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed slowdown per stage (0.5 = 50%%)")
+    parser.add_argument("--rss-tolerance", type=float, default=0.15, help="Allowed peak RSS growth")
+    parser.add_argument("--synthetic", default="50,100,200", help="Comma-separated synthetic board sizes ('' for none)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage; the best time is kept")
+    parser.add_argument("--output", help="Also write this run's measurements to a JSON file")
+    args = parser.parse_args(argv)
+
+    synthetic_sizes = [int(size) for size in args.synthetic.split(",") if size.strip()]
+    results = run_suite(collect_cases(synthetic_sizes), args.repeat)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline first")
+        return 2
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    regressions = compare(results, baseline, args.tolerance, args.rss_tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    print(f"{len(results)} boards, {len(regressions)} regressions")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Scaling and accuracy of tile detection and scoring on synthetic boards.
+
+For each board size (and layout) a synthetic board is generated with known
+ground truth. The script times detect_scorable_tiles (arrows already
+matched) and calculate_board_score (tiles already detected) on a fresh
+AnalysisContext, and compares detected tiles, scorable tiles and score with
+the ground truth.
+
+Usage: python benchmarks/bench_scaling.py [--sizes 25,50,100,200] [--layouts grid,blob]
+                                          [--noise N] [--jpeg-quality Q] [--scale S] [--check]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import arrow_detection
+from analysis_context import AnalysisContext
+from logging_config import configure_logging
+from scored_objects_detector import calculate_board_score
+from synthetic_boards import generate_board
+from tile_analyzer import detect_scorable_tiles
+
+def measure(image, repeat):
+    """Best times (ms) for tile detection and scoring, plus the detected results"""
+    detect_times, score_times = [], []
+    for _ in range(repeat):
+        context = AnalysisContext(image)
+        arrow_detection._match_arrows(context, arrow_detection.ARROW_THRESHOLD, arrow_detection.ARROW_THRESHOLD)
+
+        start = time.perf_counter()
+        total_tiles, scorable_count, _annotated, _boundaries = detect_scorable_tiles(context)
+        detect_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        score = calculate_board_score(context)['score']
+        score_times.append(time.perf_counter() - start)
+
+    return min(detect_times) * 1000, min(score_times) * 1000, total_tiles, scorable_count, score
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="25,50,100,200", help="Comma-separated tile counts")
+    parser.add_argument("--layouts", default="grid,blob", help="Comma-separated layouts")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--noise", type=float, default=0.0, help="Gaussian noise standard deviation")
+    parser.add_argument("--jpeg-quality", type=int, help="Round-trip boards through JPEG at this quality")
+    parser.add_argument("--scale", type=float, default=1.0, help="Resize boards by this factor")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per board; the best time is reported")
+    parser.add_argument("--check", action="store_true", help="Exit 1 if any board disagrees with its ground truth")
+    args = parser.parse_args()
+    configure_logging("WARNING")
+
+    print(f"{'layout':6} {'tiles':>5} {'detect ms':>10} {'score ms':>9}  {'tiles':>9} {'scorable':>9} {'score':>9}")
+    mismatches = 0
+    for layout in args.layouts.split(","):
+        for tiles in (int(size) for size in args.sizes.split(",")):
+            image, truth = generate_board(tiles, seed=args.seed, layout=layout, noise=args.noise,
+                                          jpeg_quality=args.jpeg_quality, scale=args.scale)
+            detect_ms, score_ms, total, scorable, score = measure(image, args.repeat)
+            correct = (total, scorable, score) == (truth['tile_count'], truth['scorable_tiles'], truth['expected_score'])
+            mismatches += not correct
+            # Detected/expected for each accuracy column
+            print(f"{layout:6} {tiles:5} {detect_ms:10.1f} {score_ms:9.1f}  {total:>4}/{truth['tile_count']:<4} "
+                  f"{scorable:>4}/{truth['scorable_tiles']:<4} {score:>4}/{truth['expected_score']:<4}"
+                  f"{'' if correct else '  MISMATCH'}")
+
+    return 1 if args.check and mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
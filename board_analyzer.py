@@ -1,55 +1,200 @@
 from PIL import Image
 import cv2
+import io
 import os
 import numpy as np
-from arrow_detection import validate_board_arrows
+import arrow_detection
+import board_region
+import resolution
+import scored_objects_detector
+from analysis_context import MAX_IMAGE_SIZE, REDUCED_DECODE_FLAGS, AnalysisContext, decode_reduction, get_analysis_context
+from arrow_detection import detect_arrows_at_scale, validate_board_arrows
+from color_stats import is_board_blue
+from instrumentation import collect_timings, stage
+from resolution import normalise_resolution
 from scored_objects_detector import calculate_board_score, generate_annotated_image
+from template_registry import TEMPLATE_SCALES, template_set_version
 
-def _is_blue(pixel):
-    r, g, b = pixel
+BLUE_SAMPLE_STEP = 50  # _blue_percentage checks every 50th pixel by default
+BLUE_THRESHOLD = 0.15  # Minimum fraction of blue pixels for a board photo
+THUMBNAIL_REDUCTION = 8  # Every image is colour-checked at 1/8 scale
+MIN_IMAGE_SIZE = 200  # Pixels a side
+ARROW_CHECK_SIZE = 900  # Arrow presence is checked on a reduced decode at least this many pixels on its long side
+MIN_ARROW_CHECK_TEMPLATE_SCALE = 0.5  # Templates shrunk further (below 8 px) find arrows in noise
 
-    return b > r and b > g and b > 100
+def _is_blue(pixels):
+    """Boolean mask of water-blue pixels for an (N, 3) RGB array"""
+    return is_board_blue(pixels[:, 0], pixels[:, 1], pixels[:, 2])
+
+def detector_config():
+    """Every setting that can change a board's result (used to key cached results)"""
+    return {
+        'blue_threshold': BLUE_THRESHOLD,
+        'thumbnail_reduction': THUMBNAIL_REDUCTION,
+        'max_image_size': MAX_IMAGE_SIZE,
+        'arrow_check_size': ARROW_CHECK_SIZE,
+        'min_arrow_check_template_scale': MIN_ARROW_CHECK_TEMPLATE_SCALE,
+        'arrow_threshold': arrow_detection.ARROW_THRESHOLD,
+        'duplicate_distance': arrow_detection.DUPLICATE_DISTANCE,
+        'arrow_candidate_threshold': arrow_detection.CANDIDATE_THRESHOLD,
+        'arrow_candidate_neighbourhood': arrow_detection.CANDIDATE_NEIGHBOURHOOD,
+        'board_region_padding': board_region.REGION_PADDING,
+        'canonical_tile_pitch': resolution.CANONICAL_TILE_PITCH,
+        'scale_tolerance': resolution.SCALE_TOLERANCE,
+        'pyramid_levels': arrow_detection.PYRAMID_LEVELS,
+        'pyramid_tolerance': arrow_detection.PYRAMID_TOLERANCE,
+        'object_threshold': scored_objects_detector.OBJECT_THRESHOLD,
+        'templates': template_set_version()
+    }
 
 def _is_valid_image_size(image_input):
+    return _is_valid_dimensions(*_image_size(image_input))
+
+def _is_valid_dimensions(width, height):
+    return MIN_IMAGE_SIZE <= width <= MAX_IMAGE_SIZE and MIN_IMAGE_SIZE <= height <= MAX_IMAGE_SIZE
+
+def _image_size(image_input):
+    """(width, height) of a context, BGR array, PIL image or image file"""
+    return _image_header(image_input)[:2]
+
+def _image_header(image_input):
+    """
+    (width, height, format) of a context, BGR array, PIL image or image file.
+
+    Image files are identified from their header alone, without decoding any
+    pixels; format is PIL's name for theirs ('JPEG', 'PNG', ...) and None for
+    images that are already decoded.
+    """
+    if isinstance(image_input, AnalysisContext):
+        image_input = image_input.image
+    if isinstance(image_input, np.ndarray):
+        height, width = image_input.shape[:2]
+        return width, height, None
     if hasattr(image_input, 'size'):
         width, height = image_input.size
-    else:
-        # It's a file path
-        with Image.open(image_input) as img:
-            width, height = img.size
-    
-    return 200 <= width <= 4000 and 200 <= height <= 4000
+        return width, height, None
+
+    # A file path or file object
+    if hasattr(image_input, 'seek'):
+        image_input.seek(0)
+    with Image.open(image_input) as img:
+        width, height = img.size
+        return width, height, img.format
+
+def _decode_reduction(width, height, image_format):
+    """
+    Factor to reduce an image by while decoding it (1 if it fits
+    MAX_IMAGE_SIZE as it is), or None if its size is out of range.
+
+    Only JPEGs are reduced, as libjpeg can do it without ever holding the
+    full-size pixels; anything else larger than MAX_IMAGE_SIZE is rejected.
+    """
+    if _is_valid_dimensions(width, height):
+        return 1
+    if image_format != 'JPEG':
+        return None
+    reduction = decode_reduction(width, height, MAX_IMAGE_SIZE)
+    if reduction is None or not _is_valid_dimensions(-(-width // reduction), -(-height // reduction)):
+        return None
+    return reduction
 
 def _check_board_colors(image_input):
-    """Validate that image has enough blue to be a Beacon Patrol board"""
-    # Convert to PIL Image if needed
-    if hasattr(image_input, 'read'):
+    """Validate that image has enough blue to be a Beacon Patrol board, from every pixel of its thumbnail"""
+    return _blue_percentage(_thumbnail(image_input), step=1) > BLUE_THRESHOLD
+
+def _thumbnail(image_input):
+    """
+    A context, BGR array, PIL image or image file (path or file object) at
+    1/THUMBNAIL_REDUCTION scale, for the colour check.
+
+    JPEG files are decoded straight to that scale with libjpeg's DCT scaling
+    (PIL's draft mode), which skips most of the decoding work. Everything
+    else is shrunk by averaging, as DCT scaling does, so every input is
+    checked the same way.
+
+    Returns:
+        BGR array for decoded arrays and contexts, else an RGB PIL image
+    """
+    if isinstance(image_input, AnalysisContext):
+        image_input = image_input.image
+    if isinstance(image_input, np.ndarray):
+        height, width = image_input.shape[:2]
+        size = (-(-width // THUMBNAIL_REDUCTION), -(-height // THUMBNAIL_REDUCTION))  # Rounded up, as libjpeg and PIL do
+        # Averaging four pixels of each block (every fourth of each row and
+        # column) gives the colour fraction of whole blocks, in a fifth of the time
+        step = THUMBNAIL_REDUCTION // 2
+        return cv2.resize(image_input[::step, ::step], size, interpolation=cv2.INTER_AREA)
+    if not (hasattr(image_input, 'read') or isinstance(image_input, str)):
+        return image_input.convert('RGB').reduce(THUMBNAIL_REDUCTION)
+
+    if hasattr(image_input, 'seek'):
         image_input.seek(0)
-        img = Image.open(image_input)
-    elif isinstance(image_input, str):
-        img = Image.open(image_input)
+    with Image.open(image_input) as img:
+        width, height = img.size
+        img.draft('RGB', (max(1, width // THUMBNAIL_REDUCTION), max(1, height // THUMBNAIL_REDUCTION)))
+        reduced = img.size != (width, height)
+        img = img.convert('RGB')
+    return img if reduced else img.reduce(THUMBNAIL_REDUCTION)
+
+def _blue_percentage(img, step=BLUE_SAMPLE_STEP):
+    """Fraction of every step-th pixel that is water-blue, without per-pixel Python objects"""
+    if isinstance(img, np.ndarray):
+        pixels = img.reshape(-1, 3)[:, ::-1]  # Decoded BGR array, viewed as RGB
     else:
-        img = image_input
+        pixels = np.asarray(img.convert("RGB")).reshape(-1, 3)
+    sampled_pixels = pixels[::step]  # Strided view, no copy
+
+    return np.count_nonzero(_is_blue(sampled_pixels)) / len(sampled_pixels)
+
+def _arrow_check_factor(width, height, reduction):
+    """
+    How much further than reduction to reduce the decode arrow presence is
+    checked on: the most that keeps ARROW_CHECK_SIZE pixels on the long
+    side, 1 if a photo is too small to save anything.
+    """
+    factor = 1
+    while reduction * factor * 2 in REDUCED_DECODE_FLAGS and max(width, height) / (reduction * factor * 2) >= ARROW_CHECK_SIZE:
+        factor *= 2
+    return factor
 
-    img = img.convert("RGB")
-    pixels = list(img.getdata())
-    sampled_pixels = pixels[::50]  # Every 50th pixel
+def _has_arrows(context, factor):
+    """
+    Whether anything arrow-like shows at any of TEMPLATE_SCALES in context,
+    a copy of the analysed photo reduced by factor.
 
-    blue_count = 0
-    for pixel in sampled_pixels:
-        if _is_blue(pixel):
-            blue_count += 1
+    Matches only need the pipeline's coarse score (the full threshold less
+    the pyramid tolerance), and templates are never shrunk below
+    MIN_ARROW_CHECK_TEMPLATE_SCALE, so a real board is never turned away;
+    water with no tiles on it finds nothing.
+    """
+    threshold = arrow_detection.ARROW_THRESHOLD - arrow_detection.PYRAMID_TOLERANCE
+    template_scales = sorted({max(scale / factor, MIN_ARROW_CHECK_TEMPLATE_SCALE) for scale in TEMPLATE_SCALES})
+    return any(detect_arrows_at_scale(context, template_scale, threshold) for template_scale in template_scales)
 
-    blue_percentage = blue_count / len(sampled_pixels)
-    return blue_percentage > 0.15  # 15% threshold
+def _no_arrows_result():
+    return {
+        'is_valid': False,
+        'errors': ['No tile arrows found. Please upload a photo of a Beacon Patrol board.'],
+        'failed_at': 'arrow_check',
+        'details': {
+            'correct_arrows': 0,
+            'incorrect_arrows': 0
+        }
+    }
 
-def analyze_complete_board(image_input, save_path=None):
+def analyze_complete_board(image_input, save_path=None, annotated_path=None, annotate=True):
     """
     Complete board analysis pipeline with fail-fast validation.
     
     Args:
-        image_input: PIL Image object, BytesIO object, or file path
-        save_path: File path needed for arrow detection (optional)
+        image_input: PIL Image object, BytesIO object, or file path; or, for
+                     a fully in-memory run, encoded image bytes, a decoded
+                     BGR array or an AnalysisContext
+        save_path: File path needed for arrow detection (optional, not
+                   needed for in-memory inputs or when image_input is the path)
+        annotated_path: Where to write the scored image (default: <save_path>_scored<ext>;
+                        in-memory inputs without a save_path skip annotation)
+        annotate: Set to False to skip writing the scored image altogether
     
     Returns:
         dict: {
@@ -58,13 +203,44 @@ def analyze_complete_board(image_input, save_path=None):
             'rank': str,
             'errors': list,
             'failed_at': str (only if invalid),
-            'details': dict (additional analysis info)
+            'details': dict (additional analysis info, including per-stage
+                             'timings' in milliseconds unless instrumentation is off)
         }
     """
-    
-    # Check 1: Basic image size validation
+    measurements = {}
+    with collect_timings() as timings:
+        result = _analyze_complete_board(image_input, save_path, annotated_path, annotate, measurements)
+
+    if timings is not None:
+        measurements['timings'] = {name: round(ms, 1) for name, ms in timings.items()}
+    result.setdefault('details', {}).update(measurements)
+    return result
+
+def _analyze_complete_board(image_input, save_path, annotated_path, annotate, measurements):
+    """The pipeline itself; image dimensions are reported through measurements"""
+    # Decoded inputs are used as they are; encoded bytes are read like a file,
+    # and only decoded in full once the header and thumbnail checks pass
+    context = None
+    encoded = None
+    if isinstance(image_input, (bytes, bytearray, memoryview)):
+        encoded = image_input
+        image_input = io.BytesIO(encoded)
+    elif isinstance(image_input, (AnalysisContext, np.ndarray)):
+        context = get_analysis_context(image_input)
+        image_input = context
+    elif isinstance(image_input, (str, os.PathLike)):
+        # A file path is analysed from disk, and names the scored image, like save_path
+        image_input = os.fspath(image_input)
+        if save_path is None:
+            save_path = image_input
+
+    # Check 1: Basic image size validation, from the header alone for image files
     try:
-        if not _is_valid_image_size(image_input):
+        with stage("size_check"):
+            width, height, image_format = _image_header(image_input)
+        measurements['image_width'], measurements['image_height'] = width, height
+        reduction = _decode_reduction(width, height, image_format)
+        if reduction is None:
             return {
                 'is_valid': False,
                 'errors': ['Image too small (minimum 200x200) or too large (maximum 4000x4000)'],
@@ -79,7 +255,9 @@ def analyze_complete_board(image_input, save_path=None):
     
     # Check 2: Color validation (blue water check)
     try:
-        if not _check_board_colors(image_input):
+        with stage("color_check"):
+            has_board_colors = _check_board_colors(image_input)
+        if not has_board_colors:
             return {
                 'is_valid': False,
                 'errors': ['This does not look like a Beacon Patrol game. Please upload a different photo.'],
@@ -92,11 +270,53 @@ def analyze_complete_board(image_input, save_path=None):
             'failed_at': 'color_check'
         }
     
-    # Check 3: Arrow orientation validation (if we have a file path)
+    if reduction > 1:
+        measurements['decode_reduction'] = reduction
+
+    # Check 3a: Arrow presence, on a reduced decode, before any full-size work
+    factor = _arrow_check_factor(width, height, reduction)
+    if factor > 1 and (context is not None or encoded is not None or save_path):
+        try:
+            if encoded is not None:
+                reduced = AnalysisContext.from_bytes(encoded, reduction * factor)
+            elif context is not None:
+                reduced = AnalysisContext(cv2.resize(context.image, None, fx=1 / factor, fy=1 / factor, interpolation=cv2.INTER_AREA))
+            else:
+                reduced = AnalysisContext.from_path(save_path, reduction * factor)
+            if reduced is not None and not _has_arrows(reduced, factor):
+                return _no_arrows_result()
+        except Exception as e:
+            return {
+                'is_valid': False,
+                'errors': ['Error validating arrow orientations'],
+                'failed_at': 'arrow_check'
+            }
+
+    if encoded is not None:
+        context = AnalysisContext.from_bytes(encoded, reduction)
+        if context is None:
+            return {
+                'is_valid': False,
+                'errors': ['Could not read image file'],
+                'failed_at': 'image_read'
+            }
+
+    # Decode the saved file once; every later stage shares this context
+    analysis_source = context or save_path
+    if context is None and save_path:
+        analysis_source = AnalysisContext.from_path(save_path, reduction) or save_path
+
+    # Check 3b: Arrow orientation validation (if we have the image itself)
     arrow_details = {}
-    if save_path:
+    if context is not None or save_path:
         try:
-            is_valid_arrows, message, correct_count, incorrect_count, annotated_image = validate_board_arrows(save_path)
+            # Photos far from the canonical scale are analysed resized
+            if isinstance(analysis_source, AnalysisContext):
+                analysis_source = normalise_resolution(analysis_source)
+                if analysis_source.original is not None:
+                    measurements['analysis_scale'] = round(analysis_source.scale, 3)
+
+            is_valid_arrows, message, correct_count, incorrect_count, annotated_image = validate_board_arrows(analysis_source)
             
             if not is_valid_arrows:
                 return {
@@ -110,6 +330,10 @@ def analyze_complete_board(image_input, save_path=None):
                     'annotated_image': annotated_image
                 }
             
+            # Water without a single tile arrow is no board, whatever its colour
+            if correct_count == 0 and incorrect_count == 0:
+                return _no_arrows_result()
+
             arrow_details = {
                 'correct_arrows': correct_count,
                 'incorrect_arrows': incorrect_count,
@@ -125,13 +349,19 @@ def analyze_complete_board(image_input, save_path=None):
     
     # All hoops passed - calculate score
     try:
-        score_data = calculate_board_score(save_path)
+        score_data = calculate_board_score(analysis_source)
 
-        base_name, ext = os.path.splitext(save_path)
-        if not ext:  # No extension detected
-            ext = '.jpg'  # Default to jpg
-        annotated_filename = f"{base_name}_scored{ext}"
-        annotation_success = generate_annotated_image(save_path, annotated_filename)
+        annotated_filename = None
+        annotation_success = False
+        if annotate:
+            annotated_filename = annotated_path
+            if annotated_filename is None and (context is None or save_path):
+                base_name, ext = os.path.splitext(save_path)
+                if not ext:  # No extension detected
+                    ext = '.jpg'  # Default to jpg
+                annotated_filename = f"{base_name}_scored{ext}"
+            if annotated_filename is not None:
+                annotation_success = generate_annotated_image(analysis_source, annotated_filename)
         
         return {
             'is_valid': True,
@@ -141,6 +371,8 @@ def analyze_complete_board(image_input, save_path=None):
             'errors': [],
             'details': {
                 'passed_all_checks': True,
+                'total_tiles': score_data['total_tiles'],
+                'scorable_tiles': score_data['scorable_tiles'],
                 **arrow_details
             },
             'annotated_filename': annotated_filename if annotation_success else None
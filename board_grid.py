@@ -0,0 +1,137 @@
+from collections import defaultdict, deque
+
+# direction -> (column step, row step)
+DIRECTIONS = {
+    "left": (-1, 0),
+    "right": (1, 0),
+    "up": (0, -1),
+    "down": (0, 1),
+}
+
+# A neighbour must cover more than this fraction of the area next to a tile
+# (same rule as tile_analyzer._rectangles_overlap)
+MIN_NEIGHBOUR_OVERLAP = 0.7
+
+class BoardGrid:
+    """
+    Adjacency index over tile boundaries.
+
+    Each tile is snapped to an integer (col, row) cell by dividing its
+    top-left corner by the tile size, and stored in a dict keyed by cell.
+    A neighbour lookup only checks the tiles in the 3x3 cells around the
+    expected position, so finding every surrounded tile is O(n) instead of
+    comparing each tile with every other one. Candidates are still checked
+    with the overlap rule, so slightly misaligned tiles are judged exactly
+    as before.
+    """
+
+    def __init__(self, boundaries, tile_size=None):
+        """
+        Args:
+            boundaries: List of (left, top, right, bottom) tile rectangles
+            tile_size: (width, height); defaults to the size of the first tile
+        """
+        self.boundaries = list(boundaries)
+        if tile_size is None and self.boundaries:
+            left, top, right, bottom = self.boundaries[0]
+            tile_size = (right - left, bottom - top)
+        self.tile_width, self.tile_height = tile_size or (1, 1)
+
+        self._cells = [self._snap(left, top) for left, top, _right, _bottom in self.boundaries]
+        self._index = defaultdict(list)  # (col, row) -> tile indices
+        for i, cell in enumerate(self._cells):
+            self._index[cell].append(i)
+        self._neighbours = {}
+
+    def __len__(self):
+        return len(self.boundaries)
+
+    def _snap(self, x, y):
+        return round(x / self.tile_width), round(y / self.tile_height)
+
+    def cell(self, i):
+        """(col, row) of tile i"""
+        return self._cells[i]
+
+    def tiles_at(self, col, row):
+        """Indices of the tiles snapped to a cell (more than one only for overlapping detections)"""
+        return list(self._index.get((col, row), ()))
+
+    def neighbour(self, i, direction):
+        """Index of the tile directly beside tile i in direction ("left", "right", "up", "down"), or None"""
+        key = (i, direction)
+        if key not in self._neighbours:
+            self._neighbours[key] = self._find_neighbour(i, direction)
+        return self._neighbours[key]
+
+    def _find_neighbour(self, i, direction):
+        step_x, step_y = DIRECTIONS[direction]
+        left, top, right, bottom = self.boundaries[i]
+        width, height = right - left, bottom - top
+        target = (left + step_x * width, top + step_y * height, right + step_x * width, bottom + step_y * height)
+
+        # A tile overlapping the target area by >70% has its corner within
+        # 0.3 tiles of the target's, so it is snapped to one of these cells
+        col, row = self._snap(target[0], target[1])
+        for candidate_col in (col - 1, col, col + 1):
+            for candidate_row in (row - 1, row, row + 1):
+                for other in self._index.get((candidate_col, candidate_row), ()):
+                    if other != i and self.boundaries[other] != self.boundaries[i] and _covers(target, self.boundaries[other]):
+                        return other
+        return None
+
+    def neighbours(self, i):
+        """direction -> index of the neighbouring tile, for the directions that have one"""
+        found = {direction: self.neighbour(i, direction) for direction in DIRECTIONS}
+        return {direction: other for direction, other in found.items() if other is not None}
+
+    def is_surrounded(self, i):
+        """True if tile i has neighbours on all 4 sides (i.e. it scores)"""
+        return all(self.neighbour(i, direction) is not None for direction in DIRECTIONS)
+
+    def surrounded(self):
+        """Indices of every surrounded tile, in input order"""
+        return [i for i in range(len(self.boundaries)) if self.is_surrounded(i)]
+
+    def bounds(self):
+        """Pixel rectangle (left, top, right, bottom) enclosing every tile, or None if empty"""
+        if not self.boundaries:
+            return None
+        lefts, tops, rights, bottoms = zip(*self.boundaries)
+        return min(lefts), min(tops), max(rights), max(bottoms)
+
+    def cell_bounds(self):
+        """(min_col, min_row, max_col, max_row) over every tile, or None if empty"""
+        if not self._cells:
+            return None
+        cols, rows = zip(*self._cells)
+        return min(cols), min(rows), max(cols), max(rows)
+
+    def connected_components(self):
+        """Groups of tile indices joined edge to edge, largest first"""
+        seen = set()
+        components = []
+        for start in range(len(self.boundaries)):
+            if start in seen:
+                continue
+            seen.add(start)
+            component = []
+            queue = deque([start])
+            while queue:
+                i = queue.popleft()
+                component.append(i)
+                for other in self.neighbours(i).values():
+                    if other not in seen:
+                        seen.add(other)
+                        queue.append(other)
+            components.append(sorted(component))
+        return sorted(components, key=len, reverse=True)
+
+def _covers(target, rect):
+    """True if rect overlaps target by more than MIN_NEIGHBOUR_OVERLAP of rect's own area"""
+    overlap_width = min(target[2], rect[2]) - max(target[0], rect[0])
+    overlap_height = min(target[3], rect[3]) - max(target[1], rect[1])
+    if overlap_width <= 0 or overlap_height <= 0:
+        return False
+    rect_area = (rect[2] - rect[0]) * (rect[3] - rect[1])
+    return overlap_width * overlap_height / rect_area > MIN_NEIGHBOUR_OVERLAP
@@ -0,0 +1,55 @@
+import cv2
+import numpy as np
+
+from color_stats import is_board_blue
+from instrumentation import stage
+
+# Photos show table, hands and borders around the board. The tiled area is
+# found from the water colour on a sparsely sampled copy of the photo, and
+# template matching is then restricted to it. The box is padded generously,
+# because an arrow can sit on an edge tile's land, well outside the water.
+REGION_SAMPLE_STEP = 8  # Sample every 8th pixel in each direction
+REGION_PADDING = 0.1  # Padding on every side, as a fraction of the image's shorter side
+MIN_WATER_BLOB = 0.02  # Water blobs smaller than this fraction of the largest are clutter
+MIN_REGION_SAVING = 0.1  # Use the whole image unless the box saves at least this fraction of it
+
+def find_board_region(image):
+    """
+    Padded bounding box of the water-blue (tiled) area of a board photo.
+
+    Args:
+        image: BGR image
+
+    Returns:
+        (left, top, right, bottom) in image pixels, or None if the whole
+        image should be searched (no water found, or the box barely helps)
+    """
+    height, width = image.shape[:2]
+    step = REGION_SAMPLE_STEP
+    sampled = image[::step, ::step]
+    water = is_board_blue(sampled[..., 2], sampled[..., 1], sampled[..., 0]).astype(np.uint8)
+    water = cv2.morphologyEx(water, cv2.MORPH_OPEN, np.ones((3, 3), np.uint8))  # Drop specks of blue clutter
+
+    count, _labels, stats, _centroids = cv2.connectedComponentsWithStats(water)
+    if count <= 1:
+        return None
+    blobs = stats[1:]
+    areas = blobs[:, cv2.CC_STAT_AREA]
+    blobs = blobs[areas >= MIN_WATER_BLOB * areas.max()]
+
+    padding = int(REGION_PADDING * min(width, height))
+    left = max(0, int(blobs[:, cv2.CC_STAT_LEFT].min()) * step - padding)
+    top = max(0, int(blobs[:, cv2.CC_STAT_TOP].min()) * step - padding)
+    right = min(width, int((blobs[:, cv2.CC_STAT_LEFT] + blobs[:, cv2.CC_STAT_WIDTH]).max()) * step + padding)
+    bottom = min(height, int((blobs[:, cv2.CC_STAT_TOP] + blobs[:, cv2.CC_STAT_HEIGHT]).max()) * step + padding)
+
+    if (right - left) * (bottom - top) > (1 - MIN_REGION_SAVING) * width * height:
+        return None
+    return left, top, right, bottom
+
+def board_region(context):
+    """find_board_region for an AnalysisContext, computed once per image"""
+    def compute():
+        with stage("board_region"):
+            return find_board_region(context.image)
+    return context.cached("board_region", compute)
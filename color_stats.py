@@ -0,0 +1,83 @@
+import cv2
+import numpy as np
+
+# HSV ranges (OpenCV hue is 0-180)
+LOWER_BLUE = np.array([90, 30, 30])  # Lenient water range
+UPPER_BLUE = np.array([140, 255, 255])
+LOWER_RED1 = np.array([0, 30, 30])  # Red wraps around hue 0
+UPPER_RED1 = np.array([15, 255, 255])
+LOWER_RED2 = np.array([165, 30, 30])
+UPPER_RED2 = np.array([180, 255, 255])
+
+def blue_mask(hsv):
+    """255 where an HSV image is water-blue, else 0"""
+    return cv2.inRange(hsv, LOWER_BLUE, UPPER_BLUE)
+
+def red_mask(hsv):
+    """255 where an HSV image is red (buoys, lighthouse stripes), else 0"""
+    return cv2.inRange(hsv, LOWER_RED1, UPPER_RED1) + cv2.inRange(hsv, LOWER_RED2, UPPER_RED2)
+
+def is_board_blue(red, green, blue):
+    """The board colour check's water rule, elementwise on RGB channel values"""
+    return (blue > red) & (blue > green) & (blue > 100)
+
+MASKS = {
+    "blue": blue_mask,
+    "red": red_mask,
+}
+
+class ColorStats:
+    """
+    Colour statistics for one image, answering "how many blue (or red)
+    pixels are in this rectangle?" in O(1).
+
+    The image (or a region of it) is converted to HSV once. The first query
+    for a colour builds its mask and a summed-area table (cv2.integral);
+    after that any rectangle costs four lookups, however large it is and
+    however many rectangles overlap.
+    """
+
+    def __init__(self, image, region=None):
+        """
+        Args:
+            image: BGR image
+            region: Optional (left, top, right, bottom) to restrict the statistics to;
+                    queries still use full-image coordinates
+        """
+        height, width = image.shape[:2]
+        left, top, right, bottom = region or (0, 0, width, height)
+        self.left, self.top = max(0, left), max(0, top)
+        self.right, self.bottom = min(width, right), min(height, bottom)
+        self.hsv = cv2.cvtColor(image[self.top:self.bottom, self.left:self.right], cv2.COLOR_BGR2HSV)
+        self._tables = {}
+
+    def mask(self, color):
+        """Mask of color ("blue" or "red") over the region"""
+        return MASKS[color](self.hsv)
+
+    def _table(self, color):
+        if color not in self._tables:
+            self._tables[color] = cv2.integral(self.mask(color) // 255)
+        return self._tables[color]
+
+    def _clip(self, left, top, right, bottom):
+        """Rectangle clipped to the region, in region coordinates"""
+        x0 = min(max(left, self.left), self.right) - self.left
+        y0 = min(max(top, self.top), self.bottom) - self.top
+        x1 = min(max(right, self.left), self.right) - self.left
+        y1 = min(max(bottom, self.top), self.bottom) - self.top
+        return x0, y0, max(x0, x1), max(y0, y1)
+
+    def count(self, color, left, top, right, bottom):
+        """Number of color pixels in [left, right) x [top, bottom) (clipped to the region)"""
+        x0, y0, x1, y1 = self._clip(left, top, right, bottom)
+        table = self._table(color)
+        return int(table[y1, x1] - table[y0, x1] - table[y1, x0] + table[y0, x0])
+
+    def fraction(self, color, left, top, right, bottom):
+        """Fraction (0-1) of the clipped rectangle's pixels that are color; 0.0 if it is empty"""
+        x0, y0, x1, y1 = self._clip(left, top, right, bottom)
+        area = (x1 - x0) * (y1 - y0)
+        if area == 0:
+            return 0.0
+        return self.count(color, left, top, right, bottom) / area
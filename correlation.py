@@ -0,0 +1,90 @@
+import cv2
+import numpy as np
+
+# Templates up to this area are correlated directly with cv2.filter2D; above
+# ~11x11, filter2D switches to a DFT of its own and loses its edge, so larger
+# templates go to cv2.matchTemplate (measured on board photos)
+SPATIAL_MAX_TEMPLATE_AREA = 11 * 11
+
+WINDOW_STRIP_ROWS = 256  # Rows of window statistics computed at a time
+
+class CorrelationEngine:
+    """
+    TM_CCOEFF_NORMED template matching of several templates over one image.
+
+    The arrow sweeps match small templates, for which cv2.matchTemplate's
+    per-call DFT is most of the cost. The engine correlates them directly
+    with cv2.filter2D instead, from a float32 copy of the image made once
+    for every template matched against it, and normalises with per-window
+    statistics from box filters. Larger templates fall back to
+    cv2.matchTemplate (see SPATIAL_MAX_TEMPLATE_AREA). Results agree with
+    cv2.matchTemplate to about 1e-4.
+    """
+
+    def __init__(self, image):
+        """
+        Args:
+            image: 2D (grayscale) image
+        """
+        self.image = image
+        self._image32 = image.astype(np.float32)  # filter2D is several times faster from float than from uint8
+
+    def match(self, template):
+        """
+        Same as cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED).
+
+        Args:
+            template: 2D template, no larger than the image
+
+        Returns:
+            float32 array of shape (image_h - template_h + 1, image_w - template_w + 1)
+        """
+        template_h, template_w = template.shape
+        image_h, image_w = self.image.shape
+        if template_h > image_h or template_w > image_w:
+            raise ValueError(f"Template {template.shape} is larger than the image {self.image.shape}")
+
+        if template_h * template_w > SPATIAL_MAX_TEMPLATE_AREA:
+            return cv2.matchTemplate(self.image, template, cv2.TM_CCOEFF_NORMED)
+
+        # The numerator of TM_CCOEFF_NORMED is the correlation with the zero-mean template
+        zero_mean = template.astype(np.float64) - template.mean()
+        numerator = cv2.filter2D(self._image32, cv2.CV_32F, zero_mean.astype(np.float32), anchor=(0, 0),
+                                 borderType=cv2.BORDER_CONSTANT)
+        numerator = numerator[:image_h - template_h + 1, :image_w - template_w + 1]
+
+        template_norm = np.sqrt(np.sum(zero_mean ** 2))
+        if template_norm < np.finfo(np.float64).eps:
+            return np.ones(numerator.shape, dtype=np.float32)  # A flat template matches everywhere, as in OpenCV
+        return _normalise(numerator, self._window_deviation(template_h, template_w), template_norm)
+
+    def _window_deviation(self, template_h, template_w):
+        """sqrt(sum of squared deviations from the mean) for every template-sized window"""
+        image_h, image_w = self.image.shape
+        deviation = np.empty((image_h - template_h + 1, image_w - template_w + 1), dtype=np.float32)
+        window = dict(ddepth=cv2.CV_64F, ksize=(template_w, template_h), anchor=(0, 0), normalize=False,
+                      borderType=cv2.BORDER_CONSTANT)
+        # In strips, so the float64 temporaries stay small on large images
+        for top in range(0, deviation.shape[0], WINDOW_STRIP_ROWS):
+            bottom = min(deviation.shape[0], top + WINDOW_STRIP_ROWS)
+            strip = self._image32[top:bottom + template_h - 1]
+            sums = cv2.boxFilter(strip, **window)
+            variance = cv2.sqrBoxFilter(strip, **window)
+            cv2.multiply(sums, sums, dst=sums, scale=1 / (template_h * template_w))
+            cv2.subtract(variance, sums, dst=variance)
+            cv2.max(variance, 0, dst=variance)
+            cv2.sqrt(variance, dst=variance)
+            deviation[top:bottom] = variance[:bottom - top, :deviation.shape[1]]
+        return deviation
+
+def _normalise(numerator, deviation, template_norm):
+    """
+    numerator / (deviation * template_norm), in place, with OpenCV's handling
+    of flat (near zero-variance) windows
+    """
+    numerator *= np.float32(1 / template_norm)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        np.divide(numerator, deviation, out=numerator)
+    # Rounding can push a perfect match just past 1; well beyond that (or 0/0) the window is flat and scores 0
+    numerator[cv2.inRange(numerator, -1.125, 1.125) == 0] = 0
+    return np.clip(numerator, -1, 1, out=numerator)
@@ -7,6 +7,7 @@ Run this to diagnose scoring issues
 from tile_analyzer import detect_scorable_tiles
 from scored_objects_detector import calculate_board_score
 from arrow_detection import validate_board_arrows
+from logging_config import configure_logging
 import os
 
 def debug_image(image_path):
@@ -132,4 +133,5 @@ def main():
     print(f"{'='*60}")
 
 if __name__ == "__main__":
+    configure_logging("DEBUG", "text", tile_sample_rate=1)  # Show the detectors' full debug output
     main()
\ No newline at end of file
@@ -0,0 +1,123 @@
+import contextlib
+import contextvars
+import functools
+import os
+import threading
+import time
+
+# Set BEACON_TIMINGS=0 to switch instrumentation off. stage() checks the flag
+# on every call; @timed checks it once, when the function is decorated, and
+# leaves the function untouched if instrumentation is off.
+ENABLED = os.environ.get("BEACON_TIMINGS", "1") != "0"
+
+# Upper bounds (in milliseconds) of the latency histogram buckets
+HISTOGRAM_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_current_timings = contextvars.ContextVar("stage_timings", default=None)
+_active_stage = contextvars.ContextVar("active_stage", default=None)  # Innermost running _Stage
+_histograms_lock = threading.Lock()
+_histograms = {}  # stage name -> {'buckets': [count per bound + overflow], 'sum_ms': float, 'count': int}
+
+class _NullStage:
+    """Shared no-op context manager returned while instrumentation is off"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_STAGE = _NullStage()
+
+class _Stage:
+    __slots__ = ("name", "start", "nested_ms", "token")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.nested_ms = 0.0
+        self.token = _active_stage.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed_ms = (time.perf_counter() - self.start) * 1000
+        _active_stage.reset(self.token)
+        parent = _active_stage.get()
+        if parent is not None:
+            parent.nested_ms += elapsed_ms
+        record(self.name, elapsed_ms - self.nested_ms)
+        return False
+
+def stage(name):
+    """
+    Time a block of the pipeline: `with stage("arrow_match"): ...`
+
+    Stages may nest. A stage's time excludes the stages nested in it, so
+    the stages of one analysis add up to the time spent in them and no
+    millisecond is counted twice. A stage that runs several times while
+    scoring one board (e.g. once per tile) accumulates into a single total.
+    """
+    if not ENABLED:
+        return _NULL_STAGE
+    return _Stage(name)
+
+def timed(name):
+    """Decorator form of stage()"""
+    def decorator(func):
+        if not ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _Stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def record(name, elapsed_ms):
+    """Add a measurement to the current analysis (if any) and to the process-wide histograms"""
+    timings = _current_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + elapsed_ms
+
+    with _histograms_lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = {'buckets': [0] * (len(HISTOGRAM_BUCKETS_MS) + 1), 'sum_ms': 0.0, 'count': 0}
+        bucket = 0
+        while bucket < len(HISTOGRAM_BUCKETS_MS) and elapsed_ms > HISTOGRAM_BUCKETS_MS[bucket]:
+            bucket += 1
+        histogram['buckets'][bucket] += 1
+        histogram['sum_ms'] += elapsed_ms
+        histogram['count'] += 1
+
+@contextlib.contextmanager
+def collect_timings():
+    """
+    Collect the stage timings recorded inside the block.
+
+    Yields a dict of stage name -> milliseconds that fills in as stages
+    finish, or None while instrumentation is off.
+    """
+    if not ENABLED:
+        yield None
+        return
+
+    timings = {}
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+def histograms():
+    """Snapshot of the per-stage latency histograms recorded by this process"""
+    with _histograms_lock:
+        return {name: {'buckets': list(h['buckets']), 'sum_ms': h['sum_ms'], 'count': h['count']}
+                for name, h in _histograms.items()}
+
+def reset_histograms():
+    with _histograms_lock:
+        _histograms.clear()
@@ -0,0 +1,88 @@
+import contextvars
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+class JobQueue:
+    """
+    In-process job queue backed by a thread pool.
+
+    OpenCV releases the GIL during matching, so a few threads keep the CPU
+    busy without an external broker. At most max_pending jobs may be queued
+    or running at once; further submissions raise QueueFullError so the web
+    app can push back on clients instead of piling up work.
+    """
+
+    def __init__(self, max_workers=2, max_pending=8, job_ttl=3600):
+        self.max_pending = max_pending
+        self.job_ttl = job_ttl  # Seconds to keep finished jobs around for polling
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scoring-job")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Queue func(*args, **kwargs) and return its job id immediately.
+
+        Raises:
+            QueueFullError: if max_pending jobs are already queued or running
+        """
+        if not self._slots.acquire(blocking=False):
+            raise QueueFullError(f"Job queue is full ({self.max_pending} pending)")
+
+        self._prune()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._jobs[job_id] = {'id': job_id, 'status': 'queued', 'result': None, 'error': None,
+                                  'submitted_at': time.time(), 'finished_at': None}
+        try:
+            # Run in a copy of the caller's context so log records keep its request id
+            self._executor.submit(contextvars.copy_context().run, self._run, job_id, func, args, kwargs)
+        except Exception:
+            self._slots.release()
+            with self._lock:
+                del self._jobs[job_id]
+            raise
+        return job_id
+
+    def _run(self, job_id, func, args, kwargs):
+        self._update(job_id, status='running', started_at=time.time())
+        try:
+            result = func(*args, **kwargs)
+            self._update(job_id, status='done', result=result, finished_at=time.time())
+        except Exception as e:
+            self._update(job_id, status='failed', error=str(e), finished_at=time.time())
+        finally:
+            self._slots.release()
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _prune(self):
+        """Forget finished jobs older than job_ttl"""
+        cutoff = time.time() - self.job_ttl
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job['finished_at'] is not None and job['finished_at'] < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+    def get(self, job_id):
+        """Snapshot of a job's state, or None for unknown (or expired) ids"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def depth(self):
+        """Number of jobs currently queued or running"""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job['status'] in ('queued', 'running'))
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
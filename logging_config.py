@@ -0,0 +1,97 @@
+import contextvars
+import itertools
+import json
+import logging
+import os
+import sys
+import time
+import uuid
+
+LOG_LEVEL = os.environ.get("BEACON_LOG_LEVEL", "WARNING")
+LOG_FORMAT = os.environ.get("BEACON_LOG_FORMAT", "json")  # "json" or "text"
+TILE_LOG_SAMPLE_RATE = int(os.environ.get("BEACON_TILE_LOG_SAMPLE", "10"))  # Keep 1 in N per-tile debug records
+
+# Pass as extra= on per-tile and per-template debug records so they are sampled
+SAMPLED = {'sampled': True}
+
+_request_id = contextvars.ContextVar("request_id", default=None)
+_handler = None
+
+# LogRecord attributes that aren't user-supplied extra fields
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id", "sampled"}
+
+def set_request_id(request_id=None):
+    """Tag log records from the current context (request, job) with an id; returns the id"""
+    request_id = request_id or uuid.uuid4().hex[:12]
+    _request_id.set(request_id)
+    return request_id
+
+def get_request_id():
+    return _request_id.get()
+
+class RequestIdFilter(logging.Filter):
+    """Adds the current request id to every record"""
+
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        return True
+
+class SamplingFilter(logging.Filter):
+    """Passes every rate-th record marked with SAMPLED, and every unmarked record"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = max(1, rate)
+        self._counter = itertools.count()
+
+    def filter(self, record):
+        if self.rate == 1 or not getattr(record, "sampled", False):
+            return True
+        return next(self._counter) % self.rate == 0
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; extra= fields are included as keys"""
+
+    def format(self, record):
+        entry = {
+            'time': time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, "request_id", None),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+def configure_logging(level=None, log_format=None, tile_sample_rate=None, stream=None):
+    """
+    Install the log handler on the root logger, replacing one installed earlier.
+
+    Args:
+        level: Log level name or number (default: BEACON_LOG_LEVEL, WARNING)
+        log_format: "json" or "text" (default: BEACON_LOG_FORMAT, json)
+        tile_sample_rate: Keep 1 in N sampled debug records (default: BEACON_TILE_LOG_SAMPLE, 10)
+        stream: Where to write (default: stderr)
+    """
+    global _handler
+    log_format = log_format or LOG_FORMAT
+    handler = logging.StreamHandler(stream or sys.stderr)
+    if log_format == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+    handler.addFilter(RequestIdFilter())
+    handler.addFilter(SamplingFilter(TILE_LOG_SAMPLE_RATE if tile_sample_rate is None else tile_sample_rate))
+
+    root = logging.getLogger()
+    if _handler is not None:
+        root.removeHandler(_handler)
+    root.addHandler(handler)
+    level = level or LOG_LEVEL
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    _handler = handler
+    return handler
@@ -0,0 +1,196 @@
+import json
+import logging
+import os
+import threading
+
+import instrumentation
+
+logger = logging.getLogger(__name__)
+
+class MetricsRegistry:
+    """
+    Counters, gauges and histograms exported in Prometheus text format.
+
+    Recording only touches in-memory dicts. With a directory set (needed
+    when several gunicorn workers serve the app), flush() writes this
+    process's values to <directory>/<pid>.json and render() merges every
+    process's file: counters and histograms are summed, gauges are summed
+    over processes that are still alive.
+
+    Per-stage latency histograms come from instrumentation and are exported
+    as beacon_stage_duration_seconds.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._definitions = {}  # name -> (type, help, buckets)
+        self._values = {}  # (name, labels) -> number, or histogram dict
+        self._collectors = []
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def counter(self, name, help_text):
+        self._definitions[name] = ("counter", help_text, None)
+
+    def gauge(self, name, help_text):
+        self._definitions[name] = ("gauge", help_text, None)
+
+    def histogram(self, name, help_text, buckets):
+        self._definitions[name] = ("histogram", help_text, tuple(buckets))
+
+    def add_collector(self, collector):
+        """Register a callable that refreshes gauges just before values are flushed or rendered"""
+        self._collectors.append(collector)
+
+    def inc(self, name, labels=None, amount=1):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set(self, name, value, labels=None):
+        with self._lock:
+            self._values[(name, _label_key(labels))] = value
+
+    def observe(self, name, value, labels=None):
+        buckets = self._definitions[name][2]
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._values.get(key)
+            if histogram is None:
+                histogram = self._values[key] = {'buckets': [0] * (len(buckets) + 1), 'sum': 0.0, 'count': 0}
+            bucket = 0
+            while bucket < len(buckets) and value > buckets[bucket]:
+                bucket += 1
+            histogram['buckets'][bucket] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def snapshot(self):
+        """This process's values as a JSON-serialisable list of samples"""
+        for collector in self._collectors:
+            collector()
+
+        with self._lock:
+            samples = [[name, [list(pair) for pair in labels], _copy_value(value)]
+                       for (name, labels), value in self._values.items()]
+
+        for stage, histogram in instrumentation.histograms().items():
+            samples.append([STAGE_DURATION, [["stage", stage]],
+                            {'buckets': histogram['buckets'], 'sum': histogram['sum_ms'] / 1000,
+                             'count': histogram['count']}])
+        return samples
+
+    def flush(self):
+        """Write this process's values to the shared directory (no-op without one)"""
+        if not self.directory:
+            return
+        path = os.path.join(self.directory, f"{os.getpid()}.json")
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, "w") as f:
+                json.dump(self.snapshot(), f)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning("Metrics flush failed: %s", e)
+
+    def _all_snapshots(self):
+        if not self.directory:
+            return [(os.getpid(), self.snapshot())]
+
+        self.flush()
+        snapshots = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    snapshots.append((int(name[:-5]), json.load(f)))
+            except (OSError, ValueError):
+                continue  # Being replaced, or not one of ours
+        return snapshots
+
+    def render(self):
+        """All processes' metrics in the Prometheus text exposition format"""
+        merged = {}  # (name, labels) -> value
+        for pid, samples in self._all_snapshots():
+            alive = _process_alive(pid)
+            for name, labels, value in samples:
+                definition = self._definition(name)
+                if definition is None or (definition[0] == "gauge" and not alive):
+                    continue
+                key = (name, tuple(tuple(pair) for pair in labels))
+                merged[key] = _merge_value(merged.get(key), value)
+
+        lines = []
+        for name in sorted({name for name, _labels in merged}):
+            metric_type, help_text, buckets = self._definition(name)
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for (sample_name, labels), value in sorted(merged.items()):
+                if sample_name != name:
+                    continue
+                if metric_type == "histogram":
+                    lines.extend(_histogram_lines(name, labels, buckets, value))
+                else:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def _definition(self, name):
+        if name == STAGE_DURATION:
+            return ("histogram", "Time spent in each scoring pipeline stage",
+                    tuple(bound / 1000 for bound in instrumentation.HISTOGRAM_BUCKETS_MS))
+        return self._definitions.get(name)
+
+STAGE_DURATION = "beacon_stage_duration_seconds"
+
+def _label_key(labels):
+    return tuple(sorted((labels or {}).items()))
+
+def _copy_value(value):
+    if isinstance(value, dict):
+        return {'buckets': list(value['buckets']), 'sum': value['sum'], 'count': value['count']}
+    return value
+
+def _merge_value(total, value):
+    if total is None:
+        return _copy_value(value)
+    if isinstance(value, dict):
+        total['buckets'] = [a + b for a, b in zip(total['buckets'], value['buckets'])]
+        total['sum'] += value['sum']
+        total['count'] += value['count']
+        return total
+    return total + value
+
+def _process_alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _name, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _value), value in zip(labels, escaped)) + "}"
+
+def _format_number(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def _histogram_lines(name, labels, buckets, histogram):
+    lines = []
+    cumulative = 0
+    for bound, count in zip(list(buckets) + ["+Inf"], histogram['buckets']):
+        cumulative += count
+        le = bound if bound == "+Inf" else _format_number(float(bound))
+        lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+    lines.append(f"{name}_sum{_format_labels(labels)} {_format_number(histogram['sum'])}")
+    lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+    return lines
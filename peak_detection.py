@@ -0,0 +1,62 @@
+import cv2
+import numpy as np
+
+def find_peaks(result, threshold):
+    """
+    Extract local maxima of a matchTemplate correlation map.
+
+    A location is a peak if it scores at or above threshold and is the
+    maximum of its 3x3 neighbourhood, so a blob of neighbouring hits
+    collapses to its best-scoring pixel without any Python-level looping.
+
+    Returns:
+        list of (x, y, score) tuples, best score first
+    """
+    hits = result >= threshold
+    if not hits.any():
+        return []
+
+    local_max = cv2.dilate(result, np.ones((3, 3), np.uint8))
+    ys, xs = np.nonzero(hits & (result >= local_max))
+    scores = result[ys, xs]
+
+    order = np.argsort(-scores, kind="stable")
+    return [(int(xs[i]), int(ys[i]), float(scores[i])) for i in order]
+
+def _grid_cell(x, y, cell_size):
+    return int(x // cell_size), int(y // cell_size)
+
+def _has_point_within(grid, x, y, distance):
+    """Check the 3x3 block of grid cells around (x, y) for a point closer than distance"""
+    cell_x, cell_y = _grid_cell(x, y, distance)
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            for px, py in grid.get((cell_x + dx, cell_y + dy), ()):
+                if (px - x)**2 + (py - y)**2 < distance**2:
+                    return True
+    return False
+
+def non_max_suppression(peaks, min_distance):
+    """
+    Greedy score-aware suppression of peaks closer than min_distance.
+
+    Peaks are visited best score first and kept only if no stronger peak
+    has already been kept nearby. Kept points are bucketed into grid cells
+    of min_distance pixels, so each check only looks at neighbouring cells.
+
+    Args:
+        peaks: iterable of (x, y, score) tuples, in any order
+        min_distance: minimum distance in pixels between kept peaks
+
+    Returns:
+        list of (x, y, score) tuples, best score first
+    """
+    kept = []
+    grid = {}
+    for peak in sorted(peaks, key=lambda peak: -peak[2]):
+        x, y = peak[0], peak[1]
+        if _has_point_within(grid, x, y, min_distance):
+            continue
+        kept.append(peak)
+        grid.setdefault(_grid_cell(x, y, min_distance), []).append((x, y))
+    return kept
@@ -0,0 +1,130 @@
+import logging
+import math
+
+import cv2
+
+from analysis_context import MAX_IMAGE_SIZE, AnalysisContext
+from arrow_detection import detect_arrows, detect_arrows_at_scale
+from instrumentation import stage
+from template_registry import TEMPLATE_SCALES
+from tile_analyzer import estimate_tile_pitch
+
+logger = logging.getLogger(__name__)
+
+# The templates and the pixel constants in arrow_detection and tile_analyzer
+# are tuned for photos with about this many pixels from one tile to the next
+CANONICAL_TILE_PITCH = 250
+SCALE_TOLERANCE = 1.2  # Photos within this factor of the canonical scale are analysed as they are
+MIN_SCALE_ARROWS = 3  # Arrows needed to trust a scale estimate
+
+def _scale_from_arrows(arrows):
+    """
+    Scale relative to the canonical one from (x, y, orientation) arrows.
+
+    Returns:
+        (scale, arrow_count): scale is tile pitch / CANONICAL_TILE_PITCH, or
+        None if too few correct arrows line up to measure a pitch
+    """
+    correct_positions = [(x, y) for x, y, orientation in arrows if orientation == 0]
+    if len(correct_positions) >= MIN_SCALE_ARROWS:
+        pitch = estimate_tile_pitch(correct_positions)
+        if pitch is not None and not pitch['ambiguous']:
+            return (pitch['width'] + pitch['height']) / 2 / CANONICAL_TILE_PITCH, len(arrows)
+    return None, len(arrows)
+
+def _within_tolerance(scale):
+    return 1 / SCALE_TOLERANCE <= scale <= SCALE_TOLERANCE
+
+def _fits(context, scale):
+    """Whether resizing context by 1 / scale keeps it within MAX_IMAGE_SIZE"""
+    return max(context.image.shape[:2]) / scale <= MAX_IMAGE_SIZE
+
+def _trial_scales(context):
+    """
+    The template scale space outside the tolerance band, nearest the
+    canonical scale first, and of two as near the larger (cheaper to search)
+    first. Scales that context couldn't be resized from are left out.
+    """
+    trials = [scale for scale in TEMPLATE_SCALES if not _within_tolerance(scale) and _fits(context, scale)]
+    return sorted(trials, key=lambda scale: (round(abs(math.log(scale)), 2), -scale))
+
+def _resized(context, factor):
+    interpolation = cv2.INTER_AREA if factor < 1 else cv2.INTER_LINEAR
+    image = cv2.resize(context.image, None, fx=factor, fy=factor, interpolation=interpolation)
+    return AnalysisContext(image, source=context.source, original=context, scale=factor)
+
+def _confirmed(context, scale):
+    """
+    context resized to the canonical scale, if the full arrow match on a
+    copy resized by 1 / scale measures a pitch too; otherwise (or if the copy
+    would be too large) None. The copy's arrow match is memoised, so the
+    pipeline reuses it.
+    """
+    if not _fits(context, scale):
+        return None
+    resized = _resized(context, 1 / scale)
+    refined, _arrow_count = _scale_from_arrows(detect_arrows(resized))
+    if refined is None:
+        return None
+    if _within_tolerance(refined) or not _fits(context, scale * refined):
+        return resized
+    return _resized(context, 1 / (scale * refined))
+
+def _normalise(context):
+    """
+    The arrows are first matched at the photo's own resolution; that result
+    is memoised on the context, so a photo that needs no resizing costs
+    nothing extra. A scale measured where the templates fit badly is only
+    used once a copy resized by it confirms it (see _confirmed).
+
+    If the photo's own arrows give no usable scale, the arrow templates are
+    searched for at each scale of template_registry.TEMPLATE_SCALES in
+    turn. The resized templates are cached, and the photo itself is not
+    resized for the search. The search stops at the first scale whose
+    arrows give a confirmed tile pitch. Failing that (a board need not have
+    enough correct arrows in line for a pitch), the scale whose resized
+    copy has the most arrows wins.
+    """
+    arrows = detect_arrows(context)
+    scale, _arrow_count = _scale_from_arrows(arrows)
+    if scale is not None:
+        if _within_tolerance(scale):
+            return context
+        normalised = _confirmed(context, scale)
+        if normalised is not None:
+            return normalised
+
+    unmeasured = []
+    for trial in _trial_scales(context):
+        measured, arrow_count = _scale_from_arrows(detect_arrows_at_scale(context, trial))
+        if measured is not None:
+            normalised = _confirmed(context, measured)
+            if normalised is not None:
+                return normalised
+        elif arrow_count >= MIN_SCALE_ARROWS:
+            unmeasured.append(trial)
+
+    best, best_count = context, len(arrows)
+    for trial in unmeasured:
+        resized = _resized(context, 1 / trial)
+        arrow_count = len(detect_arrows(resized))
+        if arrow_count > best_count:
+            best, best_count = resized, arrow_count
+    return best if best_count >= MIN_SCALE_ARROWS else context
+
+def normalise_resolution(context):
+    """
+    Context to run the pipeline on: the photo resized to the canonical tile
+    pitch, or the context itself if its scale is within SCALE_TOLERANCE (or
+    can't be estimated). A resized context keeps the original and its scale,
+    so annotations can be drawn on the photo as uploaded.
+
+    The result isn't memoised on context: the resized context refers back to
+    it, and the cycle would keep both images alive until the next gc. Call
+    this once per photo and pass the result on.
+    """
+    with stage("resolution"):
+        normalised = _normalise(context)
+    if normalised is not context:
+        logger.info("Photo is at %.2fx the canonical scale; resized by %.2f", 1 / normalised.scale, normalised.scale)
+    return normalised
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+CACHE_FORMAT_VERSION = 1  # Bump when the cached result layout changes
+
+logger = logging.getLogger(__name__)
+
+def make_cache_key(image_bytes, config):
+    """Content hash of the uploaded bytes plus the detector configuration"""
+    digest = hashlib.sha256()
+    digest.update(json.dumps({'version': CACHE_FORMAT_VERSION, **config}, sort_keys=True).encode())
+    digest.update(image_bytes)
+    return digest.hexdigest()
+
+class ResultCache:
+    """
+    Two-tier cache of scoring results for repeated uploads.
+
+    Each entry is a JSON-serialisable result dict plus the encoded bytes of
+    the image to display. Entries live in an in-memory LRU and, if disk_dir
+    is set, in a directory capped at max_disk_bytes (least recently used
+    entries are evicted first). Memory misses fall through to disk and
+    promote the entry back into memory.
+    """
+
+    def __init__(self, max_entries=128, disk_dir=None, max_disk_bytes=256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'memory_hits': 0, 'disk_hits': 0, 'evictions': 0}
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def get(self, key):
+        """
+        Look up a cached entry.
+
+        Returns:
+            dict: {'result': dict, 'image_bytes': bytes or None, 'image_ext': str}, or None on a miss
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self._stats['hits'] += 1
+                self._stats['memory_hits'] += 1
+                return entry
+
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            self._stats['hits'] += 1
+            self._stats['disk_hits'] += 1
+            self._remember(key, entry)
+        return entry
+
+    def put(self, key, result, image_bytes=None, image_ext=".jpg"):
+        entry = {'result': result, 'image_bytes': image_bytes, 'image_ext': image_ext}
+        with self._lock:
+            self._remember(key, entry)
+        if self.disk_dir:
+            self._write_disk(key, entry)
+
+    def stats(self):
+        """Hit/miss counters plus current size of each tier"""
+        with self._lock:
+            stats = dict(self._stats, memory_entries=len(self._memory))
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        if self.disk_dir:
+            stats['disk_bytes'] = sum(size for _path, size, _mtime in self._disk_files())
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        for path, _size, _mtime in self._disk_files():
+            os.remove(path)
+
+    def _remember(self, key, entry):
+        """Insert into the memory tier (caller holds the lock)"""
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    # Disk tier: <key>.json holds the result, <key><ext> the display image
+
+    def _disk_paths(self, key, image_ext=""):
+        return os.path.join(self.disk_dir, f"{key}.json"), os.path.join(self.disk_dir, f"{key}{image_ext}")
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        meta_path, _ = self._disk_paths(key)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            image_bytes = None
+            if meta['has_image']:
+                _, image_path = self._disk_paths(key, meta['image_ext'])
+                with open(image_path, "rb") as f:
+                    image_bytes = f.read()
+                os.utime(image_path)
+            os.utime(meta_path)  # Mark as recently used for eviction
+        except (OSError, ValueError, KeyError):
+            return None
+        return {'result': meta['result'], 'image_bytes': image_bytes, 'image_ext': meta['image_ext']}
+
+    def _write_disk(self, key, entry):
+        meta_path, image_path = self._disk_paths(key, entry['image_ext'])
+        try:
+            if entry['image_bytes'] is not None:
+                with open(image_path, "wb") as f:
+                    f.write(entry['image_bytes'])
+            # Write the metadata last, so a reader never sees it without its image
+            temp_path = f"{meta_path}.{threading.get_ident()}.tmp"
+            with open(temp_path, "w") as f:
+                json.dump({'result': entry['result'], 'image_ext': entry['image_ext'],
+                           'has_image': entry['image_bytes'] is not None}, f)
+            os.replace(temp_path, meta_path)
+        except OSError as e:
+            logger.warning("Result cache write failed: %s", e)
+            return
+        self._evict_disk()
+
+    def _disk_files(self):
+        if not self.disk_dir:
+            return []
+        files = []
+        for name in os.listdir(self.disk_dir):
+            path = os.path.join(self.disk_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue  # Removed by a concurrent eviction
+            files.append((path, stat.st_size, stat.st_mtime))
+        return files
+
+    def _evict_disk(self):
+        """Delete least recently used entries until the directory fits max_disk_bytes"""
+        files = self._disk_files()
+        total = sum(size for _path, size, _mtime in files)
+        if total <= self.max_disk_bytes:
+            return
+
+        entries = {}  # key -> [last used, total size, paths]
+        for path, size, mtime in files:
+            entry = entries.setdefault(os.path.basename(path).split(".")[0], [0, 0, []])
+            entry[0] = max(entry[0], mtime)
+            entry[1] += size
+            entry[2].append(path)
+
+        for last_used, size, paths in sorted(entries.values(), key=lambda entry: entry[0]):
+            if total <= self.max_disk_bytes:
+                break
+            for path in paths:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+            with self._lock:
+                self._stats['evictions'] += 1
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Score a directory (or glob) of board photos in parallel.
+
+Each photo goes through analyze_complete_board in a worker process; results
+are written as JSON Lines or CSV, one row per photo.
+
+Usage:
+    python score_batch.py photos/ -o results.jsonl
+    python score_batch.py "photos/*.jpg" -o results.csv --workers 4 --resume
+"""
+
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import template_registry
+from board_analyzer import analyze_complete_board
+from logging_config import configure_logging
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+CSV_FIELDS = ["file", "is_valid", "score", "rank", "buoys", "lighthouses", "empty",
+              "failed_at", "error", "correct_arrows", "incorrect_arrows", "total_ms"]
+
+def collect_images(inputs):
+    """Expand directories and glob patterns into a sorted list of image paths"""
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            candidates = [os.path.join(item, name) for name in os.listdir(item)]
+        else:
+            candidates = glob.glob(item)
+        paths.update(path for path in candidates if path.lower().endswith(IMAGE_EXTENSIONS) and os.path.isfile(path))
+    return sorted(paths)
+
+def _init_worker(quiet):
+    """Set up logging and warm the worker-local template registry once per process"""
+    configure_logging("WARNING" if quiet else "DEBUG")
+    template_registry.reload_if_changed()
+
+def score_image(image_path, annotated_dir=None):
+    """
+    Run the full pipeline on one photo.
+
+    Returns:
+        dict: one output record (see CSV_FIELDS), with breakdown and timings nested
+    """
+    annotated_path = None
+    if annotated_dir:
+        base_name, ext = os.path.splitext(os.path.basename(image_path))
+        annotated_path = os.path.join(annotated_dir, f"{base_name}_scored{ext or '.jpg'}")
+
+    start = time.perf_counter()
+    result = analyze_complete_board(image_path, image_path, annotated_path=annotated_path, annotate=bool(annotated_dir))
+    total_ms = (time.perf_counter() - start) * 1000
+
+    details = result.get('details', {})
+    rank = result.get('rank')
+    return {
+        'file': image_path,
+        'is_valid': result['is_valid'],
+        'score': result.get('score'),
+        'rank': rank[0] if rank else None,
+        'breakdown': result.get('breakdown'),
+        'failed_at': result.get('failed_at'),
+        'error': result['errors'][0] if result['errors'] else None,
+        'correct_arrows': details.get('correct_arrows'),
+        'incorrect_arrows': details.get('incorrect_arrows'),
+        'timings': {**details.get('timings', {}), 'total_ms': round(total_ms, 1)},
+    }
+
+def _flatten(record):
+    """CSV row for a record"""
+    breakdown = record.get('breakdown') or {}
+    row = {field: record.get(field) for field in CSV_FIELDS}
+    row.update({key: breakdown.get(key) for key in ("buoys", "lighthouses", "empty")})
+    row['total_ms'] = record['timings']['total_ms']
+    return row
+
+def _output_format(output_path, requested):
+    if requested:
+        return requested
+    return "csv" if output_path.lower().endswith(".csv") else "jsonl"
+
+def read_completed(output_path, output_format):
+    """Files already present in an existing output file (for --resume)"""
+    if not os.path.exists(output_path):
+        return set()
+
+    with open(output_path, newline="") as f:
+        if output_format == "csv":
+            return {row['file'] for row in csv.DictReader(f) if row.get('file')}
+
+        completed = set()
+        for line in f:
+            try:
+                completed.add(json.loads(line)['file'])
+            except (ValueError, KeyError):
+                continue  # Partially written last line from an interrupted run
+        return completed
+
+class ResultWriter:
+    """Append records to a JSON Lines or CSV file, flushing after each one"""
+
+    def __init__(self, output_path, output_format, append):
+        self.output_format = output_format
+        needs_header = not (append and os.path.exists(output_path) and os.path.getsize(output_path) > 0)
+        self.file = open(output_path, "a" if append else "w", newline="")
+        if output_format == "csv":
+            self.writer = csv.DictWriter(self.file, fieldnames=CSV_FIELDS)
+            if needs_header:
+                self.writer.writeheader()
+
+    def write(self, record):
+        if self.output_format == "csv":
+            self.writer.writerow(_flatten(record))
+        else:
+            self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+def run_batch(image_paths, output_path, output_format="jsonl", workers=None, resume=False,
+              annotated_dir=None, quiet=True, progress=None):
+    """
+    Score every image, writing results as they complete.
+
+    Returns:
+        int: number of images scored in this run
+    """
+    progress = progress or sys.stderr
+    if resume:
+        completed = read_completed(output_path, output_format)
+        image_paths = [path for path in image_paths if path not in completed]
+    if annotated_dir:
+        os.makedirs(annotated_dir, exist_ok=True)
+
+    total = len(image_paths)
+    if total == 0:
+        print("Nothing to do", file=progress)
+        return 0
+
+    writer = ResultWriter(output_path, output_format, append=resume)
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(quiet,)) as executor:
+            futures = {executor.submit(score_image, path, annotated_dir): path for path in image_paths}
+            for done, future in enumerate(as_completed(futures), start=1):
+                path = futures[future]
+                try:
+                    record = future.result()
+                except Exception as e:
+                    record = {'file': path, 'is_valid': False, 'score': None, 'rank': None, 'breakdown': None,
+                              'failed_at': 'worker', 'error': str(e), 'correct_arrows': None,
+                              'incorrect_arrows': None, 'timings': {'total_ms': None}}
+                writer.write(record)
+
+                outcome = f"score {record['score']}" if record['is_valid'] else f"failed at {record['failed_at']}"
+                elapsed = time.perf_counter() - start
+                print(f"[{done}/{total}] {path}: {outcome} ({elapsed:.1f}s elapsed)", file=progress)
+    finally:
+        writer.close()
+
+    return total
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a batch of Beacon Patrol board photos.")
+    parser.add_argument("inputs", nargs="+", help="Directories or glob patterns of board photos")
+    parser.add_argument("-o", "--output", required=True, help="Output file (.jsonl or .csv)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="Output format (default: from the output extension)")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--resume", action="store_true", help="Skip files already present in the output")
+    parser.add_argument("--annotated-dir", help="Also write scored images to this directory")
+    parser.add_argument("--verbose", action="store_true", help="Log the detectors' debug output (JSON, to stderr)")
+    args = parser.parse_args(argv)
+
+    image_paths = collect_images(args.inputs)
+    if not image_paths:
+        parser.error("no images found")
+
+    run_batch(image_paths, args.output, _output_format(args.output, args.format), workers=args.workers,
+              resume=args.resume, annotated_dir=args.annotated_dir, quiet=not args.verbose)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,17 @@
+import logging
 import cv2
-import numpy as np
+from analysis_context import get_analysis_context
+from color_stats import ColorStats, blue_mask, red_mask
+from instrumentation import stage
+from logging_config import SAMPLED
+from template_registry import get_template, get_templates
 from tile_analyzer import detect_scorable_tiles
 
-def detect_scored_object_in_tile(tile_image, template_paths, threshold=0.4):
+OBJECT_THRESHOLD = 0.4  # Minimum match confidence for a lighthouse or buoy
+
+logger = logging.getLogger(__name__)
+
+def detect_scored_object_in_tile(tile_image, template_paths, threshold=OBJECT_THRESHOLD):
     """
     Detect scored objects using blue water percentage to distinguish buoys from lighthouses
     """
@@ -13,24 +22,74 @@ def detect_scored_object_in_tile(tile_image, template_paths, threshold=0.4):
         gray_tile = tile_image
         color_tile = cv2.cvtColor(tile_image, cv2.COLOR_GRAY2BGR)
     
+    # Calculate blue percentage of the entire tile
+    blue_percentage = calculate_blue_percentage(color_tile)
+
+    def roi_has_red(x, y, width, height):
+        return has_red_color(color_tile[y:y+height, x:x+width])
+
+    return _match_scored_objects(gray_tile, blue_percentage, roi_has_red, template_paths, threshold)
+
+def classify_tiles(context, boundaries, template_paths, threshold=OBJECT_THRESHOLD):
+    """
+    Classify every tile of one image in a batch.
+
+    Colour statistics (see ColorStats) are built once per tile, so the tile's
+    blue percentage and every red check on a template match are O(1)
+    lookups instead of per-ROI colour conversions. Templates are matched
+    against each tile's slice of the context's grayscale image. Results are
+    identical to calling detect_scored_object_in_tile on each tile.
+
+    Args:
+        context: AnalysisContext of the board
+        boundaries: List of (left, top, right, bottom) tile rectangles
+        template_paths: Template name -> path (see scored_object_template_paths)
+        threshold: Minimum match confidence
+
+    Returns:
+        list: (object_type, confidence) for each boundary, in order
+    """
+    image_height, image_width = context.image.shape[:2]
+    results = []
+    for left, top, right, bottom in boundaries:
+        # Same pixels as image[int(top):int(bottom), int(left):int(right)]
+        x0, x1 = _slice_bounds(int(left), int(right), image_width)
+        y0, y1 = _slice_bounds(int(top), int(bottom), image_height)
+
+        # Per tile rather than over the whole board: scorable tiles are often
+        # scattered, and their bounding box can be many times their total area
+        colors = ColorStats(context.image, region=(x0, y0, x1, y1))
+        blue_pixels = colors.count("blue", x0, y0, x1, y1)
+        total_pixels = (y1 - y0) * (x1 - x0)
+        blue_percentage = (blue_pixels / total_pixels) * 100
+        logger.debug("    Blue detection: %d/%d pixels", blue_pixels, total_pixels, extra=SAMPLED)
+
+        def roi_has_red(x, y, width, height, x0=x0, y0=y0, colors=colors):
+            red_pixels = colors.count("red", x0 + x, y0 + y, x0 + x + width, y0 + y + height)
+            return _is_red_enough(red_pixels, width * height)
+
+        results.append(_match_scored_objects(context.gray[y0:y1, x0:x1], blue_percentage, roi_has_red,
+                                             template_paths, threshold))
+    return results
+
+def _match_scored_objects(gray_tile, blue_percentage, roi_has_red, template_paths, threshold):
+    """Best (template name, confidence) for one tile; roi_has_red(x, y, width, height) checks a match area"""
     best_match = None
     best_confidence = 0
     
-    # Calculate blue percentage of the entire tile
-    blue_percentage = calculate_blue_percentage(color_tile)
-    print(f"Tile size: {gray_tile.shape}, Blue percentage: {blue_percentage:.1f}%")
+    logger.debug("Tile size: %s, Blue percentage: %.1f%%", gray_tile.shape, blue_percentage, extra=SAMPLED)
     
     for template_name, template_path in template_paths.items():
-        template = cv2.imread(template_path, cv2.IMREAD_GRAYSCALE)
+        template = get_template(template_path)
         if template is None:
-            print(f"Warning: Could not load template {template_path}")
+            logger.warning("Could not load template %s", template_path)
             continue
             
         result = cv2.matchTemplate(gray_tile, template, cv2.TM_CCOEFF_NORMED)
         _, max_confidence, _, max_loc = cv2.minMaxLoc(result)
 
         template_h, template_w = template.shape
-        print(f"  {template_name}: {max_confidence:.3f} (template size: {template.shape})")
+        logger.debug("  %s: %.3f (template size: %s)", template_name, max_confidence, template.shape, extra=SAMPLED)
         
         
         buoy_templates = ["buoy_birds", "buoy_birds2", "buoy_blue", "buoy_score"]
@@ -40,54 +99,57 @@ def detect_scored_object_in_tile(tile_image, template_paths, threshold=0.4):
             if blue_percentage > 20 or max_confidence > 0.6:
                 # For buoy candidates, check for red color
                 x, y = max_loc
-                roi = color_tile[y:y+template_h, x:x+template_w]
                 
-                if has_red_color(roi):
-                    print(f"    -> RED DETECTED - buoy valid")
+                if roi_has_red(x, y, template_w, template_h):
+                    logger.debug("    -> RED DETECTED - buoy valid", extra=SAMPLED)
                 else:
-                    print(f"    -> NO RED - buoy rejected")
+                    logger.debug("    -> NO RED - buoy rejected", extra=SAMPLED)
                     max_confidence = 0
             else:
                 max_confidence = 0
                 
         elif template_name in lighthouse_templates:
             x, y = max_loc
-            roi = color_tile[y:y+template_h, x:x+template_w]
             
-            if has_red_color(roi):
-                print(f"    -> RED DETECTED - {template_name} valid")
+            if roi_has_red(x, y, template_w, template_h):
+                logger.debug("    -> RED DETECTED - %s valid", template_name, extra=SAMPLED)
             else:
-                print(f"    -> NO RED - {template_name} rejected")
+                logger.debug("    -> NO RED - %s rejected", template_name, extra=SAMPLED)
                 max_confidence = 0
         
         if max_confidence > threshold and max_confidence > best_confidence:
             best_match = template_name
             best_confidence = max_confidence
     
-    print(f"  -> Best match: {best_match} ({best_confidence:.3f})")
+    logger.debug("  -> Best match: %s (%.3f)", best_match, best_confidence, extra=SAMPLED)
     return best_match, best_confidence
 
+def _slice_bounds(start, stop, length):
+    """(start, stop) actually covered by array[start:stop] on an axis of this length"""
+    start, stop, _step = slice(start, stop).indices(length)
+    return start, max(start, stop)
+
+def scored_object_template_paths():
+    """Name -> path for every lighthouse and buoy template in the registry"""
+    return {t.name: t.path for t in get_templates() if t.kind in ("lighthouse", "buoy")}
+
 def calculate_blue_percentage(image):
     """Calculate what percentage of the image is blue (water) - with debug output"""
     hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
     
-    # Try more lenient blue range
-    lower_blue = np.array([90, 30, 30])   # Wider range
-    upper_blue = np.array([140, 255, 255])
-    
-    blue_mask = cv2.inRange(hsv, lower_blue, upper_blue)
-    blue_pixels = cv2.countNonZero(blue_mask)
+    blue_pixels = cv2.countNonZero(blue_mask(hsv))
     total_pixels = image.shape[0] * image.shape[1]
     
     percentage = (blue_pixels / total_pixels) * 100
     
     # Debug: show what the mask looks like
-    print(f"    Blue detection: {blue_pixels}/{total_pixels} pixels")
+    logger.debug("    Blue detection: %d/%d pixels", blue_pixels, total_pixels, extra=SAMPLED)
     # Uncomment to see the blue mask:
-    # cv2.imshow("Blue Mask", blue_mask)
+    # cv2.imshow("Blue Mask", blue_mask(hsv))
     # cv2.waitKey(1000)
     
     return percentage
+
 def has_red_color(image_roi):
     """
     Check if the region of interest contains red color (for buoy detection)
@@ -95,38 +157,46 @@ def has_red_color(image_roi):
     # Convert to HSV for better red detection
     hsv = cv2.cvtColor(image_roi, cv2.COLOR_BGR2HSV)
     
-    # Define red color range in HSV - let's be more lenient
-    lower_red1 = np.array([0, 30, 30])    # Lower saturation/value thresholds
-    upper_red1 = np.array([15, 255, 255]) # Wider hue range
-    lower_red2 = np.array([165, 30, 30])  # Wider hue range
-    upper_red2 = np.array([180, 255, 255])
-    
-    mask1 = cv2.inRange(hsv, lower_red1, upper_red1)
-    mask2 = cv2.inRange(hsv, lower_red2, upper_red2)
-    red_mask = mask1 + mask2
-    
-    red_pixels = cv2.countNonZero(red_mask)
+    red_pixels = cv2.countNonZero(red_mask(hsv))
     total_pixels = image_roi.shape[0] * image_roi.shape[1]
+    return _is_red_enough(red_pixels, total_pixels)
+
+def _is_red_enough(red_pixels, total_pixels):
     red_percentage = red_pixels / total_pixels
     
-    print(f"    Red analysis: {red_pixels}/{total_pixels} = {red_percentage:.3f}")
+    logger.debug("    Red analysis: %d/%d = %.3f", red_pixels, total_pixels, red_percentage, extra=SAMPLED)
     
     return red_percentage > 0.02  # Lower threshold - 2% instead of 5%
 
 def generate_annotated_image(image_path, save_path):
-    print(f"generate_annotated_image called with: {image_path} -> {save_path}")
-    analysis = _analyze_tiles(image_path)
-    print(f"Analysis result: {analysis}")
+    logger.debug("generate_annotated_image called with: %s -> %s", image_path, save_path)
+    context = get_analysis_context(image_path)
+    if context is None:
+        logger.debug("Returning False - could not load image")
+        return False
+    analysis = _analyze_tiles(context)
+    logger.debug("Analysis result: %d tiles, %d scorable, %s", analysis['total_tiles'], analysis['scorable_count'], analysis['tiles'])
     # Handle error cases
     if analysis['total_tiles'] == 0 or analysis['image'] is None:
-        print("Returning False - no tiles or no image")
+        logger.debug("Returning False - no tiles or no image")
         return False
     
-    image = analysis['image'].copy()  # Work on a copy
+    with stage("annotation"):
+        # Drawn on the photo as uploaded, which the analysis may have resized
+        tiles = [dict(tile, boundary=context.to_original(*tile['boundary'])) for tile in analysis['tiles']]
+        image = _draw_tile_labels(context.original_image, tiles)
+
+    with stage("encode"):
+        success = cv2.imwrite(save_path, image)
+    return success
+
+def _draw_tile_labels(source_image, tiles):
+    """Copy of the board with each scorable tile outlined and labelled with its points"""
+    image = source_image.copy()  # Work on a copy
     
-    print(f"Checking {len(analysis['tiles'])} scorable tiles for objects...")
+    logger.debug("Checking %d scorable tiles for objects...", len(tiles))
     
-    for tile_data in analysis['tiles']:
+    for tile_data in tiles:
         left, top, right, bottom = tile_data['boundary']
         object_type = tile_data['object_type']
         
@@ -151,8 +221,7 @@ def generate_annotated_image(image_path, save_path):
         cv2.putText(image, label, (int(left + 20), int(top + 45)), 
                    cv2.FONT_HERSHEY_SIMPLEX, 1.2, color, 5)
     
-    success = cv2.imwrite(save_path, image)
-    return success
+    return image
 
 def calculate_board_score(image_path):
     analysis = _analyze_tiles(image_path)
@@ -162,7 +231,9 @@ def calculate_board_score(image_path):
         return {
             'score': 0,
             'rank': get_rank_for_score(0),
-            'breakdown': {'buoys': 0, 'lighthouses': 0, 'empty': 0}
+            'breakdown': {'buoys': 0, 'lighthouses': 0, 'empty': 0},
+            'total_tiles': 0,
+            'scorable_tiles': 0
         }
     
     # Count object types from analysis data
@@ -191,7 +262,9 @@ def calculate_board_score(image_path):
             'buoys': buoy_count,
             'lighthouses': lighthouse_count, 
             'empty': empty_count
-        }
+        },
+        'total_tiles': analysis['total_tiles'],
+        'scorable_tiles': analysis['scorable_count']
     }
 
 def get_rank_for_score(score):
@@ -216,29 +289,20 @@ def get_rank_for_score(score):
         return "Cartographers", "Incredible work! The good folks of the North Sea Coast will tell stories of your prowess for years to come."
     
 def _analyze_tiles(image_path):
-    print(f"Analyzing tiles for: {image_path}")
-    
-    # Check if image loads
-    image = cv2.imread(image_path)
-    if image is None:
-        print("Could not load image with cv2.imread")
+    logger.debug("Analyzing tiles for: %s", image_path)
+
+    context = get_analysis_context(image_path)
+    if context is None:
+        logger.warning("Could not load image %s", image_path)
         return {'tiles': [], 'total_tiles': 0, 'scorable_count': 0, 'image': None}
-    
-    print(f"Image loaded successfully: {image.shape}")
-    
-    total_tiles, scorable_count, annotated_image, scorable_boundaries = detect_scorable_tiles(image_path)
-    print(f"detect_scorable_tiles returned: total={total_tiles}, scorable={scorable_count}")
-    
-    template_paths = {
-        "beacon_hq": "images/templates/bp_hq_score_3.png",
-        "lighthouse": "images/templates/lighthouse_score_3.png", 
-        "buoy_birds": "images/templates/small_buoy_birds_score_1.png",
-        "buoy_birds2": "images/templates/small_buoy_birds2_score_1.png",
-        "buoy_blue": "images/templates/small_buoy_blue_score_1.png",
-        "buoy_score": "images/templates/small_buoy_score_1.png"
-    }
 
-    total_tiles, scorable_count, annotated_image, scorable_boundaries = detect_scorable_tiles(image_path)
+    return context.cached("tile_analysis", lambda: _classify_scorable_tiles(context))
+
+def _classify_scorable_tiles(context):
+    total_tiles, scorable_count, annotated_image, scorable_boundaries = detect_scorable_tiles(context)
+    logger.debug("detect_scorable_tiles returned: total=%d, scorable=%d", total_tiles, scorable_count)
+    
+    template_paths = scored_object_template_paths()
 
     if total_tiles == 0:
         return {
@@ -248,28 +312,16 @@ def _analyze_tiles(image_path):
             'image': None
         }
     
-    # Load the image
-    image = cv2.imread(image_path)
-    if image is None:
-        return {
-            'tiles': [],
-            'total_tiles': 0,
-            'scorable_count': 0,
-            'image': None
-        }
+    image = context.image
         
-    # The main analysis loop (from your existing functions)
+    # Classify every scorable tile in one batch
+    with stage("tile_classification"):
+        classifications = classify_tiles(context, scorable_boundaries, template_paths)
+
     tiles_data = []
-    for _i, (left, top, right, bottom) in enumerate(scorable_boundaries):
-        # Extract tile region
-        tile = image[int(top):int(bottom), int(left):int(right)]
-        
-        # Detect scored object
-        object_type, confidence = detect_scored_object_in_tile(tile, template_paths)
-        
-        # Store the results
+    for boundary, (object_type, confidence) in zip(scorable_boundaries, classifications):
         tiles_data.append({
-            'boundary': (left, top, right, bottom),
+            'boundary': tuple(boundary),
             'object_type': object_type,
             'confidence': confidence
         })
@@ -283,6 +335,8 @@ def _analyze_tiles(image_path):
 
 if __name__ == "__main__":
     # Quick test
+    from logging_config import configure_logging
+    configure_logging("DEBUG", "text", tile_sample_rate=1)
     
     image_path = "test_images/valid_boards/board_18.jpg"
     total_tiles, scorable_count, annotated_image, scorable_tile_boundaries = detect_scorable_tiles(image_path)
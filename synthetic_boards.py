@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Generate synthetic Beacon Patrol boards with known answers.
+
+Boards are composed from the arrow and object templates in
+images/templates/: each tile is a patch of water with an upright arrow in
+its top-right corner and, optionally, a lighthouse or buoy. Tiles can be
+laid out in a grid, a single row or an irregular blob, and some can be
+rotated (which makes the board invalid). Noise, JPEG compression and
+resolution are configurable. The ground truth (tile positions, objects,
+expected score) comes with the image, so boards far larger than we can
+photograph can be used for scaling and accuracy tests.
+
+Usage:
+    python synthetic_boards.py 100 -o board_100.jpg
+    python synthetic_boards.py 60 -o blob.jpg --layout blob --noise 6 --jpeg-quality 80 --scale 0.8
+    python synthetic_boards.py 30 -o invalid.jpg --rotated 2 --boards 5
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+
+import cv2
+import numpy as np
+
+from template_registry import get_templates
+
+TILE_SIZE = 240  # Pixels per tile, close to board_7.jpg
+TILE_GAP = 4  # Pixels between neighbouring tiles
+MARGIN = 120  # Table visible around the board
+TABLE_COLOR = (120, 165, 205)  # BGR, light wood
+WATER_COLOR = (225, 170, 120)  # BGR, the tiles' pale blue
+WAVE_COLOR = (250, 245, 240)
+
+# Where the pipeline expects the arrow relative to the tile's top-right corner
+# (see tile_analyzer._estimate_tile_grid)
+ARROW_OFFSET_X = -30
+ARROW_OFFSET_Y = 10
+
+POINTS_EMPTY = 1
+LAYOUTS = ("grid", "row", "blob")
+
+def grid_layout(tile_count):
+    """(column, row) cells for tile_count tiles, filled row by row into a near-square rectangle"""
+    columns = math.ceil(math.sqrt(tile_count))
+    return [(i % columns, i // columns) for i in range(tile_count)]
+
+def row_layout(tile_count):
+    """A single row of tiles - nothing is surrounded"""
+    return [(i, 0) for i in range(tile_count)]
+
+def blob_layout(tile_count, rng):
+    """
+    An irregular connected board, grown one tile at a time from a random
+    free neighbour of the tiles placed so far (like a real game).
+    """
+    cells = [(0, 0)]
+    occupied = {(0, 0)}
+    while len(cells) < tile_count:
+        col, row = cells[int(rng.integers(len(cells)))]
+        neighbour = [(col - 1, row), (col + 1, row), (col, row - 1), (col, row + 1)][int(rng.integers(4))]
+        if neighbour not in occupied:
+            occupied.add(neighbour)
+            cells.append(neighbour)
+
+    # Shift so the top-left cell of the bounding box is (0, 0)
+    min_col = min(col for col, _row in cells)
+    min_row = min(row for _col, row in cells)
+    return [(col - min_col, row - min_row) for col, row in cells]
+
+def make_layout(layout, tile_count, rng):
+    if layout == "grid":
+        return grid_layout(tile_count)
+    if layout == "row":
+        return row_layout(tile_count)
+    if layout == "blob":
+        return blob_layout(tile_count, rng)
+    raise ValueError(f"Unknown layout {layout!r} (expected one of {', '.join(LAYOUTS)})")
+
+def surrounded_cells(cells):
+    """Cells with a neighbour on all four sides - the tiles that score"""
+    occupied = set(cells)
+    return {(col, row) for col, row in cells
+            if {(col - 1, row), (col + 1, row), (col, row - 1), (col, row + 1)} <= occupied}
+
+def _load_color_templates():
+    """name -> (BGR image, kind, points) for the arrow and object templates"""
+    templates = {}
+    for template in get_templates():
+        image = cv2.imread(template.path)
+        if image is not None:
+            templates[template.name] = (image, template.kind, template.points)
+    return templates
+
+def _draw_water(tile, rng):
+    tile[:] = WATER_COLOR
+    height, width = tile.shape[:2]
+    for _ in range(3):  # A few wave strokes, like the printed tiles
+        x = int(rng.integers(10, width - 60))
+        y = int(rng.integers(40, height - 20))
+        cv2.ellipse(tile, (x + 25, y), (25, 6), 0, 200, 340, WAVE_COLOR, 2)
+
+def _paste(canvas, image, left, top):
+    height, width = image.shape[:2]
+    canvas[top:top + height, left:left + width] = image
+
+def generate_board(tile_count, seed=0, object_ratio=0.6, layout="grid", rotated=0, tile_size=TILE_SIZE,
+                   noise=0.0, jpeg_quality=None, scale=1.0):
+    """
+    Compose a board of tile_count tiles.
+
+    Args:
+        tile_count: Number of tiles
+        seed: Random seed; the same seed and settings always give the same board
+        object_ratio: Fraction of tiles carrying a lighthouse or buoy
+        layout: "grid", "row" or "blob" (see LAYOUTS)
+        rotated: Number of tiles turned by 90, 180 or 270 degrees (any makes the board invalid)
+        tile_size: Tile size in pixels before scaling (templates are pasted at their own size)
+        noise: Standard deviation of Gaussian pixel noise
+        jpeg_quality: If set, round-trip the image through JPEG at this quality
+        scale: Resize the finished board by this factor (e.g. 0.5 for a low-resolution photo)
+
+    Returns:
+        tuple: (BGR image, ground truth dict); tile boxes are in final image pixels
+    """
+    if not 0 <= rotated <= tile_count:
+        raise ValueError("rotated must be between 0 and tile_count")
+
+    rng = np.random.default_rng(seed)
+    templates = _load_color_templates()
+    arrow = templates["arrow"][0]
+    objects = [name for name, (_image, kind, _points) in templates.items() if kind in ("lighthouse", "buoy")]
+
+    cells = make_layout(layout, tile_count, rng)
+    columns = max(col for col, _row in cells) + 1
+    rows = max(row for _col, row in cells) + 1
+    pitch = tile_size + TILE_GAP
+    canvas = np.empty((2 * MARGIN + rows * pitch, 2 * MARGIN + columns * pitch, 3), dtype=np.uint8)
+    canvas[:] = TABLE_COLOR
+
+    rotated_cells = {cells[i] for i in rng.choice(tile_count, size=rotated, replace=False)} if rotated else set()
+    scoring = surrounded_cells(cells)
+    tiles = []
+    score = 0
+    for col, row in cells:
+        left = MARGIN + col * pitch
+        top = MARGIN + row * pitch
+        tile = canvas[top:top + tile_size, left:left + tile_size]
+        _draw_water(tile, rng)
+
+        object_name = None
+        points = POINTS_EMPTY
+        if objects and rng.random() < object_ratio:
+            object_name = objects[int(rng.integers(len(objects)))]
+            object_image, _kind, points = templates[object_name]
+            height, width = object_image.shape[:2]
+            _paste(tile, object_image, max(0, (tile_size - width) // 2), max(0, (tile_size - height) // 2 + 10))
+
+        _paste(tile, arrow, tile_size + ARROW_OFFSET_X, ARROW_OFFSET_Y)
+
+        rotation = 0
+        if (col, row) in rotated_cells:
+            turns = int(rng.integers(1, 4))
+            tile[:] = np.rot90(tile, turns)  # Counter-clockwise, arrow and all
+            rotation = 90 * turns
+
+        is_scoring = (col, row) in scoring
+        if is_scoring:
+            score += points
+        box = [round(value * scale) for value in (left, top, left + tile_size, top + tile_size)]
+        tiles.append({'cell': [col, row], 'box': box, 'object': object_name, 'rotation': rotation,
+                      'scoring': is_scoring})
+
+    image = _degrade(canvas, rng, noise, jpeg_quality, scale)
+    truth = {
+        'settings': {'tile_count': tile_count, 'seed': seed, 'object_ratio': object_ratio, 'layout': layout,
+                     'rotated': rotated, 'tile_size': tile_size, 'noise': noise,
+                     'jpeg_quality': jpeg_quality, 'scale': scale},
+        'image_size': [image.shape[1], image.shape[0]],
+        'tile_count': tile_count,
+        'incorrect_arrows': rotated,
+        'expected_valid': rotated == 0,
+        'scorable_tiles': len(scoring),
+        'expected_score': score,
+        'tiles': tiles,
+    }
+    return image, truth
+
+def _degrade(image, rng, noise, jpeg_quality, scale):
+    """Apply resolution, noise and compression, in the order a camera would"""
+    if scale != 1.0:
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=interpolation)
+    if noise:
+        noisy = image.astype(np.int16) + rng.normal(0, noise, image.shape).astype(np.int16)
+        image = np.clip(noisy, 0, 255).astype(np.uint8)
+    if jpeg_quality is not None:
+        encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])[1]
+        image = cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+    return image
+
+def write_board(image, truth, output_path):
+    """Save a board and its ground truth (<output stem>.json)"""
+    quality = truth['settings']['jpeg_quality']
+    params = [cv2.IMWRITE_JPEG_QUALITY, quality] if quality is not None else []
+    cv2.imwrite(output_path, image, params)
+    with open(os.path.splitext(output_path)[0] + ".json", "w") as f:
+        json.dump(truth, f, indent=2)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic Beacon Patrol boards with ground truth.")
+    parser.add_argument("tiles", type=int, help="Number of tiles")
+    parser.add_argument("-o", "--output", required=True, help="Image file to write; ground truth goes next to it as .json")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (consecutive seeds for --boards)")
+    parser.add_argument("--boards", type=int, default=1, help="Number of boards; files are numbered when > 1")
+    parser.add_argument("--layout", choices=LAYOUTS, default="grid", help="Tile arrangement")
+    parser.add_argument("--objects", type=float, default=0.6, help="Fraction of tiles with a lighthouse or buoy")
+    parser.add_argument("--rotated", type=int, default=0, help="Tiles to rotate (makes the board invalid)")
+    parser.add_argument("--tile-size", type=int, default=TILE_SIZE, help="Tile size in pixels before scaling")
+    parser.add_argument("--noise", type=float, default=0.0, help="Gaussian noise standard deviation")
+    parser.add_argument("--jpeg-quality", type=int, help="JPEG quality (round-trips the image through JPEG)")
+    parser.add_argument("--scale", type=float, default=1.0, help="Resize the finished board by this factor")
+    args = parser.parse_args(argv)
+
+    stem, ext = os.path.splitext(args.output)
+    for i in range(args.boards):
+        image, truth = generate_board(args.tiles, seed=args.seed + i, object_ratio=args.objects, layout=args.layout,
+                                      rotated=args.rotated, tile_size=args.tile_size, noise=args.noise,
+                                      jpeg_quality=args.jpeg_quality, scale=args.scale)
+        write_board(image, truth, f"{stem}_{i}{ext or '.jpg'}" if args.boards > 1 else args.output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+import hashlib
+import logging
+import os
+import threading
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "images", "templates")
+
+Template = namedtuple("Template", ["name", "path", "image", "kind", "rotation", "points"])
+# A template with its TM_CCOEFF_NORMED constants worked out once: the pixels
+# less their mean (float32) and the norm of those
+NormalisedTemplate = namedtuple("NormalisedTemplate", ["image", "zero_mean", "norm"])
+
+# Scale space searched when a photo's scale is unknown: half-octave steps,
+# each within the +-20% or so that a template tolerates of the next. Below
+# half size the arrow templates are too small to match.
+TEMPLATE_SCALES = (0.5, 0.707, 1.0, 1.414, 2.0, 2.828, 4.0)
+
+logger = logging.getLogger(__name__)
+
+# filename -> (name, kind, rotation in degrees, points awarded on a scored tile)
+# Order matters: object templates are tried in this order when scoring a tile.
+TEMPLATE_SPECS = {
+    "arrow_tight_crop.png": ("arrow", "arrow", 0, None),
+    "arrow_tight_90.png": ("arrow_90", "arrow", 90, None),
+    "arrow_tight_180.png": ("arrow_180", "arrow", 180, None),
+    "arrow_tight_270.png": ("arrow_270", "arrow", 270, None),
+    "bp_hq_score_3.png": ("beacon_hq", "lighthouse", 0, 3),
+    "lighthouse_score_3.png": ("lighthouse", "lighthouse", 0, 3),
+    "small_buoy_birds_score_1.png": ("buoy_birds", "buoy", 0, 2),
+    "small_buoy_birds2_score_1.png": ("buoy_birds2", "buoy", 0, 2),
+    "small_buoy_blue_score_1.png": ("buoy_blue", "buoy", 0, 2),
+    "small_buoy_score_1.png": ("buoy_score", "buoy", 0, 2),
+}
+
+_lock = threading.Lock()
+_templates = {}  # absolute path -> Template
+_mtimes = {}  # absolute path -> modification time, for templates in TEMPLATE_DIR
+_extra_templates = {}  # absolute path -> Template, for paths outside TEMPLATE_DIR
+_scaled_templates = {}  # (absolute path, scale) -> resized read-only array
+_normalised_templates = {}  # (absolute path, scale) -> NormalisedTemplate
+_version = None  # Content hash of the loaded template set
+
+def template_path(filename):
+    """Absolute path of a file in the bundled template directory"""
+    return os.path.join(TEMPLATE_DIR, filename)
+
+def _load(path, name=None, kind=None, rotation=0, points=None):
+    image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        return None
+    image.setflags(write=False)  # Shared between requests, so never mutate it
+    return Template(name or os.path.splitext(os.path.basename(path))[0], path, image, kind, rotation, points)
+
+def reload_templates():
+    """
+    (Re)load every template in TEMPLATE_DIR.
+
+    Called once at import; call it again after the template set changes on
+    disk. The registry is swapped in one step, so concurrent readers see
+    either the old set or the new one, never a mixture.
+    """
+    global _templates, _mtimes, _extra_templates, _scaled_templates, _normalised_templates, _version
+
+    templates = {}
+    mtimes = {}
+    digest = hashlib.sha1()
+    filenames = sorted(f for f in os.listdir(TEMPLATE_DIR) if f.lower().endswith(".png")) if os.path.isdir(TEMPLATE_DIR) else []
+    # Known templates first, in spec order, then anything else found on disk
+    ordered = [f for f in TEMPLATE_SPECS if f in filenames] + [f for f in filenames if f not in TEMPLATE_SPECS]
+
+    for filename in ordered:
+        path = template_path(filename)
+        name, kind, rotation, points = TEMPLATE_SPECS.get(filename, (None, None, 0, None))
+        template = _load(path, name, kind, rotation, points)
+        if template is None:
+            logger.warning("Could not load template %s", path)
+            continue
+        templates[path] = template
+        mtimes[path] = os.path.getmtime(path)
+        digest.update(filename.encode())
+        digest.update(template.image.tobytes())
+
+    with _lock:
+        _templates = templates
+        _mtimes = mtimes
+        _extra_templates = {}
+        _scaled_templates = {}
+        _normalised_templates = {}
+        _version = digest.hexdigest()[:12]
+
+def reload_if_changed():
+    """
+    Hot-reload hook: reload the registry if any template was added, removed
+    or modified since it was last loaded.
+
+    Returns:
+        bool: True if the registry was reloaded
+    """
+    try:
+        current = {
+            template_path(f): os.path.getmtime(template_path(f))
+            for f in os.listdir(TEMPLATE_DIR) if f.lower().endswith(".png")
+        }
+    except OSError:
+        current = {}
+
+    if current == _mtimes:
+        return False
+    reload_templates()
+    return True
+
+def get_template(path):
+    """
+    Return the preloaded grayscale template for a path (read-only array).
+
+    Paths outside the registry are loaded from disk on first use and then
+    cached like the bundled templates. Returns None if the file can't be read.
+    """
+    key = os.path.abspath(path)
+    template = _templates.get(key) or _extra_templates.get(key)
+    if template is None:
+        template = _load(key)
+        if template is None:
+            return None
+        with _lock:
+            _extra_templates[key] = template
+    return template.image
+
+def template_set_version():
+    """Short content hash of the loaded template set; changes whenever a template does"""
+    return _version
+
+def get_scaled_template(path, scale):
+    """
+    Return a template resized by scale (read-only array), cached per process.
+
+    Returns None if the template can't be read or would shrink below 1 pixel.
+    """
+    key = (os.path.abspath(path), scale)
+    scaled = _scaled_templates.get(key)
+    if scaled is None:
+        template = get_template(path)
+        if template is None:
+            return None
+        height, width = template.shape
+        size = (int(round(width * scale)), int(round(height * scale)))
+        if min(size) < 1:
+            return None
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+        scaled = cv2.resize(template, size, interpolation=interpolation)
+        scaled.setflags(write=False)
+        with _lock:
+            _scaled_templates[key] = scaled
+    return scaled
+
+def get_normalised_template(path, scale=1.0):
+    """
+    Return a template resized by scale (see get_scaled_template) as a
+    NormalisedTemplate, cached per process, so matching it many times never
+    repeats the per-template arithmetic.
+
+    Returns None if the template can't be read or would shrink below 1 pixel.
+    """
+    key = (os.path.abspath(path), scale)
+    normalised = _normalised_templates.get(key)
+    if normalised is None:
+        image = get_template(path) if scale == 1 else get_scaled_template(path, scale)
+        if image is None:
+            return None
+        zero_mean = image.astype(np.float32) - np.float32(image.mean())
+        zero_mean.setflags(write=False)
+        normalised = NormalisedTemplate(image, zero_mean, float(np.linalg.norm(zero_mean)))
+        with _lock:
+            _normalised_templates[key] = normalised
+    return normalised
+
+def get_templates(kind=None):
+    """List registered templates (optionally of a single kind) in registry order"""
+    return [t for t in _templates.values() if kind is None or t.kind == kind]
+
+reload_templates()
@@ -0,0 +1,74 @@
+import cv2
+import numpy as np
+from analysis_context import AnalysisContext, decode_reduction, get_analysis_context
+from arrow_detection import get_arrow_positions
+from board_analyzer import analyze_complete_board
+from scored_objects_detector import calculate_board_score
+
+def test_from_path_handles_missing_file():
+    """Test that an unreadable file produces no context"""
+    assert AnalysisContext.from_path("definitely_does_not_exist.jpg") is None
+    assert get_analysis_context("definitely_does_not_exist.jpg") is None
+
+def test_decode_reduction_picks_the_smallest_factor_that_fits():
+    """Test that images are reduced no more than needed to fit"""
+    assert decode_reduction(4000, 3000, 4000) == 1
+    assert decode_reduction(4001, 3000, 4000) == 2
+    assert decode_reduction(10000, 7500, 4000) == 4
+    assert decode_reduction(40000, 300, 4000) is None
+
+def test_from_bytes_decodes_jpeg_at_reduced_scale():
+    """Test that a reduced decode yields the smaller image directly"""
+    data = cv2.imencode(".jpg", np.full((606, 808, 3), 128, dtype=np.uint8))[1].tobytes()
+
+    assert AnalysisContext.from_bytes(data, 4).image.shape == (152, 202, 3)
+
+def test_get_analysis_context_passes_context_through():
+    """Test that an existing context is reused rather than rebuilt"""
+    context = AnalysisContext(np.zeros((300, 300, 3), dtype=np.uint8))
+
+    assert get_analysis_context(context) is context
+    assert context.gray.shape == (300, 300)
+
+def test_cached_computes_once():
+    """Test that memoised results are only computed on first use"""
+    context = AnalysisContext(np.zeros((10, 10, 3), dtype=np.uint8))
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return "result"
+
+    assert context.cached("key", compute) == "result"
+    assert context.cached("key", compute) == "result"
+    assert len(calls) == 1
+
+def test_context_gives_same_results_as_path():
+    """Test that scoring from a context matches scoring from a file path"""
+    image_path = "test_images/valid_boards/board_7.jpg"
+    context = AnalysisContext.from_path(image_path)
+
+    correct_positions, _incorrect_positions, image = get_arrow_positions(context)
+
+    assert image is context.image
+    assert len(correct_positions) == 23
+    assert calculate_board_score(context) == calculate_board_score(image_path)
+
+def test_analyze_complete_board_decodes_image_once(monkeypatch):
+    """Test that the full pipeline decodes the board image at full size only once"""
+    image_path = "test_images/valid_boards/board_7.jpg"
+    real_imread = cv2.imread
+    board_reads = []
+
+    def counting_imread(path, *args):
+        if path == image_path and args[:1] in ((), (cv2.IMREAD_COLOR,)):  # Not the reduced arrow-presence decode
+            board_reads.append(path)
+        return real_imread(path, *args)
+
+    monkeypatch.setattr(cv2, "imread", counting_imread)
+
+    result = analyze_complete_board(image_path, image_path)
+
+    assert result['is_valid'] == True
+    assert result['score'] == 7
+    assert len(board_reads) == 1
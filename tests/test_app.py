@@ -15,7 +15,13 @@ def client():
 
 @pytest.fixture
 def sample_image():
-    """Create a sample image for testing"""
+    """A real board photo; anything without tile arrows is no longer a valid upload"""
+    with open("test_images/valid_boards/7_tiles_blue.jpg", "rb") as f:
+        return io.BytesIO(f.read())
+
+@pytest.fixture
+def blue_image():
+    """Create a plain blue image, with water but no tiles"""
     img = Image.new("RGB", (800, 600), color="blue")
     img_bytes = io.BytesIO()
     img.save(img_bytes, format="JPEG")
@@ -41,7 +47,15 @@ def test_upload_valid_image(client, sample_image):
     })
     assert response.status_code == 200
     assert b"Your Results" in response.data
-    assert b"Score:" in response.data
+    assert b"Points Earned" in response.data
+
+def test_upload_blue_image_without_arrows(client, blue_image):
+    """Test that a blue photo with no tile arrows is turned away"""
+    response = client.post("/upload", data={
+        "file": (blue_image, "test.jpg")
+    })
+    assert response.status_code == 400
+    assert b"No tile arrows found" in response.data
 
 def test_upload_no_file(client):
     """Test uploading without selecting a file returns error"""
@@ -67,3 +81,14 @@ def test_upload_integration_happy_path(client, sample_image):
     assert b"Your Results" in response.data
     assert b"7 points" in response.data  # Known score for this board
     assert b"Novices" in response.data   # Known rank
+
+def test_upload_writes_only_the_display_image(client, monkeypatch):
+    """Test that uploads are scored in memory without saving the original"""
+    import os
+    monkeypatch.setitem(app.config, "RESULT_CACHE_ENABLED", False)
+    with open("test_images/valid_boards/board_7.jpg", "rb") as f:
+        response = client.post("/upload", data={
+            "file": (f, "board_7.jpg")
+        })
+    assert response.status_code == 200
+    assert os.listdir(app.config["UPLOAD_FOLDER"]) == ["board_7_scored.jpg"]
@@ -5,6 +5,7 @@ import os
 import cv2
 import numpy as np
 from PIL import Image
+import arrow_detection
 from arrow_detection import get_arrow_positions, detect_arrow_orientations, validate_board_arrows
 
 @pytest.fixture 
@@ -143,4 +144,83 @@ def test_validate_board_arrows_returns_invalid_for_wrong_arrows():
     assert "3 arrows pointing wrong direction" in message
     assert correct_count == 2
     assert incorrect_count == 3
-    assert annotated_image is not None
\ No newline at end of file
+    assert annotated_image is not None
+
+def test_pyramid_matching_finds_same_arrows_as_full_resolution(monkeypatch):
+    """Test that coarse-to-fine matching gives the same arrows as a full-image sweep"""
+    from analysis_context import AnalysisContext
+
+    image = AnalysisContext.from_path("test_images/invalid_boards/5_tiles_3_arrows_wrong.jpg").image
+
+    monkeypatch.setattr(arrow_detection, "PYRAMID_LEVELS", 0)
+    full_correct, full_incorrect, _image = get_arrow_positions(AnalysisContext(image))
+    monkeypatch.setattr(arrow_detection, "PYRAMID_LEVELS", 1)
+    pyramid_correct, pyramid_incorrect, _image = get_arrow_positions(AnalysisContext(image))
+
+    assert sorted(pyramid_correct) == sorted(full_correct)
+    assert sorted(pyramid_incorrect) == sorted(full_incorrect)
+
+def test_pyramid_levels_limited_by_template_size():
+    """Test that templates are never shrunk below the minimum matchable size"""
+    from arrow_detection import _pyramid_levels_for
+
+    assert _pyramid_levels_for(np.zeros((16, 15), dtype=np.uint8), 3) == 1
+    assert _pyramid_levels_for(np.zeros((100, 100), dtype=np.uint8), 3) == 3
+    assert _pyramid_levels_for(np.zeros((8, 8), dtype=np.uint8), 2) == 0
+
+def test_detect_arrows_labels_orientations():
+    """Test that every arrow comes back once, labelled with the rotation of its tile"""
+    from analysis_context import AnalysisContext
+    from arrow_detection import detect_arrows
+    from synthetic_boards import generate_board
+
+    image, truth = generate_board(12, seed=5, rotated=3)
+
+    arrows = detect_arrows(AnalysisContext(image))
+
+    assert len(arrows) == 12
+    for tile in truth['tiles']:
+        left, top, right, bottom = tile['box']
+        labels = [orientation for x, y, orientation in arrows if left <= x < right and top <= y < bottom]
+        # Synthetic tiles are turned counter-clockwise, the rotated templates clockwise
+        assert labels == [(360 - tile['rotation']) % 360]
+
+def test_detect_arrows_matches_arrow_positions():
+    """Test that get_arrow_positions splits detect_arrows by orientation"""
+    from arrow_detection import detect_arrows
+
+    path = "test_images/invalid_boards/5_tiles_3_arrows_wrong.jpg"
+    arrows = detect_arrows(path)
+    correct_positions, incorrect_positions, _image = get_arrow_positions(path)
+
+    assert sorted((x, y) for x, y, orientation in arrows if orientation == 0) == sorted(correct_positions)
+    assert sorted((x, y) for x, y, orientation in arrows if orientation != 0) == sorted(incorrect_positions)
+    assert {orientation for _x, _y, orientation in arrows} <= {0, 90, 180, 270}
+    assert detect_arrows("definitely_does_not_exist.jpg") == []
+
+def test_rotation_invariant_template():
+    """Test that the candidate template is square and unchanged by quarter turns"""
+    from arrow_detection import CORRECT_TEMPLATE_PATH, _rotation_invariant_template
+    from template_registry import get_template
+
+    invariant = _rotation_invariant_template(get_template(CORRECT_TEMPLATE_PATH))
+
+    assert invariant.shape == (16, 16)
+    for turns in range(1, 4):
+        assert np.abs(np.rot90(invariant, turns).astype(int) - invariant).max() <= 1  # Rounding
+
+def test_detect_arrows_at_scale_finds_enlarged_arrows():
+    """Test that resized templates find the arrows of an enlarged photo where they are"""
+    from analysis_context import AnalysisContext
+    from arrow_detection import detect_arrows, detect_arrows_at_scale
+    from synthetic_boards import generate_board
+
+    image, _truth = generate_board(12, seed=5, rotated=3)
+    enlarged = cv2.resize(image, None, fx=2, fy=2, interpolation=cv2.INTER_LINEAR)
+
+    arrows = detect_arrows_at_scale(AnalysisContext(enlarged), 2.0)
+
+    expected = detect_arrows(AnalysisContext(image))
+    assert len(arrows) == len(expected)
+    for x, y, orientation in expected:
+        assert any(abs(ax - 2 * x) <= 4 and abs(ay - 2 * y) <= 4 and label == orientation for ax, ay, label in arrows)
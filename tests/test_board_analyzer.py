@@ -2,7 +2,8 @@ import pytest
 import tempfile
 import io
 from PIL import Image
-from board_analyzer import analyze_complete_board, _is_valid_image_size
+import numpy as np
+from board_analyzer import analyze_complete_board, _is_valid_image_size, _blue_percentage, _check_board_colors, _thumbnail
 
 @pytest.fixture
 def green_dominant_image():
@@ -104,6 +105,18 @@ def test_analyze_complete_board_succeeds_with_valid_image():
     assert result['score'] == 7
     assert 'Novices' in result['rank'][0]
 
+def test_analyze_complete_board_scores_a_path_on_its_own(tmp_path):
+    """Test that a file path alone is analysed and annotated without a save_path"""
+    import shutil
+    image_path = str(tmp_path / "board_7.jpg")
+    shutil.copy("test_images/valid_boards/board_7.jpg", image_path)
+
+    result = analyze_complete_board(image_path)
+
+    assert result['is_valid'] == True
+    assert result['score'] == 7
+    assert result['annotated_filename'] == str(tmp_path / "board_7_scored.jpg")
+
 def test_analyze_complete_board_returns_consistent_structure():
     """Test that function always returns expected structure"""
     # Test with invalid input
@@ -131,4 +144,138 @@ def test_is_valid_image_size():
     
     assert _is_valid_image_size(small_img) == False
     assert _is_valid_image_size(large_img) == False
-    assert _is_valid_image_size(valid_img) == True
\ No newline at end of file
+    assert _is_valid_image_size(valid_img) == True
+
+def test_blue_percentage_matches_per_pixel_sampling():
+    """Test that the vectorised colour check samples exactly every 50th pixel"""
+    rng = np.random.default_rng(0)
+    img = Image.fromarray(rng.integers(0, 256, (300, 401, 3), dtype=np.uint8))
+
+    sampled_pixels = list(np.asarray(img).reshape(-1, 3).tolist())[::50]
+    expected = sum(1 for r, g, b in sampled_pixels if b > r and b > g and b > 100) / len(sampled_pixels)
+
+    assert _blue_percentage(img) == expected
+
+def test_check_board_colors_accepts_blue_and_rejects_green(valid_blue_image, green_dominant_image):
+    """Test the blue-water threshold on solid-colour images"""
+    assert _check_board_colors(valid_blue_image) == True
+    assert _check_board_colors(green_dominant_image) == False
+
+def test_analyze_complete_board_accepts_image_bytes(tmp_path):
+    """Test the in-memory path: encoded bytes in, only the scored image written out"""
+    with open("test_images/valid_boards/board_7.jpg", "rb") as f:
+        image_bytes = f.read()
+    annotated_path = str(tmp_path / "scored.jpg")
+
+    result = analyze_complete_board(image_bytes, annotated_path=annotated_path)
+
+    assert result['is_valid'] == True
+    assert result['score'] == 7
+    assert result['annotated_filename'] == annotated_path
+    assert [p.name for p in tmp_path.iterdir()] == ["scored.jpg"]
+
+def test_analyze_complete_board_accepts_decoded_array():
+    """Test that a decoded BGR array is scored without touching disk"""
+    import cv2
+    image = cv2.imread("test_images/valid_boards/board_7.jpg")
+
+    result = analyze_complete_board(image, annotate=False)
+
+    assert result['is_valid'] == True
+    assert result['score'] == 7
+    assert result['annotated_filename'] is None
+
+def test_analyze_complete_board_rejects_undecodable_bytes():
+    """Test that bytes that aren't an image fail at the read stage"""
+    result = analyze_complete_board(b"definitely not an image")
+
+    assert result['is_valid'] == False
+    assert result['failed_at'] == 'image_read'
+
+def test_blue_percentage_matches_for_pil_and_bgr_inputs(valid_blue_image):
+    """Test that the colour check reads BGR arrays in the right channel order"""
+    bgr = np.asarray(valid_blue_image)[:, :, ::-1].copy()
+
+    assert _blue_percentage(bgr) == _blue_percentage(valid_blue_image)
+
+def test_thumbnail_colour_check_agrees_with_sampled_pixels():
+    """Test that the draft-mode thumbnail sees about as much blue as every 50th full-size pixel"""
+    image_path = "test_images/valid_boards/7_tiles_blue.jpg"
+    thumbnail = _thumbnail(image_path)
+
+    assert thumbnail.size[0] <= Image.open(image_path).size[0] // 4
+    assert _blue_percentage(thumbnail, step=1) == pytest.approx(_blue_percentage(Image.open(image_path)), abs=0.02)
+
+def test_every_input_type_gets_the_same_colour_check():
+    """Test that files, PIL images, arrays and contexts are colour-checked on the same 1/8-scale thumbnail"""
+    import cv2
+    from analysis_context import AnalysisContext
+    image_path = "test_images/valid_boards/7_tiles_blue.jpg"
+    image = cv2.imread(image_path)
+    from_file = _blue_percentage(_thumbnail(image_path), step=1)
+
+    for image_input in (Image.open(image_path), image, AnalysisContext(image)):
+        thumbnail = _thumbnail(image_input)
+        assert np.asarray(thumbnail).shape[:2] == (-(-image.shape[0] // 8), -(-image.shape[1] // 8))
+        assert _blue_percentage(thumbnail, step=1) == pytest.approx(from_file, abs=0.01)
+
+def test_wrong_colour_bytes_are_rejected_before_full_decode(red_dominant_image):
+    """Test that encoded uploads are only decoded in full once the thumbnail check passes"""
+    result = analyze_complete_board(red_dominant_image.getvalue())
+
+    assert result['failed_at'] == 'color_check'
+    assert 'decode' not in result['details'].get('timings', {})
+
+def test_blue_photo_without_arrows_fails_arrow_check(valid_blue_image):
+    """Test that blue water with no tile arrows is rejected rather than scored"""
+    img_bytes = io.BytesIO()
+    valid_blue_image.save(img_bytes, format="JPEG")
+
+    result = analyze_complete_board(img_bytes.getvalue(), annotate=False)
+
+    assert result['is_valid'] == False
+    assert result['failed_at'] == 'arrow_check'
+    assert result['details']['correct_arrows'] == 0
+
+def test_large_photo_without_arrows_is_rejected_before_full_decode(monkeypatch):
+    """Test that arrow presence is checked on a reduced decode before the photo is decoded in full"""
+    import cv2
+    image = np.full((3000, 4000, 3), (200, 120, 60), dtype=np.uint8)
+    data = cv2.imencode(".jpg", image)[1].tobytes()
+    real_imdecode = cv2.imdecode
+    decode_flags = []
+
+    def recording_imdecode(buffer, flags):
+        decode_flags.append(flags)
+        return real_imdecode(buffer, flags)
+
+    monkeypatch.setattr(cv2, "imdecode", recording_imdecode)
+
+    result = analyze_complete_board(data, annotate=False)
+
+    assert result['failed_at'] == 'arrow_check'
+    assert result['details']['correct_arrows'] == 0
+    assert decode_flags == [cv2.IMREAD_REDUCED_COLOR_4]
+
+def test_oversized_jpeg_is_decoded_at_reduced_scale():
+    """Test that a JPEG over 4000 pixels a side is scored from a reduced decode rather than refused"""
+    import cv2
+    image = cv2.imread("test_images/valid_boards/board_7.jpg")
+    image_bytes = cv2.imencode(".jpg", cv2.resize(image, None, fx=2.2, fy=2.2))[1].tobytes()
+
+    result = analyze_complete_board(image_bytes, annotate=False)
+
+    assert result['is_valid'] == True
+    assert result['score'] == 7
+    assert result['details']['image_width'] == round(2016 * 2.2)
+    assert result['details']['decode_reduction'] == 2
+
+def test_oversized_png_fails_size_check_from_header():
+    """Test that formats that can't be decoded at reduced scale keep the size limit"""
+    img_bytes = io.BytesIO()
+    Image.new("RGB", (4100, 300), color=(135, 206, 235)).save(img_bytes, format="PNG")
+
+    result = analyze_complete_board(img_bytes.getvalue())
+
+    assert result['failed_at'] == 'size_check'
+    assert 'decode' not in result['details'].get('timings', {})
@@ -0,0 +1,57 @@
+import pytest
+import random
+from board_grid import BoardGrid
+from tile_analyzer import _check_tile_surrounded
+
+def tiles(cells, size=100, jitter=0, seed=0):
+    """Boundaries for (col, row) cells, each nudged by up to jitter pixels"""
+    rng = random.Random(seed)
+    boundaries = []
+    for col, row in cells:
+        left = col * size + rng.randint(-jitter, jitter)
+        top = row * size + rng.randint(-jitter, jitter)
+        boundaries.append((left, top, left + size, top + size))
+    return boundaries
+
+def test_plus_shape_centre_is_surrounded():
+    """Test that the centre of a plus shape is surrounded, with one neighbour each way"""
+    grid = BoardGrid(tiles([(1, 1), (0, 1), (2, 1), (1, 0), (1, 2)]))
+
+    assert grid.surrounded() == [0]
+    assert grid.neighbours(0) == {'left': 1, 'right': 2, 'up': 3, 'down': 4}
+    assert grid.neighbours(1) == {'right': 0}
+
+def test_cells_and_lookup():
+    """Test that jittered tiles snap to their cells and can be looked up"""
+    grid = BoardGrid(tiles([(3, 2), (4, 2)], jitter=10))
+
+    assert grid.cell(0) == (3, 2)
+    assert grid.tiles_at(4, 2) == [1]
+    assert grid.tiles_at(0, 0) == []
+
+def test_bounds():
+    """Test the pixel and cell bounds, and None for an empty grid"""
+    grid = BoardGrid(tiles([(1, 1), (2, 3)]))
+
+    assert grid.bounds() == (100, 100, 300, 400)
+    assert grid.cell_bounds() == (1, 1, 2, 3)
+    assert BoardGrid([]).bounds() is None
+    assert BoardGrid([]).cell_bounds() is None
+
+def test_connected_components():
+    """Test that tiles split into groups of touching cells"""
+    grid = BoardGrid(tiles([(0, 0), (1, 0), (5, 5), (1, 1), (9, 0)]))
+
+    assert grid.connected_components() == [[0, 1, 3], [2], [4]]
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_pairwise_check_on_misaligned_boards(seed):
+    """Test that the index gives the same answer as comparing every pair of tiles"""
+    rng = random.Random(seed)
+    cells = {(rng.randint(0, 7), rng.randint(0, 7)) for _ in range(45)}
+    boundaries = tiles(sorted(cells), jitter=35, seed=seed)
+
+    grid = BoardGrid(boundaries, (100, 100))
+
+    assert [grid.is_surrounded(i) for i in range(len(boundaries))] == \
+           [_check_tile_surrounded(boundary, boundaries) for boundary in boundaries]
@@ -0,0 +1,46 @@
+import pytest
+import cv2
+import numpy as np
+import board_region
+from analysis_context import AnalysisContext
+from arrow_detection import detect_arrows
+from board_region import find_board_region
+
+TABLE_BGR = (60, 110, 160)  # Wood brown
+
+def test_box_pads_the_water():
+    """Test that the board box is the water's extent plus the padding"""
+    image = np.full((1000, 1200, 3), TABLE_BGR, dtype=np.uint8)
+    image[400:600, 500:800] = (200, 120, 60)  # Water blue
+
+    left, top, right, bottom = find_board_region(image)
+
+    padding = int(board_region.REGION_PADDING * 1000)
+    assert left == pytest.approx(500 - padding, abs=board_region.REGION_SAMPLE_STEP)
+    assert top == 400 - padding
+    assert right == pytest.approx(800 + padding, abs=board_region.REGION_SAMPLE_STEP)
+    assert bottom == pytest.approx(600 + padding, abs=board_region.REGION_SAMPLE_STEP)
+
+def test_whole_image_when_no_water_or_no_saving():
+    """Test that no region is returned when there's no water or the water fills the photo"""
+    assert find_board_region(np.full((400, 400, 3), TABLE_BGR, dtype=np.uint8)) is None
+    assert find_board_region(np.full((400, 400, 3), (200, 120, 60), dtype=np.uint8)) is None
+
+def test_specks_of_blue_are_ignored():
+    """Test that a small blue speck away from the board doesn't widen the box"""
+    image = np.full((1000, 1000, 3), TABLE_BGR, dtype=np.uint8)
+    image[400:600, 400:600] = (200, 120, 60)
+    image[20:26, 950:956] = (200, 120, 60)  # A blue speck on the table
+
+    assert find_board_region(image)[2] < 900
+
+def test_arrows_map_back_to_full_photo_coordinates():
+    """Test that arrows on a board surrounded by table are found shifted by the border"""
+    board = cv2.imread("test_images/valid_boards/7_tiles_blue.jpg")
+    photo = cv2.copyMakeBorder(board, 300, 500, 400, 600, cv2.BORDER_CONSTANT, value=TABLE_BGR)
+    context = AnalysisContext(photo)
+
+    arrows = detect_arrows(context)
+
+    assert board_region.board_region(context) is not None
+    assert sorted(arrows) == sorted((x + 400, y + 300, orientation) for x, y, orientation in detect_arrows(board))
@@ -0,0 +1,52 @@
+import pytest
+import cv2
+import numpy as np
+from color_stats import ColorStats, blue_mask, red_mask
+from scored_objects_detector import calculate_blue_percentage, has_red_color
+
+@pytest.fixture
+def board_image():
+    return cv2.imread("test_images/valid_boards/board_16.jpg")
+
+def test_counts_match_masks_for_random_rectangles(board_image):
+    """Test that every rectangle query agrees with counting the mask pixels directly"""
+    hsv = cv2.cvtColor(board_image, cv2.COLOR_BGR2HSV)
+    masks = {"blue": blue_mask(hsv), "red": red_mask(hsv)}
+    stats = ColorStats(board_image)
+    height, width = board_image.shape[:2]
+    rng = np.random.default_rng(0)
+
+    for _ in range(50):
+        left, right = sorted(rng.integers(0, width, 2))
+        top, bottom = sorted(rng.integers(0, height, 2))
+        for color, mask in masks.items():
+            assert stats.count(color, left, top, right, bottom) == cv2.countNonZero(mask[top:bottom, left:right])
+
+def test_fraction_matches_per_tile_helpers(board_image):
+    """Test that fractions agree with the per-tile blue and red helpers"""
+    tile = board_image[400:700, 500:800]
+    stats = ColorStats(board_image)
+
+    assert stats.fraction("blue", 500, 400, 800, 700) * 100 == pytest.approx(calculate_blue_percentage(tile))
+    assert (stats.fraction("red", 500, 400, 800, 700) > 0.02) == has_red_color(tile)
+
+def test_region_uses_image_coordinates_and_clips(board_image):
+    """Test that a region's counts use image coordinates, clipped to the region"""
+    full = ColorStats(board_image)
+    region = ColorStats(board_image, region=(300, 200, 900, 800))
+
+    assert region.count("blue", 400, 300, 700, 600) == full.count("blue", 400, 300, 700, 600)
+    # Only the part inside the region is counted
+    assert region.count("blue", 0, 0, 600, 500) == full.count("blue", 300, 200, 600, 500)
+    assert region.fraction("blue", 0, 0, 100, 100) == 0.0
+
+def test_solid_colors():
+    """Test counts and fractions on solid blue and red halves"""
+    image = np.zeros((20, 40, 3), dtype=np.uint8)
+    image[:, :20] = (200, 100, 50)  # Blue in BGR
+    image[:, 20:] = (0, 0, 200)  # Red
+    stats = ColorStats(image)
+
+    assert stats.fraction("blue", 0, 0, 40, 20) == 0.5
+    assert stats.fraction("red", 20, 0, 40, 20) == 1.0
+    assert stats.count("red", 0, 0, 20, 20) == 0
@@ -0,0 +1,47 @@
+import pytest
+import cv2
+import numpy as np
+import correlation
+from correlation import CorrelationEngine
+from template_registry import get_scaled_template, template_path
+
+@pytest.fixture
+def board_gray():
+    return cv2.cvtColor(cv2.imread("test_images/valid_boards/7_tiles_blue.jpg"), cv2.COLOR_BGR2GRAY)
+
+def test_small_templates_match_opencv(board_gray):
+    """Test that the arrow templates at pyramid level 1 score as with cv2.matchTemplate from one engine"""
+    coarse = cv2.pyrDown(board_gray)
+    engine = CorrelationEngine(coarse)
+    for name in ("arrow_tight_crop.png", "arrow_tight_90.png", "arrow_tight_180.png", "arrow_tight_270.png"):
+        template = get_scaled_template(template_path(name), 0.5)
+        assert template.size <= correlation.SPATIAL_MAX_TEMPLATE_AREA
+        expected = cv2.matchTemplate(coarse, template, cv2.TM_CCOEFF_NORMED)
+
+        result = engine.match(template)
+
+        assert result.shape == expected.shape
+        assert np.abs(result - expected).max() < 1e-3
+
+def test_flat_windows_and_flat_templates_follow_opencv():
+    """Test that flat windows score 0 and a flat template matches everywhere, as in OpenCV"""
+    image = np.full((50, 60), 128, dtype=np.uint8)
+    image[10:30, 20:40] = np.random.default_rng(0).integers(0, 255, (20, 20))
+    engine = CorrelationEngine(image)
+
+    result = engine.match(image[10:18, 20:28].copy())
+    assert result[0, 0] == 0  # Flat window
+    assert result[10, 20] == pytest.approx(1, abs=1e-4)
+    assert engine.match(np.full((5, 5), 7, dtype=np.uint8)).min() == 1  # Flat template matches everywhere
+
+def test_larger_templates_fall_back_to_opencv(board_gray):
+    """Test that templates over SPATIAL_MAX_TEMPLATE_AREA go straight to cv2.matchTemplate"""
+    template = board_gray[100:116, 200:215].copy()
+
+    assert np.array_equal(CorrelationEngine(board_gray).match(template),
+                          cv2.matchTemplate(board_gray, template, cv2.TM_CCOEFF_NORMED))
+
+def test_template_larger_than_image_is_rejected():
+    """Test that a template larger than the image raises ValueError"""
+    with pytest.raises(ValueError):
+        CorrelationEngine(np.zeros((10, 10), dtype=np.uint8)).match(np.zeros((12, 5), dtype=np.uint8))
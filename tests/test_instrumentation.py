@@ -0,0 +1,103 @@
+import pytest
+import time
+import instrumentation
+from board_analyzer import analyze_complete_board
+from instrumentation import collect_timings, histograms, reset_histograms, stage, timed
+
+VALID_BOARD = "test_images/valid_boards/board_7.jpg"
+
+@pytest.fixture(autouse=True)
+def clean_histograms():
+    reset_histograms()
+    yield
+    reset_histograms()
+
+def test_stages_accumulate_into_collected_timings():
+    """Test that repeated stages add up under one name"""
+    with collect_timings() as timings:
+        with stage("a"):
+            pass
+        with stage("a"):
+            pass
+        with stage("b"):
+            pass
+
+    assert set(timings) == {"a", "b"}
+    assert histograms()["a"]["count"] == 2
+    assert histograms()["b"]["count"] == 1
+
+def test_nested_stages_record_exclusive_times():
+    """Test that an outer stage doesn't count the time of the stages inside it"""
+    with collect_timings() as timings:
+        with stage("outer"):
+            with stage("inner"):
+                time.sleep(0.05)
+
+    assert timings["inner"] >= 50
+    assert timings["outer"] < 25
+    assert histograms()["outer"]["sum_ms"] < 25
+
+def test_stage_outside_collection_only_updates_histograms():
+    """Test that a stage run outside collect_timings still reaches the histograms"""
+    with stage("orphan"):
+        pass
+
+    histogram = histograms()["orphan"]
+    assert histogram["count"] == 1
+    assert sum(histogram["buckets"]) == 1
+    assert len(histogram["buckets"]) == len(instrumentation.HISTOGRAM_BUCKETS_MS) + 1
+
+def test_timed_decorator_records_stage():
+    """Test that @timed records the decorated function as a stage"""
+    @timed("work")
+    def work(x):
+        return x * 2
+
+    with collect_timings() as timings:
+        assert work(3) == 6
+    assert "work" in timings
+
+def test_record_sorts_into_buckets():
+    """Test that durations land in the first and last histogram buckets"""
+    instrumentation.record("slow", 20000)
+    instrumentation.record("fast", 0.5)
+
+    assert histograms()["slow"]["buckets"][-1] == 1
+    assert histograms()["fast"]["buckets"][0] == 1
+
+def test_disabled_instrumentation_records_nothing(monkeypatch):
+    """Test that turning instrumentation off records no timings"""
+    monkeypatch.setattr(instrumentation, "ENABLED", False)
+
+    with collect_timings() as timings:
+        with stage("skipped"):
+            pass
+
+    assert timings is None
+    assert histograms() == {}
+
+def test_analyze_complete_board_reports_stage_timings():
+    """Test that a scored board reports a time for every pipeline stage"""
+    with open(VALID_BOARD, "rb") as f:
+        result = analyze_complete_board(f.read(), annotate=False)
+
+    timings = result["details"]["timings"]
+    for name in ("decode", "size_check", "color_check", "arrow_match", "nms", "grid_estimation", "tile_classification"):
+        assert name in timings
+        assert timings[name] >= 0
+
+def test_failed_analysis_still_reports_timings():
+    """Test that a board rejected early still reports the stages it ran"""
+    result = analyze_complete_board(b"not an image")
+
+    assert result["failed_at"] == "image_read"
+    assert "size_check" in result["details"]["timings"]
+
+def test_analyze_complete_board_without_instrumentation(monkeypatch):
+    """Test that results carry no timings when instrumentation is off"""
+    monkeypatch.setattr(instrumentation, "ENABLED", False)
+
+    result = analyze_complete_board(VALID_BOARD, VALID_BOARD, annotate=False)
+
+    assert result["is_valid"]
+    assert "timings" not in result["details"]
@@ -0,0 +1,136 @@
+import pytest
+import io
+import tempfile
+import threading
+import time
+from PIL import Image
+import app as app_module
+from app import app
+from jobs import JobQueue, QueueFullError
+
+@pytest.fixture
+def job_queue():
+    queue = JobQueue(max_workers=1, max_pending=2)
+    yield queue
+    queue.shutdown()
+
+@pytest.fixture
+def client(monkeypatch):
+    """Test client with a fresh job queue"""
+    app.config["TESTING"] = True
+    app.config["UPLOAD_FOLDER"] = tempfile.mkdtemp()
+    monkeypatch.setattr(app_module, "_job_queue", None)
+
+    with app.test_client() as client:
+        yield client
+
+    if app_module._job_queue is not None:
+        app_module._job_queue.shutdown()
+
+def wait_for(queue, job_id, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+def poll_job(client, status_url, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        data = client.get(status_url).get_json()
+        if data['status'] in ('done', 'failed'):
+            return data
+        time.sleep(0.05)
+    raise AssertionError(f"{status_url} did not finish")
+
+# JobQueue tests
+def test_job_queue_runs_job_and_stores_result(job_queue):
+    """Test that a submitted job runs in the background and keeps its result"""
+    job_id = job_queue.submit(lambda a, b: a + b, 2, 3)
+
+    job = wait_for(job_queue, job_id)
+
+    assert job['status'] == 'done'
+    assert job['result'] == 5
+
+def test_job_queue_records_failures(job_queue):
+    """Test that an exception in a job marks it as failed"""
+    def fail():
+        raise ValueError("broken board")
+
+    job = wait_for(job_queue, job_queue.submit(fail))
+
+    assert job['status'] == 'failed'
+    assert "broken board" in job['error']
+
+def test_job_queue_rejects_work_when_full(job_queue):
+    """Test that submissions beyond max_pending raise QueueFullError"""
+    release = threading.Event()
+    first = job_queue.submit(release.wait)
+    second = job_queue.submit(release.wait)
+
+    with pytest.raises(QueueFullError):
+        job_queue.submit(release.wait)
+    assert job_queue.depth() == 2
+
+    release.set()
+    wait_for(job_queue, first)
+    wait_for(job_queue, second)
+    assert job_queue.depth() == 0
+    job_queue.submit(lambda: None)  # Capacity is available again
+
+def test_job_queue_unknown_id(job_queue):
+    """Test that unknown job ids return None"""
+    assert job_queue.get("does-not-exist") is None
+
+# HTTP API tests
+def test_create_job_scores_board_in_background(client):
+    """Test the POST /jobs then GET /jobs/<id> round trip on a real board"""
+    with open("test_images/valid_boards/board_7.jpg", "rb") as f:
+        response = client.post("/jobs", data={"file": (f, "board_7.jpg")})
+
+    assert response.status_code == 202
+    status_url = response.get_json()['status_url']
+    assert response.headers["Location"] == status_url
+
+    data = poll_job(client, status_url)
+
+    assert data['status'] == 'done'
+    assert data['result']['is_valid'] == True
+    assert data['result']['score'] == 7
+    assert client.get(data['result']['image_url']).status_code == 200
+
+def test_create_job_reports_invalid_board(client):
+    """Test that arrow failures come back as a finished job with the failure stage"""
+    with open("test_images/invalid_boards/5_tiles_3_arrows_wrong.jpg", "rb") as f:
+        response = client.post("/jobs", data={"file": (f, "wrong.jpg")})
+
+    data = poll_job(client, response.get_json()['status_url'])
+
+    assert data['result']['is_valid'] == False
+    assert data['result']['failed_at'] == 'arrow_check'
+
+def test_create_job_rejects_non_image(client):
+    """Test that non-image uploads are refused before queueing"""
+    response = client.post("/jobs", data={"file": (io.BytesIO(b"not an image"), "test.txt")})
+
+    assert response.status_code == 400
+
+def test_create_job_returns_429_when_queue_full(client, monkeypatch):
+    """Test backpressure when the job queue is at capacity"""
+    queue = app_module.get_job_queue()
+    monkeypatch.setattr(queue, "depth", lambda: queue.max_pending)
+    img_bytes = io.BytesIO()
+    Image.new("RGB", (800, 600), color="blue").save(img_bytes, format="JPEG")
+    img_bytes.seek(0)
+
+    response = client.post("/jobs", data={"file": (img_bytes, "test.jpg")})
+
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
+
+def test_get_unknown_job_returns_404(client):
+    """Test polling a job id that doesn't exist"""
+    assert client.get("/jobs/does-not-exist").status_code == 404
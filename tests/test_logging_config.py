@@ -0,0 +1,81 @@
+import pytest
+import io
+import json
+import logging
+import tempfile
+import numpy as np
+from app import app
+from logging_config import SAMPLED, configure_logging, set_request_id
+from scored_objects_detector import calculate_blue_percentage
+
+@pytest.fixture
+def log_stream():
+    """Route logging into a buffer, restoring the app's configuration afterwards"""
+    stream = io.StringIO()
+    yield stream
+    configure_logging()
+
+def records(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+def test_json_output_includes_request_id_and_extra_fields(log_stream):
+    """Test that JSON records carry the request ID and extra fields"""
+    configure_logging("INFO", "json", stream=log_stream)
+    set_request_id("abc123")
+
+    logging.getLogger("beacon.test").info("Scored %d tiles", 7, extra={'board': "board_7"})
+
+    [entry] = records(log_stream)
+    assert entry['message'] == "Scored 7 tiles"
+    assert entry['level'] == "INFO"
+    assert entry['logger'] == "beacon.test"
+    assert entry['request_id'] == "abc123"
+    assert entry['board'] == "board_7"
+    assert "sampled" not in entry
+
+def test_sampled_records_are_thinned(log_stream):
+    """Test that only every Nth sampled record is logged"""
+    configure_logging("DEBUG", "json", tile_sample_rate=5, stream=log_stream)
+    logger = logging.getLogger("beacon.test")
+
+    for i in range(20):
+        logger.debug("Tile %d", i, extra=SAMPLED)
+    logger.debug("Unsampled")
+
+    messages = [entry['message'] for entry in records(log_stream)]
+    assert messages == ["Tile 0", "Tile 5", "Tile 10", "Tile 15", "Unsampled"]
+
+def test_debug_records_are_not_formatted_when_debug_is_off(log_stream):
+    """Test that debug records cost no formatting when debug is off"""
+    configure_logging("WARNING", "json", stream=log_stream)
+
+    class Unformattable:
+        def __str__(self):
+            raise AssertionError("formatted while debug was off")
+
+    logging.getLogger("beacon.test").debug("Tile %s", Unformattable(), extra=SAMPLED)
+    assert log_stream.getvalue() == ""
+
+def test_detectors_log_instead_of_printing(log_stream, capsys):
+    """Test that detector output goes to the log, not stdout"""
+    configure_logging("DEBUG", "json", tile_sample_rate=1, stream=log_stream)
+    tile = np.zeros((50, 50, 3), dtype=np.uint8)
+    tile[:, :, 0] = 200  # Blue in BGR
+
+    calculate_blue_percentage(tile)
+
+    assert capsys.readouterr().out == ""
+    [entry] = records(log_stream)
+    assert entry['logger'] == "scored_objects_detector"
+    assert entry['message'] == "    Blue detection: 2500/2500 pixels"
+
+def test_request_id_header_is_echoed():
+    """Test that the X-Request-ID header is echoed, or generated when missing"""
+    app.config["TESTING"] = True
+    app.config["UPLOAD_FOLDER"] = tempfile.mkdtemp()
+    with app.test_client() as client:
+        response = client.get("/cache/stats", headers={"X-Request-ID": "req-42"})
+        generated = client.get("/cache/stats")
+
+    assert response.headers["X-Request-ID"] == "req-42"
+    assert generated.headers["X-Request-ID"]
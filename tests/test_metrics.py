@@ -0,0 +1,143 @@
+import pytest
+import io
+import json
+import os
+import tempfile
+import app as app_module
+from app import app
+from instrumentation import reset_histograms, stage
+from metrics import MetricsRegistry
+
+VALID_BOARD = "test_images/valid_boards/board_7.jpg"
+
+@pytest.fixture
+def registry():
+    registry = MetricsRegistry()
+    registry.counter("requests_total", "Requests by status")
+    registry.gauge("queue_depth", "Jobs waiting")
+    registry.histogram("size_pixels", "Image sizes", (100, 1000))
+    return registry
+
+@pytest.fixture
+def client(monkeypatch):
+    """Test client with fresh metrics and no result cache"""
+    app.config["TESTING"] = True
+    app.config["UPLOAD_FOLDER"] = tempfile.mkdtemp()
+    monkeypatch.setitem(app.config, "RESULT_CACHE_ENABLED", False)
+    monkeypatch.setattr(app_module, "_metrics", None)
+
+    with app.test_client() as client:
+        yield client
+
+def test_render_counters_and_gauges(registry):
+    """Test that counters and gauges render in the Prometheus text format"""
+    registry.inc("requests_total", {'status': 'ok'})
+    registry.inc("requests_total", {'status': 'ok'})
+    registry.inc("requests_total", {'status': 'failed'})
+    registry.set("queue_depth", 3)
+
+    text = registry.render()
+
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{status="ok"} 2' in text
+    assert 'requests_total{status="failed"} 1' in text
+    assert "# TYPE queue_depth gauge" in text
+    assert "queue_depth 3" in text
+
+def test_render_histogram_buckets_are_cumulative(registry):
+    """Test that each histogram bucket counts every value up to its bound"""
+    for value in (50, 500, 5000):
+        registry.observe("size_pixels", value)
+
+    text = registry.render()
+
+    assert 'size_pixels_bucket{le="100"} 1' in text
+    assert 'size_pixels_bucket{le="1000"} 2' in text
+    assert 'size_pixels_bucket{le="+Inf"} 3' in text
+    assert "size_pixels_sum 5550" in text
+    assert "size_pixels_count 3" in text
+
+def test_stage_timings_are_exported():
+    """Test that pipeline stage histograms are exported as seconds"""
+    reset_histograms()
+    with stage("decode"):
+        pass
+
+    text = MetricsRegistry().render()
+
+    assert "# TYPE beacon_stage_duration_seconds histogram" in text
+    assert 'beacon_stage_duration_seconds_count{stage="decode"} 1' in text
+    reset_histograms()
+
+def test_label_values_are_escaped(registry):
+    """Test that quotes in label values are escaped"""
+    registry.inc("requests_total", {'status': 'say "hi"'})
+
+    assert 'requests_total{status="say \\"hi\\""} 1' in registry.render()
+
+def test_shared_directory_merges_processes(tmp_path, registry):
+    """Test that values flushed by other worker processes are summed on scrape"""
+    other = MetricsRegistry()
+    other.counter("requests_total", "Requests by status")
+    other.gauge("queue_depth", "Jobs waiting")
+    other.inc("requests_total", {'status': 'ok'}, amount=5)
+    other.set("queue_depth", 2)
+    snapshot = [sample for sample in other.snapshot() if sample[0] != "beacon_stage_duration_seconds"]
+
+    # A live worker (our parent) and one that has exited
+    with open(tmp_path / f"{os.getppid()}.json", "w") as f:
+        json.dump(snapshot, f)
+    with open(tmp_path / "999999999.json", "w") as f:
+        json.dump(snapshot, f)
+
+    registry.directory = str(tmp_path)
+    registry.inc("requests_total", {'status': 'ok'})
+    registry.set("queue_depth", 1)
+    text = registry.render()
+
+    assert 'requests_total{status="ok"} 11' in text
+    assert "queue_depth 3" in text  # The exited worker's gauge is dropped
+    assert (tmp_path / f"{os.getpid()}.json").exists()
+
+def test_metrics_endpoint_counts_uploads(client):
+    """Test that /metrics counts valid and rejected uploads"""
+    with open(VALID_BOARD, "rb") as f:
+        client.post("/upload", data={"file": (f, "board_7.jpg")}, content_type="multipart/form-data")
+    client.post("/upload", data={"file": (io.BytesIO(b"not an image"), "notes.jpg")}, content_type="multipart/form-data")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain")
+    text = response.get_data(as_text=True)
+    assert 'beacon_uploads_total{outcome="valid"} 1' in text
+    assert 'beacon_uploads_total{outcome="rejected"} 1' in text
+    assert "beacon_image_width_pixels_count 1" in text
+    assert "beacon_board_tiles_count 1" in text
+    assert "beacon_job_queue_depth 0" in text
+
+def test_rejected_jobs_are_flushed_for_other_workers(client, monkeypatch, tmp_path):
+    """Test that a 429 from a worker that serves nothing else still reaches /metrics"""
+    monkeypatch.setitem(app.config, "METRICS_DIR", str(tmp_path))
+    monkeypatch.setattr(app_module, "_job_queue", None)
+    queue = app_module.get_job_queue()
+    monkeypatch.setattr(queue, "depth", lambda: queue.max_pending)
+
+    response = client.post("/jobs", data={"file": (io.BytesIO(b"jpeg bytes"), "board.jpg", "image/jpeg")})
+    os.replace(tmp_path / f"{os.getpid()}.json", tmp_path / "1.json")  # As if written by another worker
+    queue.shutdown()
+
+    other = MetricsRegistry(str(tmp_path))
+    app_module._define_metrics(other)
+    assert response.status_code == 429
+    assert "beacon_jobs_rejected_total 1" in other.render()
+
+def test_metrics_count_failed_checks(client):
+    """Test that an invalid board is counted under the check it failed"""
+    with open("test_images/invalid_boards/12_tiles_2_arrows_wrong.jpg", "rb") as f:
+        client.post("/upload", data={"file": (f, "wrong.jpg")}, content_type="multipart/form-data")
+
+    text = client.get("/metrics").get_data(as_text=True)
+
+    assert 'beacon_uploads_total{outcome="invalid"} 1' in text
+    assert 'beacon_upload_failures_total{failed_at="arrow_check"} 1' in text
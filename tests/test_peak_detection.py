@@ -0,0 +1,44 @@
+import pytest
+import numpy as np
+from peak_detection import find_peaks, non_max_suppression
+
+def test_find_peaks_returns_local_maxima_ranked_by_score():
+    """Test that each blob of hits collapses to its best pixel"""
+    result = np.zeros((100, 100), dtype=np.float32)
+    result[10:13, 20:23] = 0.85
+    result[11, 21] = 0.9
+    result[60, 70] = 0.95
+
+    peaks = find_peaks(result, 0.8)
+
+    assert [(x, y) for x, y, _score in peaks] == [(70, 60), (21, 11)]
+    assert peaks[0][2] == pytest.approx(0.95)
+
+def test_find_peaks_handles_no_hits():
+    """Test that a map with nothing above threshold gives no peaks"""
+    result = np.full((50, 50), 0.5, dtype=np.float32)
+
+    assert find_peaks(result, 0.8) == []
+
+def test_non_max_suppression_keeps_strongest_peak():
+    """Test that weaker peaks within min_distance of a stronger one are dropped"""
+    peaks = [(100, 100, 0.8), (110, 105, 0.9), (300, 100, 0.85)]
+
+    kept = non_max_suppression(peaks, 40)
+
+    assert kept == [(110, 105, 0.9), (300, 100, 0.85)]
+
+def test_non_max_suppression_checks_neighbouring_cells():
+    """Test that close peaks on either side of a grid cell edge are still merged"""
+    peaks = [(79, 79, 0.9), (81, 81, 0.8)]
+
+    assert non_max_suppression(peaks, 40) == [(79, 79, 0.9)]
+
+def test_non_max_suppression_scales_to_many_peaks():
+    """Test that a dense field of hits reduces to one peak per cluster"""
+    peaks = [(x + dx, y + dy, 0.8 + 0.001 * dx) for x in range(0, 2000, 200) for y in range(0, 2000, 200)
+             for dx in range(10) for dy in range(10)]
+
+    kept = non_max_suppression(peaks, 40)
+
+    assert len(kept) == 100
@@ -0,0 +1,52 @@
+import pytest
+import cv2
+import numpy as np
+from analysis_context import AnalysisContext
+from board_analyzer import analyze_complete_board
+from resolution import CANONICAL_TILE_PITCH, normalise_resolution
+from scored_objects_detector import generate_annotated_image
+from synthetic_boards import generate_board
+
+def _scaled(image, factor):
+    return cv2.resize(image, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA if factor < 1 else cv2.INTER_LINEAR)
+
+@pytest.fixture(scope="module")
+def synthetic_board():
+    return generate_board(20, seed=1, noise=4)
+
+def test_canonical_photo_is_analysed_as_it_is():
+    """Test that a photo near the canonical scale isn't resized"""
+    context = AnalysisContext(cv2.imread("test_images/valid_boards/board_7.jpg"))
+
+    assert normalise_resolution(context) is context
+
+@pytest.mark.parametrize("factor", [0.6, 1.7])
+def test_off_scale_photo_scores_like_the_canonical_one(synthetic_board, factor):
+    """Test that a photo shrunk or enlarged is resized back and scored the same"""
+    image, truth = synthetic_board
+    context = AnalysisContext(_scaled(image, factor))
+
+    normalised = normalise_resolution(context)
+    result = analyze_complete_board(context, annotate=False)
+
+    assert normalised.original is context
+    assert 1 / normalised.scale == pytest.approx(factor * truth['settings']['tile_size'] / CANONICAL_TILE_PITCH, rel=0.1)
+    assert result['score'] == truth['expected_score']
+    assert result['details']['analysis_scale'] == pytest.approx(normalised.scale, abs=0.001)
+
+def test_unmeasurable_photo_is_left_alone():
+    """Test that a photo without arrows to measure a scale from isn't resized"""
+    context = AnalysisContext(np.full((600, 800, 3), (200, 120, 60), dtype=np.uint8))
+
+    assert normalise_resolution(context) is context
+
+def test_annotation_is_drawn_on_the_uploaded_photo(synthetic_board, tmp_path):
+    """Test that annotations of a resized photo are drawn at the uploaded size"""
+    image, _truth = synthetic_board
+    photo = _scaled(image, 0.6)
+    context = AnalysisContext(photo)
+    normalised = normalise_resolution(context)
+
+    assert normalised.image.shape != photo.shape
+    assert generate_annotated_image(normalised, str(tmp_path / "scored.jpg"))
+    assert cv2.imread(str(tmp_path / "scored.jpg")).shape == photo.shape
@@ -0,0 +1,125 @@
+import pytest
+import os
+import tempfile
+import app as app_module
+from app import app
+from result_cache import ResultCache, make_cache_key
+
+RESULT = {'is_valid': True, 'score': 7, 'rank': ["Novices", "Keep trying!"]}
+
+@pytest.fixture
+def client(monkeypatch):
+    """Test client with a fresh result cache"""
+    app.config["TESTING"] = True
+    app.config["UPLOAD_FOLDER"] = tempfile.mkdtemp()
+    monkeypatch.setattr(app_module, "_result_cache", None)
+
+    with app.test_client() as client:
+        yield client
+
+def test_cache_key_depends_on_bytes_and_config():
+    """Test that both the image and the detector settings change the key"""
+    key = make_cache_key(b"image", {'threshold': 0.79})
+
+    assert key == make_cache_key(b"image", {'threshold': 0.79})
+    assert key != make_cache_key(b"other image", {'threshold': 0.79})
+    assert key != make_cache_key(b"image", {'threshold': 0.8})
+
+def test_memory_tier_counts_hits_and_misses():
+    """Test basic get/put and the hit/miss counters"""
+    cache = ResultCache()
+
+    assert cache.get("key") is None
+    cache.put("key", RESULT, b"jpeg bytes")
+    entry = cache.get("key")
+
+    assert entry['result'] == RESULT
+    assert entry['image_bytes'] == b"jpeg bytes"
+    stats = cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+    assert stats['hit_rate'] == 0.5
+
+def test_memory_tier_evicts_least_recently_used():
+    """Test that the LRU keeps recently read entries"""
+    cache = ResultCache(max_entries=2)
+    cache.put("a", RESULT)
+    cache.put("b", RESULT)
+    cache.get("a")
+    cache.put("c", RESULT)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+
+def test_disk_tier_survives_a_new_cache_instance(tmp_path):
+    """Test that results on disk are found by another process's cache"""
+    ResultCache(disk_dir=str(tmp_path)).put("key", RESULT, b"jpeg bytes", ".jpg")
+
+    cache = ResultCache(disk_dir=str(tmp_path))
+    entry = cache.get("key")
+
+    assert entry['result'] == RESULT
+    assert entry['image_bytes'] == b"jpeg bytes"
+    assert cache.stats()['disk_hits'] == 1
+
+def test_disk_tier_evicts_oldest_entries_by_size(tmp_path):
+    """Test that the disk tier stays under its byte limit"""
+    cache = ResultCache(max_entries=1, disk_dir=str(tmp_path), max_disk_bytes=3000)
+    for i, key in enumerate(["a", "b", "c"]):
+        cache.put(key, RESULT, b"x" * 1000)
+        os.utime(tmp_path / f"{key}.json", (i, i))  # Make the access order explicit
+        os.utime(tmp_path / f"{key}.jpg", (i, i))
+    cache.put("d", RESULT, b"x" * 1000)
+
+    assert cache.stats()['disk_bytes'] <= 3000
+    assert not (tmp_path / "a.json").exists()
+    assert (tmp_path / "d.json").exists()
+
+def test_repeated_upload_is_served_from_cache(client, monkeypatch):
+    """Test that uploading the same photo twice only runs the pipeline once"""
+    calls = []
+    real_analyze = app_module.analyze_complete_board
+
+    def counting_analyze(*args, **kwargs):
+        calls.append(args)
+        return real_analyze(*args, **kwargs)
+
+    monkeypatch.setattr(app_module, "analyze_complete_board", counting_analyze)
+
+    for upload_name in ("board_7.jpg", "board_7_again.jpg"):
+        with open("test_images/valid_boards/board_7.jpg", "rb") as f:
+            response = client.post("/upload", data={"file": (f, upload_name)})
+        assert response.status_code == 200
+        assert b"Your Results" in response.data
+
+    assert len(calls) == 1
+    stats = client.get("/cache/stats").get_json()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+
+def test_cached_arrow_failure_keeps_annotated_image(client):
+    """Test that a cached invalid board still shows the marked-up arrows"""
+    for _ in range(2):
+        with open("test_images/invalid_boards/5_tiles_3_arrows_wrong.jpg", "rb") as f:
+            response = client.post("/upload", data={"file": (f, "wrong.jpg")})
+        assert response.status_code == 400
+        assert b"3 arrows pointing wrong direction" in response.data
+
+    assert b"cached_" in response.data
+
+def test_cached_result_is_a_copy_without_timings(tmp_path):
+    """Test that caching a result neither shares it with the caller nor keeps this run's timings"""
+    cache = ResultCache()
+    with open("test_images/invalid_boards/5_tiles_3_arrows_wrong.jpg", "rb") as f:
+        image_bytes = f.read()
+
+    first = app_module._score_upload(image_bytes, "wrong.jpg", str(tmp_path), cache)
+    first['details']['correct_arrows'] = -1
+    second = app_module._score_upload(image_bytes, "wrong.jpg", str(tmp_path), cache)
+
+    entry = cache.get(make_cache_key(image_bytes, app_module.detector_config()))
+    assert 'image_filename' not in entry['result']
+    assert 'timings' not in entry['result']['details']
+    assert 'timings' not in second['details']
+    assert second['details']['correct_arrows'] == 2
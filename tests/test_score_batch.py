@@ -0,0 +1,61 @@
+import pytest
+import csv
+import io
+import json
+import shutil
+from PIL import Image
+from score_batch import collect_images, read_completed, run_batch, score_image, main
+
+@pytest.fixture
+def photo_dir(tmp_path):
+    """A directory with one real board, one non-board photo and a stray text file"""
+    shutil.copy("test_images/valid_boards/7_tiles_blue.jpg", tmp_path / "board.jpg")
+    Image.new("RGB", (800, 600), color=(245, 66, 66)).save(tmp_path / "red.png")
+    (tmp_path / "notes.txt").write_text("not an image")
+    return tmp_path
+
+def test_collect_images_expands_directories_and_globs(photo_dir):
+    """Test that only image files are collected, sorted and without duplicates"""
+    paths = collect_images([str(photo_dir), str(photo_dir / "*.jpg")])
+
+    assert paths == [str(photo_dir / "board.jpg"), str(photo_dir / "red.png")]
+
+def test_score_image_returns_flat_record():
+    """Test that a single photo is scored into an output record"""
+    record = score_image("test_images/valid_boards/board_7.jpg")
+
+    assert record['is_valid'] == True
+    assert record['score'] == 7
+    assert record['rank'] == "Novices"
+    assert record['breakdown'] == {'buoys': 3, 'lighthouses': 0, 'empty': 1}
+    assert record['timings']['total_ms'] > 0
+
+def test_run_batch_writes_jsonl(photo_dir, tmp_path):
+    """Test that every photo gets one JSON Lines record"""
+    output = tmp_path / "results.jsonl"
+
+    scored = run_batch(collect_images([str(photo_dir)]), str(output), workers=2, progress=io.StringIO())
+
+    records = {json.loads(line)['file']: json.loads(line) for line in output.read_text().splitlines()}
+    assert scored == 2
+    assert records[str(photo_dir / "board.jpg")]['score'] == 3
+    assert records[str(photo_dir / "red.png")]['failed_at'] == 'color_check'
+
+def test_run_batch_resume_skips_completed_files(photo_dir, tmp_path):
+    """Test that --resume only scores files missing from the output"""
+    output = tmp_path / "results.csv"
+    images = collect_images([str(photo_dir)])
+
+    run_batch(images[:1], str(output), output_format="csv", workers=1, progress=io.StringIO())
+    scored = run_batch(images, str(output), output_format="csv", workers=1, resume=True, progress=io.StringIO())
+
+    with open(output, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert scored == 1
+    assert [row['file'] for row in rows] == images
+    assert read_completed(str(output), "csv") == set(images)
+
+def test_main_rejects_empty_input(tmp_path):
+    """Test that the CLI errors out when no images match"""
+    with pytest.raises(SystemExit):
+        main([str(tmp_path / "*.jpg"), "-o", str(tmp_path / "out.jsonl")])
@@ -223,6 +223,30 @@ def test_calculate_board_score_handles_missing_file():
     assert result is not None
     assert isinstance(result, dict)
 
+def test_classify_tiles_matches_per_tile_detection():
+    """The batched classifier gives exactly the per-tile results, including on a noisy JPEG board"""
+    from analysis_context import AnalysisContext
+    from scored_objects_detector import classify_tiles, scored_object_template_paths
+    from synthetic_boards import generate_board
+    from tile_analyzer import detect_scorable_tiles
+
+    template_paths = scored_object_template_paths()
+    synthetic_image, _truth = generate_board(30, seed=3, layout="blob", noise=6, jpeg_quality=80)
+    for context in (AnalysisContext.from_path("test_images/valid_boards/board_16.jpg"), AnalysisContext(synthetic_image)):
+        _total, _scorable, _annotated, boundaries = detect_scorable_tiles(context)
+        expected = [detect_scored_object_in_tile(context.image[int(top):int(bottom), int(left):int(right)], template_paths)
+                    for left, top, right, bottom in boundaries]
+
+        assert boundaries
+        assert classify_tiles(context, boundaries, template_paths) == expected
+
+def test_classify_tiles_handles_no_tiles():
+    """Test that classifying no tiles returns an empty list"""
+    from analysis_context import AnalysisContext
+    from scored_objects_detector import classify_tiles
+
+    assert classify_tiles(AnalysisContext(np.zeros((10, 10, 3), dtype=np.uint8)), [], {}) == []
+
 import pytest
 import tempfile
 import os
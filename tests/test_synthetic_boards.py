@@ -0,0 +1,95 @@
+import pytest
+import json
+from board_analyzer import analyze_complete_board
+from synthetic_boards import generate_board, grid_layout, main, surrounded_cells
+
+def test_grid_layout_is_near_square():
+    """Test that the grid layout is as close to square as the tile count allows"""
+    cells = grid_layout(10)
+
+    assert len(cells) == 10
+    assert max(col for col, _row in cells) == 3
+    assert max(row for _col, row in cells) == 2
+
+def test_surrounded_cells():
+    """Test that only the centre of a 3x3 grid is surrounded"""
+    cells = grid_layout(9)  # 3x3
+
+    assert surrounded_cells(cells) == {(1, 1)}
+
+def test_generate_board_is_deterministic():
+    """Test that the same seed gives the same board and ground truth"""
+    image1, truth1 = generate_board(12, seed=3)
+    image2, truth2 = generate_board(12, seed=3)
+
+    assert (image1 == image2).all()
+    assert truth1 == truth2
+    assert len(truth1['tiles']) == 12
+
+@pytest.mark.parametrize("tiles", [9, 20])
+def test_pipeline_scores_synthetic_board(tiles):
+    """Test that the pipeline scores a synthetic board as its ground truth says"""
+    image, truth = generate_board(tiles, seed=1)
+
+    result = analyze_complete_board(image, annotate=False)
+
+    assert result['is_valid']
+    assert result['details']['total_tiles'] == tiles
+    assert result['details']['scorable_tiles'] == truth['scorable_tiles']
+    assert result['score'] == truth['expected_score']
+
+def test_blob_layout_is_connected_and_unique():
+    """Test that blob layouts are connected, with no cell used twice"""
+    _image, truth = generate_board(40, seed=2, layout="blob")
+    cells = {tuple(tile['cell']) for tile in truth['tiles']}
+
+    assert len(cells) == 40
+    assert min(col for col, _row in cells) == 0 and min(row for _col, row in cells) == 0
+    for col, row in cells - {(0, 0)}:
+        assert {(col - 1, row), (col + 1, row), (col, row - 1), (col, row + 1)} & cells
+
+def test_row_layout_has_nothing_to_score():
+    """Test that a single row of tiles scores nothing"""
+    _image, truth = generate_board(6, layout="row")
+
+    assert truth['scorable_tiles'] == 0
+    assert truth['expected_score'] == 0
+
+def test_rotated_tiles_fail_the_arrow_check():
+    """Test that boards with rotated tiles fail the arrow check"""
+    image, truth = generate_board(12, seed=4, rotated=2)
+
+    result = analyze_complete_board(image, annotate=False)
+
+    assert truth['expected_valid'] is False
+    assert sum(1 for tile in truth['tiles'] if tile['rotation']) == 2
+    assert result['failed_at'] == "arrow_check"
+    assert result['details']['incorrect_arrows'] == truth['incorrect_arrows']
+
+def test_scale_noise_and_jpeg_settings():
+    """Test that scale, noise and JPEG settings are applied and recorded"""
+    image, truth = generate_board(9, seed=1, noise=5, jpeg_quality=70, scale=0.5)
+    clean, clean_truth = generate_board(9, seed=1)
+
+    assert image.shape[0] == round(clean.shape[0] * 0.5)
+    assert truth['image_size'] == [image.shape[1], image.shape[0]]
+    assert truth['tiles'][4]['box'] == [round(v * 0.5) for v in clean_truth['tiles'][4]['box']]
+    assert truth['settings']['jpeg_quality'] == 70
+
+def test_unknown_layout_is_rejected():
+    """Test that an unknown layout name raises ValueError"""
+    with pytest.raises(ValueError):
+        generate_board(5, layout="spiral")
+
+def test_cli_writes_boards_and_ground_truth(tmp_path):
+    """Test that the CLI writes each board with its ground truth"""
+    output = tmp_path / "board.jpg"
+
+    assert main([str(12), "-o", str(output), "--boards", "2", "--layout", "blob", "--jpeg-quality", "85"]) == 0
+
+    for i in range(2):
+        assert (tmp_path / f"board_{i}.jpg").exists()
+        with open(tmp_path / f"board_{i}.json") as f:
+            truth = json.load(f)
+        assert truth['settings']['seed'] == i
+        assert truth['tile_count'] == 12
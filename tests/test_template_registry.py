@@ -0,0 +1,86 @@
+import pytest
+import shutil
+import cv2
+import numpy as np
+import template_registry
+from template_registry import get_normalised_template, get_template, get_templates, reload_templates, reload_if_changed, template_path
+from scored_objects_detector import detect_scored_object_in_tile
+
+@pytest.fixture
+def temporary_template_dir(tmp_path, monkeypatch):
+    """Point the registry at a copy of the bundled templates"""
+    template_dir = tmp_path / "templates"
+    shutil.copytree(template_registry.TEMPLATE_DIR, template_dir)
+    monkeypatch.setattr(template_registry, "TEMPLATE_DIR", str(template_dir))
+    reload_templates()
+    yield template_dir
+    monkeypatch.undo()
+    reload_templates()
+
+def test_bundled_templates_are_preloaded():
+    """Test that every bundled template is loaded with its metadata"""
+    assert len(get_templates()) == 10
+    assert len(get_templates("arrow")) == 4
+    assert len(get_templates("buoy")) == 4
+    assert len(get_templates("lighthouse")) == 2
+
+    by_name = {template.name: template for template in get_templates()}
+    assert by_name["arrow_90"].rotation == 90
+    assert by_name["lighthouse"].points == 3
+    assert by_name["buoy_blue"].points == 2
+
+def test_templates_are_read_only():
+    """Test that shared template arrays can't be modified by a detector"""
+    template = get_template("images/templates/arrow_tight_crop.png")
+
+    assert template is not None
+    with pytest.raises(ValueError):
+        template[0, 0] = 0
+
+def test_relative_and_absolute_paths_share_an_entry():
+    """Test that relative template paths resolve to the preloaded array"""
+    relative = get_template("images/templates/lighthouse_score_3.png")
+    absolute = get_template(template_path("lighthouse_score_3.png"))
+
+    assert relative is absolute
+
+def test_normalised_templates_are_cached_per_scale():
+    """Test that the scale space is built once, with the matching constants precomputed"""
+    path = template_path("lighthouse_score_3.png")
+
+    normalised = get_normalised_template(path, 2.0)
+
+    assert normalised is get_normalised_template(path, 2.0)
+    assert normalised.image.shape == (140, 68)
+    assert abs(float(normalised.zero_mean.mean())) < 1e-3
+    assert normalised.norm == pytest.approx(np.linalg.norm(normalised.image - normalised.image.mean()), rel=1e-4)
+    assert get_normalised_template(path).image is get_template(path)
+    assert get_normalised_template("definitely_does_not_exist.png", 2.0) is None
+
+def test_get_template_handles_missing_file():
+    """Test that an unreadable template path returns None"""
+    assert get_template("images/templates/does_not_exist.png") is None
+
+def test_detection_does_not_read_templates_from_disk(monkeypatch):
+    """Test that scoring a tile uses the preloaded templates"""
+    def failing_imread(*args, **kwargs):
+        raise AssertionError("template read from disk")
+
+    monkeypatch.setattr(cv2, "imread", failing_imread)
+    tile = np.zeros((200, 200, 3), dtype=np.uint8)
+
+    object_type, confidence = detect_scored_object_in_tile(tile, {"lighthouse": "images/templates/lighthouse_score_3.png"})
+
+    assert object_type is None
+
+def test_reload_if_changed_is_a_no_op_when_nothing_changed():
+    """Test that the hot-reload hook doesn't reload an unchanged template set"""
+    assert reload_if_changed() == False
+
+def test_reload_if_changed_picks_up_new_templates(temporary_template_dir):
+    """Test that templates added on disk are loaded by the hot-reload hook"""
+    cv2.imwrite(str(temporary_template_dir / "extra_template.png"), np.full((20, 20), 255, dtype=np.uint8))
+
+    assert reload_if_changed() == True
+    assert "extra_template" in [template.name for template in get_templates()]
+    assert reload_if_changed() == False
@@ -5,7 +5,7 @@ import os
 import cv2
 import numpy as np
 from PIL import Image
-from tile_analyzer import detect_scorable_tiles, _estimate_tile_size, _estimate_tile_grid, _check_tile_surrounded, _rectangles_overlap, _annotate_scorable_tiles, visualise_tile_boundaries
+from tile_analyzer import detect_scorable_tiles, estimate_tile_pitch, _estimate_tile_size, _estimate_tile_grid, _check_tile_surrounded, _rectangles_overlap, _annotate_scorable_tiles, visualise_tile_boundaries
 from arrow_detection import get_arrow_positions
 
 @pytest.fixture 
@@ -94,6 +94,41 @@ def test_estimate_tile_size_handles_no_arrows():
     
     assert estimated_size is None
 
+def test_estimate_tile_pitch_on_large_board_uses_nearest_neighbours():
+    """A 20x20 grid has far more 2x/3x pitch pairs than neighbours; the pitch must still be found"""
+    arrows = [(100 + col * 244, 50 + row * 244) for row in range(20) for col in range(20)]
+
+    pitch = estimate_tile_pitch(arrows)
+
+    assert (pitch['width'], pitch['height']) == (244, 244)
+    assert pitch['confidence'] == 1.0
+    assert not pitch['ambiguous']
+    assert _estimate_tile_size(arrows) == (244, 244)
+
+def test_estimate_tile_pitch_ignores_gaps_between_tiles():
+    """Missing tiles make some nearest neighbours two tiles away"""
+    arrows = [(col * 250, row * 250) for row in range(6) for col in range(6) if (col, row) not in {(2, 1), (3, 4), (1, 3)}]
+
+    pitch = estimate_tile_pitch(arrows)
+
+    assert (pitch['width'], pitch['height']) == (250, 250)
+    assert not pitch['ambiguous']
+
+def test_estimate_tile_pitch_flags_inconsistent_spacing():
+    """Arrows with no dominant spacing give an ambiguous, low-confidence estimate"""
+    arrows = [(0, 0), (100, 0), (260, 0), (520, 0), (900, 0)]
+
+    pitch = estimate_tile_pitch(arrows)
+
+    assert pitch['ambiguous']
+    assert pitch['confidence'] < 0.6
+
+def test_estimate_tile_pitch_assumes_square_tiles_for_a_single_row():
+    """Test that a single row of arrows gives square tiles"""
+    pitch = estimate_tile_pitch([(0, 0), (230, 2), (460, -1)])
+
+    assert pitch['width'] == pitch['height'] == 230
+
 # Tile grid estimation tests
 def test_estimate_tile_grid_with_real_7_tile_board():
     """Test tile boundary generation on real photo"""
@@ -1,51 +1,68 @@
+import logging
 import cv2
+from analysis_context import get_analysis_context
 from arrow_detection import get_arrow_positions
+from board_grid import BoardGrid
+from instrumentation import stage
+from logging_config import SAMPLED
 import numpy as np
 
+logger = logging.getLogger(__name__)
+
+# Tile pitch estimation (see estimate_tile_pitch)
+PITCH_ALIGNMENT_TOLERANCE = 20  # Max pixels off-axis for two arrows to be in the same row/column
+MIN_PITCH = 50  # Arrows closer than this are not neighbouring tiles
+PITCH_CLUSTER_TOLERANCE = 0.15  # Distances within 15% of the pitch belong to it
+AMBIGUOUS_PITCH_CONFIDENCE = 0.6
+MIN_PITCH_SUPPORT = 2
+
 def detect_scorable_tiles(image_path):
     """
     Detect total tiles and count scorable (surrounded) tiles.
+
+    Args:
+        image_path: Path to the board image, or an AnalysisContext
     
     Returns:
-        tuple: (total_tiles, scorable_tiles, annotated_image)
+        tuple: (total_tiles, scorable_tiles, annotated_image, scorable_boundaries)
     """
 
-    print(f"detect_scorable_tiles: Loading {image_path}")
-    
-    correct_positions, incorrect_positions, image = get_arrow_positions(image_path)
-    print(f"Arrow detection: {len(correct_positions)} correct, {len(incorrect_positions)} incorrect")
-    
-    if image is None:
-        print("get_arrow_positions returned None image")
+    logger.debug("detect_scorable_tiles: Loading %s", image_path)
+
+    context = get_analysis_context(image_path)
+    if context is None:
+        logger.warning("Could not load image %s", image_path)
         return 0, 0, None, []
+
+    total_tiles, scorable_count, annotated_image, scorable_boundaries = context.cached("scorable_tiles", lambda: _detect_scorable_tiles(context))
+    return total_tiles, scorable_count, annotated_image, list(scorable_boundaries)
+
+def _detect_scorable_tiles(context):
+    correct_positions, incorrect_positions, image = get_arrow_positions(context)
+    logger.debug("Arrow detection: %d correct, %d incorrect", len(correct_positions), len(incorrect_positions))
     
     if len(correct_positions) == 0:
-        print("No correct arrows found - cannot estimate tile positions")
+        logger.info("No correct arrows found - cannot estimate tile positions")
         return 0, 0, image, []
     
-    correct_positions, _, image = get_arrow_positions(image_path)
-    
-    if image is None:
-        return 0, 0, None, []
-    
-    estimated_size = _estimate_tile_size(correct_positions)
-    if estimated_size is None:
-        return 0, 0, image, []
-    
-    tile_boundaries = _estimate_tile_grid(correct_positions, estimated_size)
-    
-    # Count surrounded tiles
-    scorable_count = 0
-    scorable_boundaries = []
-    
-    for boundary in tile_boundaries:
-        if _check_tile_surrounded(boundary, tile_boundaries):
-            scorable_count += 1
-            scorable_boundaries.append(boundary)
-
-    for i, boundary in enumerate(tile_boundaries):
-        is_surrounded = _check_tile_surrounded(boundary, tile_boundaries)
-        print(f"Tile {i}: {boundary} -> Surrounded: {is_surrounded}")
+    with stage("grid_estimation"):
+        estimated_size = _estimate_tile_size(correct_positions)
+        if estimated_size is None:
+            return 0, 0, image, []
+        
+        tile_boundaries = _estimate_tile_grid(correct_positions, estimated_size)
+        
+        # Count surrounded tiles
+        grid = BoardGrid(tile_boundaries, estimated_size)
+        scorable_count = 0
+        scorable_boundaries = []
+        
+        for i, boundary in enumerate(tile_boundaries):
+            is_surrounded = grid.is_surrounded(i)
+            logger.debug("Tile %d: %s -> Surrounded: %s", i, boundary, is_surrounded, extra=SAMPLED)
+            if is_surrounded:
+                scorable_count += 1
+                scorable_boundaries.append(boundary)
     
     # Optionally annotate the scorable tiles
     annotated_image = _annotate_scorable_tiles(image, scorable_boundaries) if scorable_boundaries else image
@@ -54,48 +71,75 @@ def detect_scorable_tiles(image_path):
 
 def _estimate_tile_size(arrow_positions):
     """Estimate tile sizes from arrow positions"""
+    pitch = estimate_tile_pitch(arrow_positions)
+    if pitch is None:
+        return None
+    if pitch['ambiguous']:
+        logger.info("Tile size estimate %dx%d is ambiguous (confidence %.2f)",
+                    pitch['width'], pitch['height'], pitch['confidence'])
+    return pitch['width'], pitch['height']
+
+def estimate_tile_pitch(arrow_positions):
+    """
+    Estimate the tile pitch (distance between neighbouring arrows) with a confidence value.
+
+    All pairwise arrow offsets are computed at once with NumPy. For each
+    arrow the nearest roughly aligned arrow to its right/left (or above/below)
+    gives one nearest-neighbour distance; the most common of these (the mode,
+    within PITCH_CLUSTER_TOLERANCE) is the pitch, so gaps in the board and
+    distant pairs in large boards don't pull the estimate towards 2x or 3x
+    the real size. The returned width/height is the median of all aligned
+    pairwise distances in that cluster.
+
+    Args:
+        arrow_positions: List of (x, y) arrow positions
+
+    Returns:
+        dict: {'width', 'height', 'confidence', 'ambiguous'}, or None with no aligned arrows.
+              confidence is the fraction of nearest-neighbour distances that agree
+              with the pitch (lowest of the two axes); ambiguous is True when it is
+              below AMBIGUOUS_PITCH_CONFIDENCE or too few distances support it.
+    """
     if len(arrow_positions) < 2:
         return None  # Can't estimate with fewer than 2 arrows
-    
-    # Find horizontal and vertical distances between arrows
-    horizontal_distances = []
-    vertical_distances = []
-    
-    for i, pos1 in enumerate(arrow_positions):
-        for pos2 in arrow_positions[i+1:]:
-            x_diff = abs(pos1[0] - pos2[0])
-            y_diff = abs(pos1[1] - pos2[1])
-            
-            # If arrows are roughly horizontally aligned (small y difference)
-            if y_diff < 20 and x_diff > 50:  # Adjust thresholds as needed
-                horizontal_distances.append(x_diff)
-            
-            # If arrows are roughly vertically aligned (small x difference)
-            if x_diff < 20 and y_diff > 50:
-                vertical_distances.append(y_diff)
-    
-    # Filter out outliers by using smaller distances (nearest neighbors)
-    if horizontal_distances:
-        horizontal_distances.sort()
-        # Use the smaller half of distances (nearest neighbors, not far connections)
-        width = int(horizontal_distances[len(horizontal_distances)//4])  # Use 25th percentile instead of median
-    else:
-        width = None
-        
-    if vertical_distances:
-        vertical_distances.sort()
-        height = int(vertical_distances[len(vertical_distances)//4])  # Use 25th percentile instead of median
-    else:
-        height = None
-    
+
+    positions = np.asarray(arrow_positions, dtype=np.float64).reshape(-1, 2)
+    offsets = np.abs(positions[None, :, :] - positions[:, None, :])  # offsets[i, j] = |position j - position i|
+    width = _axis_pitch(offsets[:, :, 0], offsets[:, :, 1])
+    height = _axis_pitch(offsets[:, :, 1], offsets[:, :, 0])
+
     # If we only found one dimension, assume square tiles
-    if width and not height:
-        height = width
-    elif height and not width:
-        width = height
-    
-    return (width, height) if width and height else None
-    
+    found = [axis for axis in (width, height) if axis is not None]
+    if not found:
+        return None
+    width = width or height
+    height = height or width
+
+    confidence = min(axis['confidence'] for axis in found)
+    ambiguous = confidence < AMBIGUOUS_PITCH_CONFIDENCE or min(axis['support'] for axis in found) < MIN_PITCH_SUPPORT
+    return {'width': width['pitch'], 'height': height['pitch'], 'confidence': round(confidence, 3),
+            'ambiguous': bool(ambiguous)}
+
+def _axis_pitch(along, across):
+    """Pitch along one axis from |offset| matrices along and across it, or None if no arrows are aligned"""
+    # Pairs roughly in the same row (or column), far enough apart to be different tiles
+    aligned = (across < PITCH_ALIGNMENT_TOLERANCE) & (along > MIN_PITCH)
+    nearest = np.where(aligned, along, np.inf).min(axis=1)
+    nearest = np.sort(nearest[np.isfinite(nearest)])
+    if nearest.size == 0:
+        return None
+
+    # Mode of the nearest-neighbour distances: how many distances lie within
+    # the tolerance of each one (ties go to the smaller, fundamental pitch)
+    support = (np.searchsorted(nearest, nearest * (1 + PITCH_CLUSTER_TOLERANCE), side="right")
+               - np.searchsorted(nearest, nearest * (1 - PITCH_CLUSTER_TOLERANCE), side="left"))
+    mode = nearest[np.argmax(support)]
+
+    distances = along[np.triu(aligned)]
+    cluster = distances[np.abs(distances - mode) <= mode * PITCH_CLUSTER_TOLERANCE]
+    in_cluster = np.abs(nearest - mode) <= mode * PITCH_CLUSTER_TOLERANCE
+    return {'pitch': int(np.median(cluster)), 'confidence': float(in_cluster.mean()), 'support': int(in_cluster.sum())}
+
 def _estimate_tile_grid(arrow_positions, estimated_tile_size):
     """Convert arrow positions to tile boundary rectangles"""
     if not arrow_positions or not estimated_tile_size:
@@ -123,10 +167,11 @@ def _estimate_tile_grid(arrow_positions, estimated_tile_size):
         boundary = (tile_left, tile_top, tile_right, tile_bottom)
         tile_boundaries.append(boundary)
     
-    print(f"Estimated tile size: {estimated_tile_size}")
-    print(f"Generated {len(tile_boundaries)} tile boundaries")
-    for i, boundary in enumerate(tile_boundaries):
-        print(f"  Tile {i}: {boundary}")
+    logger.debug("Estimated tile size: %s", estimated_tile_size)
+    logger.debug("Generated %d tile boundaries", len(tile_boundaries))
+    if logger.isEnabledFor(logging.DEBUG):
+        for i, boundary in enumerate(tile_boundaries):
+            logger.debug("  Tile %d: %s", i, boundary, extra=SAMPLED)
 
     return tile_boundaries
 
@@ -190,12 +235,12 @@ def visualise_tile_boundaries(image_path, save_path=None):
     correct_positions, _, image = get_arrow_positions(image_path)
     
     if image is None:
-        print(f"Could not load image: {image_path}")
+        logger.warning("Could not load image: %s", image_path)
         return None
     
     estimated_size = _estimate_tile_size(correct_positions)
     if estimated_size is None:
-        print("Could not estimate tile size")
+        logger.warning("Could not estimate tile size")
         return None
     
     tile_boundaries = _estimate_tile_grid(correct_positions, estimated_size)
@@ -217,7 +262,7 @@ def visualise_tile_boundaries(image_path, save_path=None):
     # Save or display
     if save_path:
         cv2.imwrite(save_path, result_image)
-        print(f"Saved visualization to {save_path}")
+        logger.info("Saved visualization to %s", save_path)
     else:
         cv2.imshow("Tile Boundaries", result_image)
         cv2.waitKey(0)
@@ -228,6 +273,8 @@ def visualise_tile_boundaries(image_path, save_path=None):
 
 if __name__ == "__main__":
     image_path = "test_images/valid_boards/board_7.jpg"  # Replace with your actual image path
+    from logging_config import configure_logging
+    configure_logging("DEBUG", "text", tile_sample_rate=1)
 
     print("=== ARROW DETECTION DEBUG ===")
     from arrow_detection import get_arrow_positions